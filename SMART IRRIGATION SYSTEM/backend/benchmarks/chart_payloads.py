@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Soil chart payload micro-benchmark
+
+Measures bytes and microseconds per soil chart-data response for:
+- the old path: build the nested dicts and render them with `JSONResponse` (stdlib json),
+- rendering the same dicts with `fast_json.dumps` (orjson when installed),
+- serving bytes already encoded by `SoilChartPayloads` (the steady state),
+- the compact payload, whose labels and bands come from the cached descriptor.
+
+Every path is checked to return exactly the old response body first.
+
+Usage:
+    python benchmarks/chart_payloads.py [--rows 2000] [--repeats 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chart_payloads import SOIL_CHART_DESCRIPTOR_BODY, SoilChartPayloads, render_soil_chart
+from fast_json import JSON_ENCODER, dumps, json_bytes_response
+
+
+def random_rows(count: int, seed: int = 42) -> list:
+    """soil_analysis rows with the value ranges of the seed data"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "analysis_id": i + 1,
+            "land_id": i + 1,
+            "ph_level": round(float(rng.uniform(5.5, 8.0)), 1),
+            "moisture_level": round(float(rng.uniform(20, 70)), 1),
+            "nitrogen": int(rng.integers(20, 120)),
+            "phosphorus": int(rng.integers(20, 90)),
+            "potassium": int(rng.integers(20, 120)),
+            "organic_matter": round(float(rng.uniform(1, 6)), 1),
+            "recorded_at": f"2026-03-{i % 28 + 1:02d}T10:00:00+00:00",
+            "updated_at": f"2026-03-{i % 28 + 1:02d}T10:00:00+00:00"
+        }
+        for i in range(count)
+    ]
+
+
+def time_per_row(fn, rows: list, repeats: int) -> float:
+    """Best mean microseconds per call over `repeats` passes"""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for row in rows:
+            fn(row)
+        best = min(best, (time.perf_counter() - started) / len(rows))
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = random_rows(args.rows)
+    payloads = SoilChartPayloads(max_lands=args.rows)
+
+    def old_path(row):
+        return JSONResponse(content=render_soil_chart(row["land_id"], row)).body
+
+    def fast_render(row):
+        return json_bytes_response(dumps(render_soil_chart(row["land_id"], row))).body
+
+    def pre_encoded(row):
+        return json_bytes_response(payloads.get(row["land_id"], row)).body
+
+    def compact(row):
+        return json_bytes_response(payloads.get(row["land_id"], row, compact=True)).body
+
+    # Warms the payload store too, so the pre-encoded paths measure hits
+    for row in rows:
+        expected = old_path(row)
+        assert fast_render(row) == expected and pre_encoded(row) == expected, f"body mismatch for land {row['land_id']}"
+        compact(row)
+
+    results = [
+        ("dicts + JSONResponse (old)", time_per_row(old_path, rows, args.repeats), len(old_path(rows[0]))),
+        (f"dicts + {JSON_ENCODER}", time_per_row(fast_render, rows, args.repeats), len(fast_render(rows[0]))),
+        ("pre-encoded full", time_per_row(pre_encoded, rows, args.repeats), len(pre_encoded(rows[0]))),
+        ("pre-encoded compact", time_per_row(compact, rows, args.repeats), len(compact(rows[0])))
+    ]
+
+    print(f"{args.rows} lands, best of {args.repeats} passes, encoder: {JSON_ENCODER}")
+    print(f"{'path':<30} {'us/response':>12} {'bytes':>7}")
+    for name, micros, size in results:
+        print(f"{name:<30} {micros:>12.2f} {size:>7}")
+    print(f"Descriptor (fetched once, ETag cached): {len(SOIL_CHART_DESCRIPTOR_BODY)} bytes")
+    print(f"Speedup of pre-encoded over old: {results[0][1] / results[2][1]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Compiled forest equivalence check and benchmark
+
+Flattens crop_model.pkl with `compile_forest`, checks that
+`CompiledForest.predict_proba` returns exactly the same probabilities as the
+sklearn model (random samples plus samples sitting on split thresholds, where
+`<=` vs `<` and float32 rounding matter), then times single-row and batch
+scoring for sklearn, the compiled forest and CropInferenceEngine with the
+`numpy` backend (compiled forest for small batches, sklearn above
+CROP_COMPILED_FOREST_MAX_ROWS).
+
+Usage:
+    python benchmarks/compiled_forest.py [--samples 20000] [--repeats 20]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest_compiler import compile_forest
+from inference import CropInferenceEngine
+
+warnings.filterwarnings("ignore")
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crop_model.pkl")
+BATCH_SIZES = (1, 8, 64, 256, 1024, 10000)
+
+
+def random_samples(count: int, seed: int = 42) -> np.ndarray:
+    """Feature vectors spread over the ranges of the training data"""
+    rng = np.random.default_rng(seed)
+    low = np.array([0, 5, 5, 8, 14, 3.5, 20])
+    high = np.array([140, 145, 205, 44, 100, 9.9, 300])
+    return rng.uniform(low, high, size=(count, 7))
+
+
+def threshold_samples(model, base: np.ndarray) -> np.ndarray:
+    """Copies of the base samples with one feature set exactly on a split threshold"""
+    rng = np.random.default_rng(7)
+    samples = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.children_left != -1):
+            sample = base[rng.integers(len(base))].copy()
+            sample[tree.feature[node]] = tree.threshold[node]
+            samples.append(sample)
+    return np.array(samples)
+
+
+def time_call(fn, matrix: np.ndarray, repeats: int) -> float:
+    fn(matrix)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn(matrix)
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    started = time.perf_counter()
+    forest = compile_forest(model)
+    compile_ms = (time.perf_counter() - started) * 1000
+    engine = CropInferenceEngine(model, backend="numpy")
+
+    samples = random_samples(args.samples)
+    edges = threshold_samples(model, samples)
+    for name, matrix in (("random", samples), ("on-threshold", edges)):
+        expected = model.predict_proba(matrix)
+        assert np.array_equal(forest.predict_proba(matrix), expected), f"{name} samples differ from sklearn"
+        assert np.array_equal(engine.predict_proba(matrix), expected), f"{name} samples differ through the engine"
+        print(f"✓ {len(matrix)} {name} samples: compiled forest matches sklearn exactly")
+
+    print(f"\nModel: {forest.n_trees} trees, {forest.n_nodes} nodes, depth {forest.max_depth}, compiled in {compile_ms:.0f} ms")
+    print(f"{'rows':>6} {'sklearn ms':>11} {'compiled ms':>12} {'engine ms':>10} {'speedup':>8}")
+    for rows in BATCH_SIZES:
+        matrix = samples[:rows]
+        repeats = max(1, args.repeats if rows <= 1024 else args.repeats // 4)
+        sklearn_ms = time_call(model.predict_proba, matrix, repeats)
+        compiled_ms = time_call(forest.predict_proba, matrix, repeats)
+        engine_ms = time_call(engine.predict_proba, matrix, repeats)
+        print(f"{rows:>6} {sklearn_ms:>11.3f} {compiled_ms:>12.3f} {engine_ms:>10.3f} {sklearn_ms / engine_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
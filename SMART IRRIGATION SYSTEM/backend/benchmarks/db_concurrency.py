@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Database concurrency benchmark
+
+Compares the old pattern (blocking `.execute()` inside an async handler) with
+`database.execute()` at increasing numbers of in-flight requests. PostgREST is
+replaced by an in-process transport that waits a fixed latency per round trip,
+so the numbers only reflect how well the event loop overlaps waiting.
+
+Usage:
+    python benchmarks/db_concurrency.py [--latency-ms 20] [--requests 256]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+
+def make_transport(latency_seconds: float) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency_seconds)  # network wait, as seen by the sync client
+        return httpx.Response(200, json=[{"farmer_id": 1, "name": "Farmer 1"}])
+    return httpx.MockTransport(handler)
+
+
+async def blocking_handler():
+    return db.table('farm').select('farmer_id, name').execute()
+
+
+async def offloaded_handler():
+    return await db.execute(db.table('farm').select('farmer_id, name'))
+
+
+async def measure(handler, in_flight: int, total_requests: int):
+    """Return (requests/sec, worst event loop lag in ms)"""
+    semaphore = asyncio.Semaphore(in_flight)
+    worst_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal worst_lag
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst_lag = max(worst_lag, time.perf_counter() - start - 0.001)
+
+    async def one():
+        async with semaphore:
+            await handler()
+
+    lag_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    running = False
+    await lag_task
+    return total_requests / elapsed, worst_lag * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--requests", type=int, default=256)
+    args = parser.parse_args()
+
+    db.set_client(db.create_supabase_client(transport=make_transport(args.latency_ms / 1000)))
+
+    print(f"Simulated PostgREST latency: {args.latency_ms} ms, {args.requests} requests per run, "
+          f"DB_MAX_CONCURRENCY={db.DB_MAX_CONCURRENCY}")
+    print(f"{'in-flight':>10} | {'blocking req/s':>15} {'loop lag ms':>12} | {'offloaded req/s':>16} {'loop lag ms':>12}")
+    for in_flight in (1, 2, 4, 8, 16, 32, 64):
+        blocking_rps, blocking_lag = await measure(blocking_handler, in_flight, args.requests)
+        offloaded_rps, offloaded_lag = await measure(offloaded_handler, in_flight, args.requests)
+        print(f"{in_flight:>10} | {blocking_rps:>15.1f} {blocking_lag:>12.1f} | {offloaded_rps:>16.1f} {offloaded_lag:>12.1f}")
+
+    db.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+"""
+Local PostgREST stand-in for offline benchmarks and load tests
+
+`FakePostgREST` answers the requests supabase-py sends to PostgREST from
+in-memory tables, so the API can be benchmarked without the hosted Supabase
+project. It understands what the API uses:
+
+- filters `eq`, `neq`, `gt`, `gte`, `lt`, `lte`, `in`, `is`, `not.`, and
+  nested `or(...)` / `and(...)` with quoted values,
+- `select` with embedded parents (`*, land(land_name)`), `order` with
+  `nullsfirst`/`nullslast`, `limit`/`offset`, `Prefer: count=exact` and `HEAD`,
+- inserts, upserts (`merge-duplicates`, optionally `on_conflict` columns), updates and deletes,
+- the running aggregates' seed functions (`POST /rpc/<table>_running_aggregates`) and the
+  fleet job's `latest_<table>_per_land` functions and the sensor buffer's `recent_sensor_readings`.
+
+It stays fast with millions of `sensor_readings`: equality and `in` filters
+on primary and foreign keys use hash indexes, ordered reads walk a cached
+sorted copy of the table and stop at the limit, and a `gt`/`gte` filter on the
+first ascending sort column (the running aggregates' watermark pages) starts
+with a binary search. Every round trip waits `latency_ms` plus up to
+`jitter_ms` to simulate the network.
+
+In process:
+
+    db.set_client(db.create_supabase_client(transport=FakePostgREST(seed(), latency_ms=5)))
+
+As a server, for an API started with `uvicorn` (any number of workers):
+
+    python benchmarks/fake_postgrest.py --port 54321 --readings-per-sensor 2000
+    SUPABASE_URL=http://127.0.0.1:54321 SHARED_STATE_BACKEND=file uvicorn main:app --workers 4
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fast_json import dumps
+
+PRIMARY_KEYS = {
+    "farm": "farmer_id",
+    "land": "land_id",
+    "crop": "crop_id",
+    "sensor": "sensor_id",
+    "sensor_readings": "reading_id",
+    "soil_analysis": "analysis_id",
+    "water_resource": "water_id",
+    "crop_recommendations": "recommendation_id"
+}
+
+# Foreign keys the API filters on, indexed like the primary keys
+INDEXED_COLUMNS = {
+    "land": ("farmer_id",),
+    "crop": ("farmer_id",),
+    "sensor": ("farmer_id", "land_id"),
+    "sensor_readings": ("sensor_id",),
+    "soil_analysis": ("land_id",),
+    "water_resource": ("sensor_id",),
+    "crop_recommendations": ("land_id",)
+}
+
+# rpc name -> (table, id column, group column, metrics) of the running aggregates' seed functions
+AGGREGATE_FUNCTIONS = {
+    "soil_analysis_running_aggregates": ("soil_analysis", "analysis_id", "land_id", ("nitrogen", "phosphorus", "potassium", "ph_level")),
+    "sensor_readings_running_aggregates": ("sensor_readings", "reading_id", "sensor_id", ("temperature", "moisture"))
+}
+
+# rpc name -> (table, id column, parent table the land_id is read from, if not the table itself)
+# of the fleet job's latest-row-per-land functions
+LATEST_FUNCTIONS = {
+    "latest_soil_analysis_per_land": ("soil_analysis", "analysis_id", None),
+    "latest_sensor_readings_per_land": ("sensor_readings", "reading_id", "sensor")
+}
+
+# Query parameters that are not filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+SENSOR_TYPES = ["Moisture", "Temperature", "Water Level", "pH"]
+CROPS = [("rice", "Cereal"), ("maize", "Cereal"), ("cotton", "Fiber"), ("banana", "Fruit"), ("chickpea", "Pulse"),
+         ("coffee", "Plantation"), ("jute", "Fiber"), ("lentil", "Pulse")]
+
+
+def split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses"""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def coerce(raw: str, sample):
+    """A filter operand as the type of the column's values"""
+    if len(raw) >= 2 and raw[0] == raw[-1] == '"':
+        raw = raw[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    elif raw == "null":
+        return None
+    if isinstance(sample, bool):
+        return raw == "true"
+    if isinstance(sample, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return float(raw)
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def parse_order(order: str) -> List[tuple]:
+    """[(column, desc, nulls_first)]; like Postgres, nulls sort as the largest value by default"""
+    specs = []
+    for spec in order.split(","):
+        column, *modifiers = spec.split(".")
+        desc = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or (desc and "nullslast" not in modifiers)
+        specs.append((column, desc, nulls_first))
+    return specs
+
+
+def sort_rows(rows: list, order: str) -> list:
+    """Stable sort, one pass per column from the last; nearly sorted input (appends) sorts in linear time"""
+    for column, desc, nulls_first in reversed(parse_order(order)):
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None] if len(present) < len(rows) else []
+        present.sort(key=lambda row: row[column], reverse=desc)
+        rows = missing + present if nulls_first else present + missing
+    return rows
+
+
+class Table:
+    def __init__(self, name: str, rows: Optional[list] = None):
+        self.name = name
+        self.key = PRIMARY_KEYS.get(name, "id")
+        self.indexed = (self.key,) + INDEXED_COLUMNS.get(name, ())
+        self.rows = rows if rows is not None else []
+        self.next_id = max((row.get(self.key) or 0 for row in self.rows), default=0) + 1
+        # Bumped by updates and deletes; appends keep the cached orders valid
+        self.rewrites = 0
+        # order parameter -> (rewrites, rows covered, sorted rows)
+        self._orders = {}
+        self._samples = {}
+        self._indexes = {}
+        self._reindex()
+
+    def _reindex(self):
+        self._indexes = {column: {} for column in self.indexed}
+        self._index_rows(self.rows)
+
+    def _index_rows(self, rows: list):
+        for column, index in self._indexes.items():
+            for row in rows:
+                index.setdefault(row.get(column), []).append(row)
+
+    def sample(self, column: str):
+        """A non-null value of the column, to coerce filter operands to its type"""
+        if column not in self._samples:
+            self._samples[column] = next((row[column] for row in self.rows if row.get(column) is not None), None)
+        return self._samples[column]
+
+    def lookup(self, column: str, value) -> Optional[dict]:
+        if column in self._indexes:
+            matches = self._indexes[column].get(value)
+            return matches[0] if matches else None
+        return next((row for row in self.rows if row.get(column) == value), None)
+
+    def lookup_all(self, column: str, value) -> list:
+        if column in self._indexes:
+            return list(self._indexes[column].get(value, ()))
+        return [row for row in self.rows if row.get(column) == value]
+
+    def ordered(self, order: str) -> list:
+        """All rows in `order`, from a cache that new appends are merged into"""
+        cached = self._orders.get(order)
+        if cached is not None and cached[0] == self.rewrites:
+            if cached[1] == len(self.rows):
+                return cached[2]
+            rows = sort_rows(cached[2] + self.rows[cached[1]:], order)
+        else:
+            rows = sort_rows(list(self.rows), order)
+        self._orders[order] = (self.rewrites, len(self.rows), rows)
+        return rows
+
+    # ---- filters
+
+    def condition(self, column: str, value: str):
+        negate = value.startswith("not.")
+        if negate:
+            value = value[4:]
+        operator, _, operand = value.partition(".")
+        sample = self.sample(column)
+        if operator == "in":
+            items = {coerce(item, sample) for item in split_top_level(operand.strip("()"))}
+            test = lambda v: v in items
+        elif operator == "is":
+            expected = {"null": None, "true": True, "false": False}[operand]
+            test = lambda v: v is expected
+        else:
+            target = coerce(operand, sample)
+            test = {
+                "eq": lambda v: v == target,
+                "neq": lambda v: v is not None and v != target,
+                "gt": lambda v: v is not None and v > target,
+                "gte": lambda v: v is not None and v >= target,
+                "lt": lambda v: v is not None and v < target,
+                "lte": lambda v: v is not None and v <= target
+            }[operator]
+        if negate and operator == "is":
+            return lambda row: not test(row.get(column))
+        if negate:
+            # NOT of a comparison with null is still null, so null rows never match
+            return lambda row: row.get(column) is not None and not test(row.get(column))
+        return lambda row: test(row.get(column))
+
+    def logic(self, key: str, value: str):
+        negate = key.startswith("not.")
+        combine = any if key.endswith("or") else all
+        tests = []
+        for part in split_top_level(value.strip()[1:-1]):
+            nested = re.match(r"^(not\.)?(or|and)(\(.*\))$", part)
+            if nested:
+                tests.append(self.logic((nested.group(1) or "") + nested.group(2), nested.group(3)))
+            else:
+                column, _, condition = part.partition(".")
+                tests.append(self.condition(column, condition))
+        return lambda row: combine(test(row) for test in tests) != negate
+
+    def matcher(self, filters: list):
+        tests = [
+            self.logic(key, value) if key in ("or", "and", "not.or", "not.and") else self.condition(key, value)
+            for key, value in filters
+        ]
+        if not tests:
+            return None
+        if len(tests) == 1:
+            return tests[0]
+        return lambda row: all(test(row) for test in tests)
+
+    def candidates(self, filters: list) -> Optional[list]:
+        """Rows from a hash index when an `eq`/`in` filter is on an indexed column, else None"""
+        for column, value in filters:
+            if column not in self._indexes:
+                continue
+            operator, _, operand = value.partition(".")
+            sample = self.sample(column)
+            if operator == "eq":
+                return self._indexes[column].get(coerce(operand, sample), [])
+            if operator == "in":
+                values = {coerce(item, sample) for item in split_top_level(operand.strip("()"))}
+                return [row for item in values for row in self._indexes[column].get(item, [])]
+        return None
+
+    def seek(self, rows: list, order: str, filters: list) -> int:
+        """First position that can match, by binary search on the leading ascending sort column"""
+        column, desc, nulls_first = parse_order(order)[0]
+        if desc or nulls_first:
+            return 0
+        bounds = [value for key, value in filters if key == column and value.split(".", 1)[0] in ("gt", "gte")]
+        if not bounds or not rows:
+            return 0
+        operator, _, operand = bounds[0].partition(".")
+        target = coerce(operand, self.sample(column))
+        present = len(rows)
+        while present and rows[present - 1].get(column) is None:
+            present -= 1
+        search = bisect.bisect_right if operator == "gt" else bisect.bisect_left
+        return search(rows, target, 0, present, key=lambda row: row[column])
+
+    # ---- requests
+
+    def select(self, params: list, count: bool) -> tuple:
+        """(page rows, total or None)"""
+        options = dict(params)
+        filters = [(key, value) for key, value in params if key not in RESERVED_PARAMS]
+        order = options.get("order")
+        offset = int(options.get("offset", 0))
+        limit = int(options["limit"]) if "limit" in options else None
+        match = self.matcher(filters)
+        candidates = self.candidates(filters)
+
+        if candidates is None and order and limit is not None and not count:
+            # Walk the sorted table and stop at the page end
+            rows = self.ordered(order)
+            page, skip = [], offset
+            for position in range(self.seek(rows, order, filters), len(rows)):
+                row = rows[position]
+                if match is not None and not match(row):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                page.append(row)
+                if len(page) >= limit:
+                    break
+            return page, None
+
+        if candidates is not None:
+            matched = [row for row in candidates if match is None or match(row)]
+            if order:
+                matched = sort_rows(matched, order)
+        else:
+            source = self.ordered(order) if order else self.rows
+            matched = source if match is None else [row for row in source if match(row)]
+        end = offset + limit if limit is not None else None
+        return matched[offset:end], len(matched)
+
+    def insert(self, items: list, merge: bool, on_conflict: Optional[str] = None) -> list:
+        created, merged = [], False
+        now = datetime.now(timezone.utc).isoformat()
+        primary = self._indexes[self.key]
+        conflict = tuple(on_conflict.split(",")) if merge and on_conflict else None
+        unique = {}
+        if conflict:
+            for row in self.rows:
+                unique[tuple(row.get(column) for column in conflict)] = [row]
+        for item in items:
+            item = dict(item)
+            if conflict:
+                existing = unique.get(tuple(item.get(column) for column in conflict))
+            else:
+                existing = primary.get(item.get(self.key)) if merge and item.get(self.key) is not None else None
+            if existing:
+                existing[0].update(item)
+                created.append(existing[0])
+                merged = True
+                continue
+            if item.get(self.key) is None:
+                item[self.key] = self.next_id
+            self.next_id = max(self.next_id, item[self.key] + 1)
+            item.setdefault("created_at", now)
+            item.setdefault("updated_at", now)
+            if self.name in ("soil_analysis", "sensor_readings"):
+                item.setdefault("recorded_at", now)
+            self.rows.append(item)
+            self._index_rows([item])
+            if conflict:
+                unique[tuple(item.get(column) for column in conflict)] = [item]
+            created.append(item)
+        if merged:
+            self._rewritten()
+        else:
+            # Columns that were empty have values to coerce against now
+            self._samples = {column: value for column, value in self._samples.items() if value is not None}
+        return created
+
+    def update(self, params: list, values: dict) -> list:
+        matched = self._matching(params)
+        for row in matched:
+            row.update(values)
+        self._rewritten()
+        return matched
+
+    def delete(self, params: list) -> list:
+        matched = self._matching(params)
+        removed = {id(row) for row in matched}
+        self.rows[:] = [row for row in self.rows if id(row) not in removed]
+        self._rewritten()
+        return matched
+
+    def _matching(self, params: list) -> list:
+        match = self.matcher([(key, value) for key, value in params if key not in RESERVED_PARAMS])
+        return [row for row in self.rows if match is None or match(row)]
+
+    def _rewritten(self):
+        self.rewrites += 1
+        self._orders.clear()
+        self._samples.clear()
+        self._reindex()
+
+
+class FakePostgREST(httpx.BaseTransport):
+    def __init__(self, tables: Optional[Dict[str, list]] = None, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.tables = {name: Table(name, rows) for name, rows in (tables or {}).items()}
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            self.tables[name] = Table(name)
+        return self.tables[name]
+
+    def delay(self) -> float:
+        """Simulated network time of one round trip"""
+        return self.latency + (random.random() * self.jitter if self.jitter else 0.0)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+        return self.respond(request)
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        prefix, _, name = request.url.path.rpartition("/")
+        if prefix.endswith("/rpc"):
+            with self.lock:
+                self.requests += 1
+                return self._rpc(name, json.loads(request.content or b"{}") or {})
+        table = self.table(name)
+        params = list(request.url.params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        with self.lock:
+            self.requests += 1
+            if request.method in ("GET", "HEAD"):
+                return self._select(table, params, prefer, head=request.method == "HEAD")
+            if request.method == "POST":
+                payload = json.loads(request.content or b"null")
+                items = payload if isinstance(payload, list) else [payload]
+                return self._json(201, table.insert(items, merge="merge-duplicates" in prefer,
+                                                    on_conflict=dict(params).get("on_conflict")))
+            if request.method == "PATCH":
+                return self._json(200, table.update(params, json.loads(request.content)))
+            if request.method == "DELETE":
+                return self._json(200, table.delete(params))
+        return self._json(405, {"message": "Method not allowed"})
+
+    @staticmethod
+    def _json(status_code: int, content, headers: Optional[dict] = None) -> httpx.Response:
+        return httpx.Response(status_code, content=dumps(content),
+                              headers={"content-type": "application/json", **(headers or {})})
+
+    def _rpc(self, name: str, params: dict) -> httpx.Response:
+        """Same JSON as the SQL functions: per group [key, rows, counts..., sums..., sums of squares...]"""
+        if name in LATEST_FUNCTIONS:
+            return self._latest_per_land(*LATEST_FUNCTIONS[name], set(params.get("land_ids") or ()))
+        if name == "recent_sensor_readings":
+            return self._recent_sensor_readings(params.get("sensor_ids") or [], int(params.get("per_sensor") or 0))
+        if name not in AGGREGATE_FUNCTIONS:
+            return self._json(404, {"code": "PGRST202", "message": f"Could not find the function public.{name}"})
+        table_name, id_column, group_column, metrics = AGGREGATE_FUNCTIONS[name]
+        rows = self.table(table_name).rows
+        groups = {}
+        for row in rows:
+            group = groups.setdefault(row.get(group_column), [0] + [0] * (3 * len(metrics)))
+            group[0] += 1
+            for i, metric in enumerate(metrics):
+                value = row.get(metric)
+                if value is not None:
+                    group[1 + i] += 1
+                    group[1 + len(metrics) + i] += value
+                    group[1 + 2 * len(metrics) + i] += value * value
+        watermark = max((row.get(id_column) or 0 for row in rows), default=0)
+        floor = watermark - int(params.get("recent_ids") or 0)
+        ids = [row[id_column] for row in rows if row.get(id_column) is not None and row[id_column] > floor]
+        return self._json(200, {
+            "watermark": watermark, "ids": ids,
+            "groups": [[key, *values] for key, values in groups.items()]
+        })
+
+    def _latest_per_land(self, table_name: str, id_column: str, parent: Optional[str], land_ids: set) -> httpx.Response:
+        """DISTINCT ON (land_id) ... ORDER BY land_id, recorded_at DESC NULLS LAST, id DESC"""
+        if parent:
+            parent_table = self.table(parent)
+            land_of = {row[parent_table.key]: row.get("land_id") for row in parent_table.rows}
+            key = parent_table.key
+        latest = {}
+        for row in self.table(table_name).rows:
+            land_id = land_of.get(row.get(key)) if parent else row.get("land_id")
+            if land_id not in land_ids:
+                continue
+            rank = (row.get("recorded_at") is not None, row.get("recorded_at") or "", row.get(id_column) or 0)
+            if land_id not in latest or rank > latest[land_id][0]:
+                latest[land_id] = (rank, row)
+        return self._json(200, [dict(row) for _, row in latest.values()])
+
+    def _recent_sensor_readings(self, sensor_ids: list, per_sensor: int) -> httpx.Response:
+        """Newest `per_sensor` readings of each sensor by (recorded_at DESC NULLS LAST, reading_id DESC)"""
+        table = self.table("sensor_readings")
+        rows = []
+        for sensor_id in sensor_ids:
+            readings = table.lookup_all("sensor_id", sensor_id)
+            readings.sort(key=lambda row: (row.get("recorded_at") is not None, row.get("recorded_at") or "", row["reading_id"]),
+                          reverse=True)
+            rows.extend(dict(row) for row in readings[:per_sensor])
+        return self._json(200, rows)
+
+    def _select(self, table: Table, params: list, prefer: str, head: bool) -> httpx.Response:
+        count = "count=exact" in prefer
+        rows, total = table.select(params, count)
+        headers = {}
+        if count:
+            offset = int(dict(params).get("offset", 0))
+            headers["content-range"] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        if head:
+            return httpx.Response(200, content=b"", headers={"content-type": "application/json", **headers})
+        columns = split_top_level(unquote(dict(params).get("select", "*")))
+        return self._json(200, [self._project(row, columns) for row in rows], headers)
+
+    def _project(self, row: dict, columns: List[str]) -> dict:
+        if not columns or columns == ["*"]:
+            return dict(row)
+        projected = {}
+        for column in columns:
+            embedded = re.match(r"^(\w+)\((.*)\)$", column)
+            if column == "*":
+                projected.update(row)
+            elif embedded:
+                parent = self.table(embedded.group(1))
+                target = parent.lookup(parent.key, row.get(parent.key))
+                projected[parent.name] = self._project(target, split_top_level(embedded.group(2))) if target else None
+            else:
+                projected[column] = row.get(column)
+        return projected
+
+
+def seed(farmers: int = 20, lands_per_farmer: int = 3, sensors_per_land: int = 3, readings_per_sensor: int = 50,
+         soil_per_land: int = 10, recommendations_per_land: int = 5, reading_interval_minutes: int = 15,
+         seed_value: int = 7) -> Dict[str, list]:
+    """
+    Synthetic tables with the value ranges of the real data. Readings are generated
+    oldest first across all sensors, so `reading_id` and `recorded_at` grow together
+    """
+    rng = np.random.default_rng(seed_value)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    tables = {name: [] for name in PRIMARY_KEYS}
+    lands = farmers * lands_per_farmer
+    sensors = lands * sensors_per_land
+
+    for farmer_id in range(1, farmers + 1):
+        tables["farm"].append({"farmer_id": farmer_id, "name": f"Farmer {farmer_id}", "village": f"Village {farmer_id % 10}"})
+        tables["crop"].append({"crop_id": farmer_id, "farmer_id": farmer_id, "growth_stage": "Vegetative"})
+
+    for index in range(lands):
+        land_id = index + 1
+        farmer_id = index // lands_per_farmer + 1
+        tables["land"].append({"land_id": land_id, "farmer_id": farmer_id, "land_name": f"Land {land_id}", "area_acres": 2.5})
+        for sample in range(soil_per_land):
+            recorded_at = (start + timedelta(days=3 * sample, hours=int(rng.integers(0, 24)))).isoformat()
+            tables["soil_analysis"].append({
+                "analysis_id": len(tables["soil_analysis"]) + 1,
+                "land_id": land_id,
+                "ph_level": round(float(rng.uniform(5.5, 8.0)), 1),
+                "moisture_level": round(float(rng.uniform(20, 70)), 1),
+                "nitrogen": float(rng.integers(20, 120)),
+                "phosphorus": float(rng.integers(20, 90)),
+                "potassium": float(rng.integers(20, 120)),
+                "organic_matter": round(float(rng.uniform(1, 6)), 1),
+                "recorded_at": recorded_at,
+                "created_at": recorded_at,
+                "updated_at": recorded_at
+            })
+        for rank in range(recommendations_per_land):
+            crop_name, crop_type = CROPS[(land_id + rank) % len(CROPS)]
+            created_at = start.isoformat()
+            tables["crop_recommendations"].append({
+                "recommendation_id": len(tables["crop_recommendations"]) + 1,
+                "land_id": land_id,
+                "crop_name": crop_name,
+                "crop_type": crop_type,
+                "suitability_score": round(float(rng.uniform(40, 99)), 1),
+                "growth_duration_days": int(rng.integers(90, 200)),
+                "is_optimal": rank == 0,
+                "created_at": created_at,
+                "updated_at": created_at
+            })
+        for position in range(sensors_per_land):
+            sensor_id = index * sensors_per_land + position + 1
+            tables["sensor"].append({
+                "sensor_id": sensor_id,
+                "farmer_id": farmer_id,
+                "land_id": land_id,
+                "sensor_type": SENSOR_TYPES[position % len(SENSOR_TYPES)]
+            })
+            tables["water_resource"].append({
+                "water_id": sensor_id,
+                "sensor_id": sensor_id,
+                "water_level": round(float(rng.uniform(10, 95)), 1)
+            })
+
+    # One timestamp string per reading interval, shared by every sensor's reading at that time
+    moisture = np.round(rng.uniform(20, 80, size=(readings_per_sensor, sensors)), 1).tolist()
+    temperature = np.round(rng.uniform(15, 38, size=(readings_per_sensor, sensors)), 1).tolist()
+    readings = tables["sensor_readings"]
+    for step in range(readings_per_sensor):
+        recorded_at = (start + timedelta(minutes=reading_interval_minutes * step)).isoformat()
+        base = step * sensors
+        readings.extend(
+            {
+                "reading_id": base + position + 1,
+                "sensor_id": position + 1,
+                "moisture": moisture[step][position],
+                "temperature": temperature[step][position],
+                "recorded_at": recorded_at
+            }
+            for position in range(sensors)
+        )
+    return tables
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("synthetic data")
+    group.add_argument("--farmers", type=int, default=20)
+    group.add_argument("--lands-per-farmer", type=int, default=3)
+    group.add_argument("--sensors-per-land", type=int, default=3)
+    group.add_argument("--readings-per-sensor", type=int, default=50)
+    group.add_argument("--soil-per-land", type=int, default=10)
+    group.add_argument("--latency-ms", type=float, default=0.0, help="simulated network time per round trip")
+    group.add_argument("--jitter-ms", type=float, default=0.0, help="random extra time per round trip, up to this much")
+
+
+def from_arguments(args: argparse.Namespace) -> FakePostgREST:
+    started = time.perf_counter()
+    tables = seed(args.farmers, args.lands_per_farmer, args.sensors_per_land, args.readings_per_sensor, args.soil_per_land)
+    fake = FakePostgREST(tables, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    sizes = ", ".join(f"{name} {len(table.rows):,}" for name, table in fake.tables.items())
+    print(f"✓ Seeded in {time.perf_counter() - started:.1f}s: {sizes}", file=sys.stderr)
+    return fake
+
+
+def asgi_app(fake: FakePostgREST):
+    """Serve the stand-in over HTTP (PostgREST paths are /rest/v1/<table>)"""
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": message["type"] + ".complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+        body, more = b"", True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        query = scope["query_string"].decode()
+        request = httpx.Request(
+            scope["method"],
+            f"http://postgrest{scope['path']}" + (f"?{query}" if query else ""),
+            headers=[(name.decode(), value.decode()) for name, value in scope["headers"]],
+            content=body
+        )
+        delay = fake.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        response = fake.respond(request)
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": [(name.encode(), value.encode()) for name, value in response.headers.items()]
+        })
+        await send({"type": "http.response.body", "body": response.content})
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+    fake = from_arguments(args)
+    print(f"🚀 Fake PostgREST on http://{args.host}:{args.port} (SUPABASE_URL for the API)", file=sys.stderr)
+    uvicorn.run(asgi_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Crop inference micro-benchmark
+
+Measures the per-request cost of the old endpoint pattern (`predict` +
+`predict_proba` + full `argsort`) against `CropInferenceEngine.predict_one`
+(one `predict_proba` pass + partial top-k selection) on crop_model.pkl.
+The single-pass saving is measured with the `sklearn` backend, so it does not
+include the compiled forest, whose saving on top of it is reported separately.
+
+Usage:
+    python benchmarks/inference_single_pass.py [--requests 300] [--top-k 3]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import CropInferenceEngine
+
+warnings.filterwarnings("ignore")
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crop_model.pkl")
+
+
+def random_samples(count: int, seed: int = 42) -> np.ndarray:
+    """Feature vectors spread over the ranges of the training data"""
+    rng = np.random.default_rng(seed)
+    low = np.array([0, 5, 5, 8, 14, 3.5, 20])
+    high = np.array([140, 145, 205, 44, 100, 9.9, 300])
+    return rng.uniform(low, high, size=(count, 7))
+
+
+def old_pattern(model, sample: np.ndarray, top_k: int):
+    input_data = sample.reshape(1, -1)
+    prediction = model.predict(input_data)[0]
+    prediction_proba = model.predict_proba(input_data)[0]
+    confidence = float(max(prediction_proba) * 100)
+    top_indices = prediction_proba.argsort()[-top_k:][::-1]
+    return prediction, confidence, [model.classes_[idx] for idx in top_indices]
+
+
+def time_per_call(fn, samples: np.ndarray) -> np.ndarray:
+    timings = np.empty(len(samples))
+    for i, sample in enumerate(samples):
+        start = time.perf_counter()
+        fn(sample)
+        timings[i] = time.perf_counter() - start
+    return timings * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    model = joblib.load(MODEL_PATH)
+    single_pass = CropInferenceEngine(model, backend="sklearn")
+    compiled = CropInferenceEngine(model, backend="numpy")
+    samples = random_samples(args.requests)
+
+    # Every path must agree on the label and confidence
+    for sample in samples[:50]:
+        label, confidence, _ = old_pattern(model, sample, args.top_k)
+        for engine in (single_pass, compiled):
+            result = engine.predict_one(sample, args.top_k)
+            assert result["recommended_crop"] == label and abs(result["confidence"] - confidence) < 1e-9
+
+    paths = (
+        ("predict + predict_proba + argsort", lambda s: old_pattern(model, s, args.top_k)),
+        ("predict_one, sklearn backend", lambda s: single_pass.predict_one(s, args.top_k)),
+        ("predict_one, numpy backend", lambda s: compiled.predict_one(s, args.top_k))
+    )
+    # Warm up every path before timing
+    for _, fn in paths:
+        time_per_call(fn, samples[:20])
+    old, new, fast = (time_per_call(fn, samples) for _, fn in paths)
+
+    print(f"Model: {type(model).__name__} with {len(model.estimators_)} trees, {args.requests} single-row requests")
+    print(f"{'path':<34} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for (name, _), timings in zip(paths, (old, new, fast)):
+        print(f"{name:<34} {timings.mean():>9.3f} {np.percentile(timings, 50):>9.3f} {np.percentile(timings, 95):>9.3f}")
+    print(f"Single-pass saving per request: {old.mean() - new.mean():.3f} ms ({(1 - new.mean() / old.mean()) * 100:.1f}%)")
+    print(f"Compiled forest saving on top:  {new.mean() - fast.mean():.3f} ms ({(1 - fast.mean() / new.mean()) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
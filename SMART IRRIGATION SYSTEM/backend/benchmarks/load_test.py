@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Offline load test of every API route
+
+Runs each route of `main.py` in turn with a fixed number of requests at a
+fixed concurrency and reports p50/p95/p99/mean/max latency, requests/sec and
+status codes per route as JSON, so two runs can be compared (`--baseline`).
+
+By default the API runs in this process behind `httpx.ASGITransport`, with
+its startup and shutdown hooks, against `FakePostgREST` seeded with synthetic
+data, so nothing reaches the hosted Supabase project. With `--url` the
+requests go to a running server instead, typically one started against the
+fake PostgREST server with the same seed arguments (ids are derived from them):
+
+    python benchmarks/fake_postgrest.py --port 54321 --farmers 100 --readings-per-sensor 5000
+    SUPABASE_URL=http://127.0.0.1:54321 SHARED_STATE_BACKEND=file uvicorn main:app --workers 4
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --farmers 100
+
+Read routes run first and writing routes (ingest, fleet run) last, so writes
+do not change what the reads see. Streaming routes (SSE, WebSocket) are
+skipped; routes with no scenario are listed as `uncovered_routes`.
+
+Usage:
+    python benchmarks/load_test.py [--requests 200] [--concurrency 16] [--latency-ms 5]
+                                   [--farmers 20] [--readings-per-sensor 50] [--routes REGEX]
+                                   [--no-cache] [--output run.json] [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_postgrest import add_seed_arguments, from_arguments
+
+# Long-lived responses whose latency is the connection lifetime
+SKIPPED_ROUTES = {"GET /api/live/stream": "SSE stream", "WS /api/live/ws": "WebSocket"}
+
+
+class SeedIds:
+    """Ids that exist in the seeded data, derived from the seed arguments"""
+
+    def __init__(self, args: argparse.Namespace, rng: np.random.Generator):
+        self.rng = rng
+        self.farmers = args.farmers
+        self.lands = args.farmers * args.lands_per_farmer
+        self.sensors = self.lands * args.sensors_per_land
+
+    def land(self) -> int:
+        return int(self.rng.integers(1, self.lands + 1))
+
+    def farmer(self) -> int:
+        return int(self.rng.integers(1, self.farmers + 1))
+
+    def sensor(self) -> int:
+        return int(self.rng.integers(1, self.sensors + 1))
+
+    def soil_sample(self, land_id=None) -> dict:
+        rng = self.rng
+        return {
+            "N": float(rng.integers(0, 140)), "P": float(rng.integers(5, 145)), "K": float(rng.integers(5, 205)),
+            "temperature": round(float(rng.uniform(10, 40)), 1), "humidity": round(float(rng.uniform(15, 95)), 1),
+            "ph": round(float(rng.uniform(4.5, 8.5)), 1), "rainfall": round(float(rng.uniform(30, 250)), 1),
+            "land_id": land_id
+        }
+
+    def readings(self, count: int) -> list:
+        recorded_at = datetime.now(timezone.utc).isoformat()
+        return [
+            {"sensor_id": self.sensor(), "temperature": round(float(self.rng.uniform(15, 38)), 1),
+             "moisture": round(float(self.rng.uniform(20, 80)), 1), "recorded_at": recorded_at}
+            for _ in range(count)
+        ]
+
+
+def scenarios(ids: SeedIds) -> list:
+    """
+    (name, request factory, limits); the name is "METHOD route template", the factory returns
+    (method, path, json body) and limits optionally cap requests and concurrency
+    """
+    history_window = {"from": "2026-01-01T00:00:00+00:00", "to": "2026-12-31T00:00:00+00:00", "points": "100"}
+    reads = [
+        ("GET /", lambda: ("GET", "/", None)),
+        ("GET /api/health/ready", lambda: ("GET", "/api/health/ready", None)),
+        ("GET /api/cache/stats", lambda: ("GET", "/api/cache/stats", None)),
+        ("GET /metrics", lambda: ("GET", "/metrics", None)),
+        ("GET /api/refresh/stats", lambda: ("GET", "/api/refresh/stats", None)),
+        ("GET /api/soil-analysis/chart-descriptor", lambda: ("GET", "/api/soil-analysis/chart-descriptor", None)),
+        ("GET /api/soil-analysis/{land_id}/chart-data", lambda: ("GET", f"/api/soil-analysis/{ids.land()}/chart-data", None)),
+        ("GET /api/soil-analysis/{land_id}/chart-data?compact", lambda: ("GET", f"/api/soil-analysis/{ids.land()}/chart-data?compact=true", None)),
+        ("GET /api/soil-analysis/{land_id}/history", lambda: ("GET", f"/api/soil-analysis/{ids.land()}/history?limit=10", None)),
+        ("GET /api/soil-analysis/{land_id}/history?from&to", lambda: ("GET", f"/api/soil-analysis/{ids.land()}/history", history_window)),
+        ("GET /api/crop-recommendations/{land_id}/chart-data", lambda: ("GET", f"/api/crop-recommendations/{ids.land()}/chart-data", None)),
+        ("GET /api/dashboard/stats", lambda: ("GET", "/api/dashboard/stats", None)),
+        ("GET /api/sensors/availability/{land_id}", lambda: ("GET", f"/api/sensors/availability/{ids.land()}", None)),
+        ("GET /api/sensors/all-availability", lambda: ("GET", "/api/sensors/all-availability", None)),
+        ("GET /api/water-levels/{land_id}", lambda: ("GET", f"/api/water-levels/{ids.land()}", None)),
+        ("GET /api/water-levels/all", lambda: ("GET", "/api/water-levels/all", None)),
+        ("GET /api/sensor-readings/analysis/{land_id}", lambda: ("GET", f"/api/sensor-readings/analysis/{ids.land()}", None)),
+        ("GET /api/sensor-readings/analysis/{land_id}?from&to", lambda: ("GET", f"/api/sensor-readings/analysis/{ids.land()}", history_window)),
+        ("GET /api/sensor-readings/ingest/stats", lambda: ("GET", "/api/sensor-readings/ingest/stats", None)),
+        ("GET /api/live/stats", lambda: ("GET", "/api/live/stats", None)),
+        ("POST /api/crop-recommendation/predict", lambda: ("POST", "/api/crop-recommendation/predict", ids.soil_sample())),
+        ("POST /api/crop-recommendation/predict-batch", lambda: ("POST", "/api/crop-recommendation/predict-batch", [ids.soil_sample() for _ in range(32)])),
+        ("POST /api/crop-recommendation/predict-from-soil/{land_id}", lambda: ("POST", f"/api/crop-recommendation/predict-from-soil/{ids.land()}", None)),
+        ("GET /api/crop-recommendation/auto-analyze", lambda: ("GET", "/api/crop-recommendation/auto-analyze", None)),
+        ("GET /api/crop-recommendation/auto-analyze-farmer/{farmer_id}", lambda: ("GET", f"/api/crop-recommendation/auto-analyze-farmer/{ids.farmer()}", None)),
+        ("GET /api/farmers/list", lambda: ("GET", "/api/farmers/list", None)),
+        ("GET /api/crop-recommendation/micro-batch/stats", lambda: ("GET", "/api/crop-recommendation/micro-batch/stats", None)),
+        ("GET /api/crop-recommendation/prediction-cache/stats", lambda: ("GET", "/api/crop-recommendation/prediction-cache/stats", None)),
+        ("GET /api/crop-recommendation/fleet-run/last", lambda: ("GET", "/api/crop-recommendation/fleet-run/last", None)),
+        ("GET /api/crop-recommendation/model-pool/health", lambda: ("GET", "/api/crop-recommendation/model-pool/health", None)),
+        ("GET /api/crop-recommendation/model-info", lambda: ("GET", "/api/crop-recommendation/model-info", None))
+    ]
+    writes = [
+        ("POST /api/crop-recommendation/predict (saved)", lambda: ("POST", "/api/crop-recommendation/predict", ids.soil_sample(ids.land())), {}),
+        ("POST /api/sensor-readings/ingest", lambda: ("POST", "/api/sensor-readings/ingest", ids.readings(100)), {}),
+        # Scores and rewrites every land; runs are serialized by the job lock
+        ("POST /api/crop-recommendation/fleet-run", lambda: ("POST", "/api/crop-recommendation/fleet-run", None), {"requests": 3, "concurrency": 1})
+    ]
+    return [(name, factory, {}) for name, factory in reads] + writes
+
+
+def route_names(app) -> set:
+    """'METHOD template' of every HTTP and WebSocket route of the app, docs excluded"""
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+    names = set()
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            names.update(f"{method} {route.path}" for method in route.methods if method != "HEAD")
+        elif isinstance(route, APIWebSocketRoute):
+            names.add(f"WS {route.path}")
+    return names
+
+
+def summarize(latencies: list, statuses: dict, errors: int, seconds: float, concurrency: int) -> dict:
+    samples = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "rps": round(len(latencies) / seconds, 1) if seconds > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "mean": round(float(samples.mean()), 3),
+            "max": round(float(samples.max()), 3)
+        },
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": errors
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, factory, requests: int, concurrency: int, warmup: int) -> dict:
+    latencies, statuses, errors = [], {}, 0
+
+    async def send(record: bool):
+        nonlocal errors
+        method, path, body = factory()
+        params, content = (body, None) if method == "GET" else (None, body)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, params=params, json=content)
+            await response.aread()
+        except httpx.HTTPError:
+            if record:
+                errors += 1
+            return
+        if record:
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    for _ in range(warmup):
+        await send(False)
+
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await send(True)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, errors, time.perf_counter() - started, concurrency)
+
+
+async def run(args: argparse.Namespace, client: httpx.AsyncClient, app=None) -> dict:
+    ids = SeedIds(args, np.random.default_rng(args.seed))
+    selected = [scenario for scenario in scenarios(ids) if re.search(args.routes, scenario[0])]
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or "in-process",
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "routes": {},
+        "skipped_routes": SKIPPED_ROUTES
+    }
+    if app is not None:
+        covered = {name.split("?")[0].replace(" (saved)", "") for name, _, _ in scenarios(ids)}
+        report["uncovered_routes"] = sorted(route_names(app) - covered - SKIPPED_ROUTES.keys())
+
+    started = time.perf_counter()
+    for name, factory, limits in selected:
+        requests = min(args.requests, limits.get("requests", args.requests))
+        concurrency = min(args.concurrency, limits.get("concurrency", args.concurrency))
+        warmup = min(args.warmup, requests)
+        result = await run_scenario(client, factory, requests, concurrency, warmup)
+        report["routes"][name] = result
+        latency = result["latency_ms"]
+        print(f"{name:<64} {result['rps']:>8.1f} req/s  p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  "
+              f"p99 {latency['p99']:>8.2f} ms  {result['status_codes']}", file=sys.stderr)
+    total_seconds = time.perf_counter() - started
+    total_requests = sum(result["requests"] for result in report["routes"].values())
+    report["totals"] = {
+        "requests": total_requests,
+        "seconds": round(total_seconds, 3),
+        "rps": round(total_requests / total_seconds, 1) if total_seconds > 0 else 0.0
+    }
+    return report
+
+
+async def run_in_process(args: argparse.Namespace) -> dict:
+    import database as db
+    db.set_client(db.create_supabase_client(transport=from_arguments(args)))
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        # Measure a warm server: model loaded, first refresh done
+        await main.app.state.warm_up
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=args.timeout) as client:
+            return await run(args, client, main.app)
+
+
+async def run_against_url(args: argparse.Namespace) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        return await run(args, client)
+
+
+def compare(report: dict, baseline: dict):
+    """Per-route p95 and throughput change against an earlier run"""
+    print(f"\n{'route':<64} {'p95 ms':>18} {'req/s':>18}", file=sys.stderr)
+    for name, result in report["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        p95_before, p95_after = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        rps_before, rps_after = before["rps"], result["rps"]
+        p95_change = f"{(p95_after / p95_before - 1) * 100:+.0f}%" if p95_before else "n/a"
+        rps_change = f"{(rps_after / rps_before - 1) * 100:+.0f}%" if rps_before else "n/a"
+        print(f"{name:<64} {p95_after:>9.2f} ({p95_change:>6}) {rps_after:>9.1f} ({rps_change:>6})", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="load-test a running server instead of the app in this process")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per route")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per route before measuring")
+    parser.add_argument("--routes", default="", help="only run routes whose name matches this regex")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for ids and request bodies")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response and prediction caches (in process)")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    # Read by the API modules at import, so set before main is imported
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+        os.environ["CROP_PREDICTION_CACHE_ENABLED"] = "false"
+
+    # The app logs with print(); keep stdout for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run_against_url(args) if args.url else run_in_process(args))
+
+    if report.get("uncovered_routes"):
+        print(f"⚠️ Routes without a load-test scenario: {', '.join(report['uncovered_routes'])}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(report, json.load(baseline_file))
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(body + "\n")
+    print(body)
+
+
+if __name__ == "__main__":
+    main()
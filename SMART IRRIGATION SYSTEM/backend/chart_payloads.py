@@ -0,0 +1,151 @@
+"""
+Pre-encoded soil chart payloads
+
+The soil chart-data endpoint used to rebuild the same nested dicts (NPK bars,
+health radar, comparison with optimal ranges) and run them through the stdlib
+encoder on every call, although they only change when a new `soil_analysis`
+row arrives for the land. `SoilChartPayloads` renders a land's latest row once,
+keeps the encoded bytes keyed by the row's identity (analysis_id, recorded_at,
+updated_at) and serves those bytes until a different row comes back.
+
+Colors, labels and optimal bands never depend on the row. They live in
+`SOIL_CHART_DESCRIPTOR`, which is served on its own with an ETag so clients can
+cache it indefinitely and request the compact payload that carries only the
+values. The full payload keeps its original shape for existing clients.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Tuple
+
+from fast_json import dumps
+
+SOIL_CHART_CACHE_MAX_LANDS = int(os.getenv("SOIL_CHART_CACHE_MAX_LANDS", "10000"))
+
+# Static chart metadata; `field` is the soil_analysis column each entry plots.
+# Radar values are scaled to 0-100: divide first, then multiply.
+SOIL_CHART_DESCRIPTOR = {
+    "npk_bar_chart": [
+        {"nutrient": "Nitrogen (N)", "field": "nitrogen", "color": "#15803d"},
+        {"nutrient": "Phosphorus (P)", "field": "phosphorus", "color": "#16a34a"},
+        {"nutrient": "Potassium (K)", "field": "potassium", "color": "#22c55e"}
+    ],
+    "soil_health_radar": [
+        {"metric": "pH Level", "field": "ph_level", "divide": 14, "multiply": 100, "optimal": 70},
+        {"metric": "Moisture", "field": "moisture_level", "optimal": 50},
+        {"metric": "Nitrogen", "field": "nitrogen", "optimal": 80},
+        {"metric": "Phosphorus", "field": "phosphorus", "optimal": 65},
+        {"metric": "Potassium", "field": "potassium", "optimal": 85},
+        {"metric": "Organic Matter", "field": "organic_matter", "multiply": 10, "optimal": 40}
+    ],
+    "comparison_chart": [
+        {"parameter": "pH", "field": "ph_level", "optimal_min": 6.0, "optimal_max": 7.5},
+        {"parameter": "Moisture", "field": "moisture_level", "optimal_min": 30, "optimal_max": 60},
+        {"parameter": "N", "field": "nitrogen", "optimal_min": 70, "optimal_max": 90},
+        {"parameter": "P", "field": "phosphorus", "optimal_min": 50, "optimal_max": 70},
+        {"parameter": "K", "field": "potassium", "optimal_min": 75, "optimal_max": 95}
+    ],
+    "raw_fields": ["ph_level", "moisture_level", "nitrogen", "phosphorus", "potassium", "organic_matter"]
+}
+
+SOIL_CHART_DESCRIPTOR_BODY = dumps(SOIL_CHART_DESCRIPTOR)
+# Changes whenever the descriptor does; compact payloads name the version they were rendered against
+SOIL_CHART_DESCRIPTOR_VERSION = hashlib.sha1(SOIL_CHART_DESCRIPTOR_BODY).hexdigest()[:12]
+SOIL_CHART_DESCRIPTOR_ETAG = f'"{SOIL_CHART_DESCRIPTOR_VERSION}"'
+
+
+def _radar_value(entry: dict, soil_data: dict):
+    value = soil_data.get(entry["field"], 0)
+    if "divide" in entry:
+        value = value / entry["divide"]
+    if "multiply" in entry:
+        value = value * entry["multiply"]
+    return value
+
+
+def render_soil_chart(land_id: int, soil_data: dict) -> dict:
+    """Full chart-data payload for one soil_analysis row"""
+    descriptor = SOIL_CHART_DESCRIPTOR
+    return {
+        "land_id": land_id,
+        "recorded_at": soil_data.get('recorded_at'),
+        "npk_bar_chart": [
+            {"nutrient": entry["nutrient"], "value": soil_data.get(entry["field"], 0), "color": entry["color"]}
+            for entry in descriptor["npk_bar_chart"]
+        ],
+        "soil_health_radar": [
+            {"metric": entry["metric"], "value": _radar_value(entry, soil_data), "optimal": entry["optimal"]}
+            for entry in descriptor["soil_health_radar"]
+        ],
+        "comparison_chart": [
+            {
+                "parameter": entry["parameter"],
+                "current": soil_data.get(entry["field"], 0),
+                "optimal_min": entry["optimal_min"],
+                "optimal_max": entry["optimal_max"]
+            }
+            for entry in descriptor["comparison_chart"]
+        ],
+        "raw_data": {field: soil_data.get(field, 0) for field in descriptor["raw_fields"]}
+    }
+
+
+def render_compact_soil_chart(land_id: int, soil_data: dict) -> dict:
+    """Values only, in descriptor order; labels, colors and optimal bands come from the descriptor"""
+    descriptor = SOIL_CHART_DESCRIPTOR
+    return {
+        "land_id": land_id,
+        "recorded_at": soil_data.get('recorded_at'),
+        "descriptor_version": SOIL_CHART_DESCRIPTOR_VERSION,
+        "npk_bar_chart": [soil_data.get(entry["field"], 0) for entry in descriptor["npk_bar_chart"]],
+        "soil_health_radar": [_radar_value(entry, soil_data) for entry in descriptor["soil_health_radar"]],
+        "comparison_chart": [soil_data.get(entry["field"], 0) for entry in descriptor["comparison_chart"]],
+        "raw_data": {field: soil_data.get(field, 0) for field in descriptor["raw_fields"]}
+    }
+
+
+class SoilChartPayloads:
+    """Encoded chart payloads per land, rendered once per soil_analysis row"""
+
+    def __init__(self, max_lands: int = SOIL_CHART_CACHE_MAX_LANDS):
+        self.max_lands = max_lands
+        # land_id -> (row identity, full bytes, compact bytes), least recently used first
+        self._payloads = OrderedDict()
+        self.renders = 0
+        self.hits = 0
+
+    @staticmethod
+    def _identity(soil_data: dict) -> Tuple:
+        return soil_data.get('analysis_id'), soil_data.get('recorded_at'), soil_data.get('updated_at')
+
+    def get(self, land_id: int, soil_data: dict, compact: bool = False) -> bytes:
+        identity = self._identity(soil_data)
+        stored = self._payloads.get(land_id)
+        if stored is not None and stored[0] == identity:
+            self._payloads.move_to_end(land_id)
+            self.hits += 1
+        else:
+            stored = (
+                identity,
+                dumps(render_soil_chart(land_id, soil_data)),
+                dumps(render_compact_soil_chart(land_id, soil_data))
+            )
+            self._payloads[land_id] = stored
+            self._payloads.move_to_end(land_id)
+            self.renders += 1
+            while len(self._payloads) > self.max_lands:
+                self._payloads.popitem(last=False)
+        return stored[2] if compact else stored[1]
+
+    def stats(self) -> dict:
+        return {
+            "lands": len(self._payloads),
+            "max_lands": self.max_lands,
+            "bytes": sum(len(full) + len(compact) for _, full, compact in self._payloads.values()),
+            "renders": self.renders,
+            "hits": self.hits,
+            "descriptor_version": SOIL_CHART_DESCRIPTOR_VERSION
+        }
+
+
+soil_chart_payloads = SoilChartPayloads()
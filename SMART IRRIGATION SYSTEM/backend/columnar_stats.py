@@ -0,0 +1,236 @@
+"""
+Columnar statistics over Supabase result sets
+
+Chart endpoints used to walk the same list of row dicts once per statistic
+(one pass for the average, one for the min, one per status bucket) and join
+related rows with a `next(...)` scan per row. A `ColumnarFrame` pulls each
+column out of the rows once, keeps it both as the original values and as a
+float64 array (missing and null values become NaN), and answers counts,
+means, min/max, percentiles and group-bys from those arrays.
+
+Min and max return the original row value rather than the float, so integer
+columns still serialize as integers. NaN values are left out of every
+statistic instead of failing the whole response.
+
+For long time ranges, `time_buckets` aggregates rows into fixed-width buckets
+(mean/min/max per metric) and `lttb_indices` picks the N rows that keep the
+visual shape of a series (Largest-Triangle-Three-Buckets), so a chart never
+needs more than a few hundred points.
+"""
+import re
+from datetime import datetime, timezone
+from typing import Hashable, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Stands in for a missing key while walking a nested path
+_MISSING = object()
+
+RESOLUTION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_RESOLUTION = re.compile(r"^\s*(\d+)\s*([smhdw])\s*$")
+
+
+def pluck(row: dict, path: str, default=None):
+    """Value at a dotted path (`sensor.land.land_name`); default if any step is missing or null"""
+    value = row
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return default
+        value = value.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+    return value
+
+
+def factorize(values: Iterable[Hashable]) -> Tuple[np.ndarray, list]:
+    """Integer code per value plus the distinct values in first-seen order"""
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64)
+    return codes, list(index)
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Timezone-aware datetime from an ISO 8601 string (naive means UTC), None if missing"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def format_timestamp(epoch_seconds: float) -> str:
+    return datetime.fromtimestamp(float(epoch_seconds), tz=timezone.utc).isoformat()
+
+
+def parse_resolution(text: str) -> int:
+    """Bucket width in seconds from `30s`, `15m`, `1h`, `1d` or `1w`"""
+    match = _RESOLUTION.match(text or "")
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid resolution '{text}', expected e.g. 15m, 1h, 1d or 1w")
+    return int(match.group(1)) * RESOLUTION_UNITS[match.group(2)]
+
+
+def lttb_indices(x: np.ndarray, series: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of `points` rows chosen by Largest-Triangle-Three-Buckets
+    `series` may hold several metrics as columns; each is scaled to 0-1 and their
+    triangle areas are added, so one set of rows keeps the shape of all of them
+    """
+    size = len(x)
+    if points >= size:
+        return np.arange(size)
+    if points < 3:
+        return np.array([0, size - 1][:points], dtype=np.int64)
+
+    x = np.asarray(x, dtype=np.float64) - x[0]
+    y = np.asarray(series, dtype=np.float64).reshape(size, -1)
+    low, high = np.nanmin(y, axis=0), np.nanmax(y, axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    # Missing values sit mid-range so they neither attract nor repel selection
+    y = np.nan_to_num((y - low) / span, nan=0.5)
+
+    # Middle rows split into points - 2 buckets; the first and last rows are always kept
+    bounds = (np.floor(np.arange(points - 1) * ((size - 2) / (points - 2))) + 1).astype(np.int64)
+    bounds[-1] = size - 1
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        next_lo, next_hi = (bounds[i + 1], bounds[i + 2]) if i + 2 < len(bounds) else (size - 1, size)
+        cx = x[next_lo:next_hi].mean()
+        cy = y[next_lo:next_hi].mean(axis=0)
+        bx, by = x[lo:hi, None], y[lo:hi]
+        areas = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a])).sum(axis=1)
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+class Groups:
+    """Rows split by the distinct values of one column"""
+
+    def __init__(self, codes: np.ndarray, keys: list, mask: Optional[np.ndarray] = None):
+        self.keys = keys
+        # Rows outside the mask get code -1 and belong to no group
+        self.codes = codes if mask is None else np.where(mask, codes, -1)
+        kept = self.codes[self.codes >= 0]
+        self.counts = np.bincount(kept, minlength=len(keys))
+        first = np.full(len(keys), len(self.codes), dtype=np.int64)
+        np.minimum.at(first, kept, np.flatnonzero(self.codes >= 0))
+        # Row where each group first appears, used to label and order groups
+        self.first = first
+
+    def ranked(self, limit: Optional[int] = None) -> list:
+        """(key, count, first_row) for non-empty groups, largest first, ties in first-seen order"""
+        present = np.flatnonzero(self.counts)
+        present = present[np.argsort(self.first[present], kind="stable")]
+        order = present[np.argsort(-self.counts[present], kind="stable")][:limit]
+        return [(self.keys[i], int(self.counts[i]), int(self.first[i])) for i in order]
+
+
+class ColumnarFrame:
+    def __init__(self, rows: Sequence[dict]):
+        self.rows = rows
+        self.size = len(rows)
+        self._values = {}
+        self._numeric = {}
+
+    # ---------- columns ----------
+
+    def values(self, column: str, default=None) -> list:
+        """Original values of a column, one per row"""
+        key = (column, default)
+        if key not in self._values:
+            if "." in column:
+                self._values[key] = [pluck(row, column, default) for row in self.rows]
+            else:
+                self._values[key] = [row.get(column, default) for row in self.rows]
+        return self._values[key]
+
+    def numeric(self, column: str, default=None) -> np.ndarray:
+        """Column as float64, NaN where the value is missing or null"""
+        key = (column, default)
+        if key not in self._numeric:
+            self._numeric[key] = np.array(self.values(column, default), dtype=np.float64).reshape(self.size)
+        return self._numeric[key]
+
+    def lookup(self, column: str, mapping: dict, default=None) -> list:
+        """Join a column against a dict built once from the related rows"""
+        return [mapping.get(value, default) for value in self.values(column)]
+
+    def timestamps(self, column: str) -> np.ndarray:
+        """Column of ISO timestamps as epoch seconds, NaN where missing"""
+        key = ("@timestamps", column)
+        if key not in self._numeric:
+            self._numeric[key] = np.array([
+                np.nan if parsed is None else parsed.timestamp()
+                for parsed in map(parse_timestamp, self.values(column))
+            ], dtype=np.float64).reshape(self.size)
+        return self._numeric[key]
+
+    def argsort(self, column: str, default=None) -> np.ndarray:
+        """Row order sorted by a column, stable for equal values"""
+        keys = np.empty(self.size, dtype=object)
+        keys[:] = self.values(column, default)
+        return np.argsort(keys, kind="stable")
+
+    # ---------- statistics ----------
+
+    def describe(self, column: str, default=None, ndigits: int = 2, percentiles: Sequence[float] = ()) -> dict:
+        """Count, rounded average, min and max (as stored) and optional percentiles of a numeric column"""
+        data = self.numeric(column, default)
+        present = np.flatnonzero(~np.isnan(data))
+        if not len(present):
+            summary = {"count": 0, "average": 0, "min": 0, "max": 0}
+            summary.update({f"p{q:g}": 0 for q in percentiles})
+            return summary
+        finite = data[present]
+        values = self.values(column, default)
+        summary = {
+            "count": int(len(present)),
+            "average": round(float(finite.mean()), ndigits),
+            "min": values[present[np.argmin(finite)]],
+            "max": values[present[np.argmax(finite)]]
+        }
+        if len(percentiles):
+            for q, value in zip(percentiles, np.percentile(finite, percentiles)):
+                summary[f"p{q:g}"] = round(float(value), ndigits)
+        return summary
+
+    def group_by(self, column: str, default=None, mask: Optional[np.ndarray] = None) -> Groups:
+        codes, keys = factorize(self.values(column, default))
+        return Groups(codes, keys, mask)
+
+    def time_buckets(self, time_column: str, metrics: Sequence[str], width: int) -> dict:
+        """
+        Aggregate rows into buckets `width` seconds wide, aligned to the epoch (UTC midnight for days)
+        Returns arrays: bucket start (epoch seconds), rows per bucket, and count/mean/min/max per metric
+        """
+        times = self.timestamps(time_column)
+        timed = ~np.isnan(times)
+        starts, codes = np.unique(np.floor(times[timed] / width), return_inverse=True)
+        size = len(starts)
+        buckets = {"start": starts * width, "rows": np.bincount(codes, minlength=size), "metrics": {}}
+        for metric in metrics:
+            data = self.numeric(metric)[timed]
+            present = ~np.isnan(data)
+            metric_codes, values = codes[present], data[present]
+            counts = np.bincount(metric_codes, minlength=size)
+            sums = np.bincount(metric_codes, weights=values, minlength=size)
+            minimums = np.full(size, np.inf)
+            maximums = np.full(size, -np.inf)
+            np.minimum.at(minimums, metric_codes, values)
+            np.maximum.at(maximums, metric_codes, values)
+            empty = counts == 0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / counts
+            buckets["metrics"][metric] = {
+                "count": counts,
+                "mean": np.where(empty, np.nan, means),
+                "min": np.where(empty, np.nan, minimums),
+                "max": np.where(empty, np.nan, maximums)
+            }
+        return buckets
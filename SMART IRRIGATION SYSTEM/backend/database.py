@@ -0,0 +1,214 @@
+"""
+Data-access layer for the Smart Irrigation System API
+
+supabase-py only ships a blocking query builder, so handlers never call
+`.execute()` themselves. They build the query with `table()` and await
+`execute()`, which runs the round trip on a bounded thread pool. All worker
+threads share one pooled httpx client, so concurrent queries reuse keep-alive
+connections to PostgREST instead of stalling the event loop.
+
+Identical reads that overlap share one round trip (single flight): while a
+GET/HEAD for the same table, filters, order, range and count mode is in
+flight, later callers wait for it instead of sending their own. Each caller
+that shares a result gets its own copy of the rows, so handlers can still
+modify what they receive. Writes are never shared.
+"""
+import asyncio
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+from supabase import create_client, Client, ClientOptions
+
+from metrics import db_queries, db_queries_coalesced, db_query_duration, db_response_bytes
+
+# Supabase configuration
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://enjjjqprgihcsmubvxyh.supabase.co")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY", "sb_publishable_pfFLEoIWFQmHYhjrqIGfrg_LQ5TMG7F")  # Replace with your actual key
+
+# Maximum number of PostgREST round trips in flight at once. Sizes both the
+# thread pool and the HTTP connection pool.
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "32"))
+DB_TIMEOUT_SECONDS = float(os.getenv("DB_TIMEOUT_SECONDS", "30"))
+DB_SINGLE_FLIGHT_ENABLED = os.getenv("DB_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+# Request headers that change what a read returns (count mode, single object, paging)
+SINGLE_FLIGHT_HEADERS = ("prefer", "accept", "range", "accept-profile")
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_CONCURRENCY, thread_name_prefix="supabase")
+_client: Optional[Client] = None
+# Body size of the last response received on each worker thread
+_transfer = threading.local()
+# Reads in flight: single-flight key -> _Flight
+_in_flight = {}
+_single_flight = {"queries": 0, "coalesced": 0}
+
+
+def _record_response(response: httpx.Response):
+    response.read()
+    _transfer.bytes = len(response.content)
+
+
+def _query_labels(query):
+    """(table, HTTP method) of a built query, for the per-table metrics"""
+    request = getattr(query, "request", None)
+    if request is None:
+        return "unknown", "unknown"
+    method = getattr(request.http_method, "value", request.http_method)
+    return request.path.path.rsplit("/", 1)[-1], str(method)
+
+
+def _run(query):
+    """Execute a query on the calling worker thread, counting and timing it per table"""
+    table_name, method = _query_labels(query)
+    _transfer.bytes = 0
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = query.execute()
+        outcome = "ok"
+        return response
+    finally:
+        db_query_duration.observe(time.perf_counter() - started, table=table_name, method=method)
+        db_queries.inc(table=table_name, method=method, outcome=outcome)
+        db_response_bytes.inc(_transfer.bytes, table=table_name)
+
+
+def create_supabase_client(transport: Optional[httpx.BaseTransport] = None) -> Client:
+    """
+    Create a Supabase client backed by a pooled httpx client
+    A custom transport can be passed to point the client at a local stand-in
+    """
+    http_client = httpx.Client(
+        transport=transport,
+        timeout=DB_TIMEOUT_SECONDS,
+        event_hooks={"response": [_record_response]},
+        limits=httpx.Limits(
+            max_connections=DB_MAX_CONCURRENCY,
+            max_keepalive_connections=DB_MAX_CONCURRENCY
+        )
+    )
+    return create_client(
+        SUPABASE_URL,
+        SUPABASE_KEY,
+        options=ClientOptions(httpx_client=http_client, postgrest_client_timeout=DB_TIMEOUT_SECONDS)
+    )
+
+
+def get_client() -> Client:
+    """Return the shared Supabase client"""
+    global _client
+    if _client is None:
+        _client = create_supabase_client()
+    return _client
+
+
+def has_client() -> bool:
+    """Whether the shared client has been created yet"""
+    return _client is not None
+
+
+def set_client(client: Client):
+    """Replace the shared Supabase client (benchmarks, local stand-ins)"""
+    global _client
+    _client = client
+
+
+def table(name: str):
+    """Start a query builder on the shared client"""
+    return get_client().table(name)
+
+
+def rpc(function: str, params: Optional[dict] = None):
+    """Call a Postgres function through PostgREST; await it with execute() like a table query"""
+    return get_client().rpc(function, params or {})
+
+
+class _Flight:
+    __slots__ = ("future", "followers")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.followers = 0
+
+
+def _single_flight_key(query) -> Optional[tuple]:
+    """Normalized (URL, method, sorted params, headers) of a read, None for writes"""
+    request = getattr(query, "request", None)
+    if request is None:
+        return None
+    method = str(getattr(request.http_method, "value", request.http_method))
+    if method not in ("GET", "HEAD"):
+        return None
+    # Filters are ANDed, so their order does not matter; `order` is a single parameter
+    params = tuple(sorted(request.params.multi_items()))
+    headers = tuple(request.headers.get(name) for name in SINGLE_FLIGHT_HEADERS)
+    return str(request.path), method, params, headers
+
+
+def _private_copy(response):
+    """The response with rows of its own, for a caller sharing an in-flight result"""
+    return response.model_copy(update={"data": copy.deepcopy(response.data)})
+
+
+async def execute(query):
+    """
+    Run a built query on the database thread pool and return its response
+    The event loop stays free to serve other requests during the round trip, and a read
+    identical to one already in flight waits for that one instead of querying again
+    """
+    loop = asyncio.get_running_loop()
+    key = _single_flight_key(query) if DB_SINGLE_FLIGHT_ENABLED else None
+    if key is None:
+        return await loop.run_in_executor(_executor, _run, query)
+    key = (id(loop),) + key
+
+    flight = _in_flight.get(key)
+    if flight is not None:
+        flight.followers += 1
+        _single_flight["coalesced"] += 1
+        db_queries_coalesced.inc(table=_query_labels(query)[0])
+        # Shielded: a caller that gives up must not cancel the query for the others
+        return _private_copy(await asyncio.shield(flight.future))
+
+    flight = _Flight(loop.run_in_executor(_executor, _run, query))
+    _in_flight[key] = flight
+    # Runs before any waiter resumes, so nobody joins a finished query
+    flight.future.add_done_callback(lambda _: _in_flight.pop(key, None))
+    _single_flight["queries"] += 1
+    response = await asyncio.shield(flight.future)
+    # Followers copy from the original, so it must stay untouched while any of them is waiting
+    return _private_copy(response) if flight.followers else response
+
+
+def _execute_measured(query):
+    response = _run(query)
+    return response, _transfer.bytes
+
+
+async def execute_measured(query):
+    """Like execute(), plus the size in bytes of the response body that came over the wire"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _execute_measured, query)
+
+
+def single_flight_stats() -> dict:
+    """Reads sent, reads that shared another's round trip instead, and reads in flight now"""
+    calls = _single_flight["queries"] + _single_flight["coalesced"]
+    return {
+        "enabled": DB_SINGLE_FLIGHT_ENABLED,
+        "in_flight": len(_in_flight),
+        **_single_flight,
+        "saved_ratio": round(_single_flight["coalesced"] / calls, 4) if calls else 0.0
+    }
+
+
+def shutdown():
+    """Release the thread pool and pooled HTTP connections"""
+    _executor.shutdown(wait=False, cancel_futures=True)
+    if _client is not None:
+        _client.postgrest.session.close()
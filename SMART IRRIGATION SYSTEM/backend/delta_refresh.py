@@ -0,0 +1,194 @@
+"""
+Delta-based background refresh with per-dataset adaptive intervals
+
+The system refresh used to re-read each dataset in full on one fixed
+30-minute timer. Now each dataset has a `sync` coroutine that fetches only
+rows past its own high-water mark and reports `{"rows", "bytes"}`, and runs
+on its own timer:
+
+- a sync that finds changes halves the interval (down to `min_seconds`),
+- a sync that finds nothing stretches it by half (up to `max_seconds`),
+
+so a busy dataset is followed closely and a quiet one costs almost nothing.
+Rows and bytes are counted per sync and per refresh cycle for the logs and
+`/api/refresh/stats`.
+
+`SensorStatusFeed` is the dataset behind the dashboard's sensor status: it
+reads the newest readings by (`recorded_at`, `reading_id`) from the sensor
+buffer, which the sensor running aggregates keep current, so it sends no
+query of its own.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from metrics import refresh_sync_duration
+
+# Longest interval of a dataset, as a multiple of its shortest
+DELTA_REFRESH_MAX_FACTOR = float(os.getenv("DELTA_REFRESH_MAX_FACTOR", "10"))
+SENSOR_STATUS_REFRESH_SECONDS = int(os.getenv("SENSOR_STATUS_REFRESH_SECONDS", "30"))
+FARMER_TOPOLOGY_SYNC_SECONDS = int(os.getenv("FARMER_TOPOLOGY_SYNC_SECONDS", "60"))
+
+# Interval multipliers after a sync with and without changes
+SPEED_UP = 0.5
+SLOW_DOWN = 1.5
+
+
+def format_bytes(size: int) -> str:
+    return f"{size / 1024:.1f} KB" if size >= 1024 else f"{size} B"
+
+
+class RefreshDataset:
+    def __init__(self, name: str, sync: Callable[[], Awaitable[dict]], min_seconds: float,
+                 max_seconds: Optional[float] = None, leader_only: bool = False):
+        self.name = name
+        self.sync_fn = sync
+        # Publishes shared data, so only the leader worker runs it
+        self.leader_only = leader_only
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds if max_seconds is not None else min_seconds * DELTA_REFRESH_MAX_FACTOR
+        self.interval = min_seconds
+        self.lock = asyncio.Lock()
+        self.syncs = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.last_sync = None
+        self.last_changed_at = None
+
+    async def sync(self) -> dict:
+        """Fetch this dataset's changes once and adapt its interval"""
+        async with self.lock:
+            started = time.perf_counter()
+            try:
+                result = await self.sync_fn()
+            except Exception:
+                self.errors += 1
+                refresh_sync_duration.observe(time.perf_counter() - started, dataset=self.name, outcome="error")
+                raise
+            refresh_sync_duration.observe(time.perf_counter() - started, dataset=self.name, outcome="ok")
+            rows, size = result.get("rows", 0), result.get("bytes", 0)
+            changed = result.get("changed", rows > 0)
+            factor = SPEED_UP if changed else SLOW_DOWN
+            self.interval = min(self.max_seconds, max(self.min_seconds, self.interval * factor))
+            self.syncs += 1
+            self.rows += rows
+            self.bytes += size
+            if changed:
+                self.last_changed_at = time.time()
+            self.last_sync = {
+                "rows": rows,
+                "bytes": size,
+                "changed": changed,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "at": time.time()
+            }
+            return self.last_sync
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": round(self.interval, 1),
+            "min_seconds": self.min_seconds,
+            "max_seconds": self.max_seconds,
+            "syncs": self.syncs,
+            "errors": self.errors,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "last_sync": self.last_sync,
+            "last_changed_at": self.last_changed_at
+        }
+
+
+class DeltaRefresher:
+    def __init__(self, is_leader: Callable[[], bool] = lambda: True):
+        self.is_leader = is_leader
+        self.datasets = {}
+        self._tasks = []
+        # Totals at the end of the last cycle, to report what the timers fetched in between
+        self._reported = {}
+
+    def add(self, dataset: RefreshDataset) -> RefreshDataset:
+        self.datasets[dataset.name] = dataset
+        self._reported[dataset.name] = (0, 0, 0)
+        return dataset
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run(dataset)) for dataset in self.datasets.values()]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, dataset: RefreshDataset):
+        while True:
+            await asyncio.sleep(dataset.interval)
+            if dataset.leader_only and not self.is_leader():
+                continue
+            try:
+                await dataset.sync()
+            except Exception as e:
+                print(f"⚠️ Delta refresh of {dataset.name} failed: {str(e)}")
+
+    async def cycle(self) -> dict:
+        """
+        Sync every dataset now; per dataset the rows and bytes of this sync and of
+        the timer syncs since the previous cycle
+        """
+        leader = self.is_leader()
+        names = [name for name, dataset in self.datasets.items() if leader or not dataset.leader_only]
+        results = await asyncio.gather(*(self.datasets[name].sync() for name in names), return_exceptions=True)
+        report = {}
+        for name, result in zip(names, results):
+            dataset = self.datasets[name]
+            syncs, rows, size = self._reported[name]
+            self._reported[name] = (dataset.syncs, dataset.rows, dataset.bytes)
+            report[name] = {
+                "result": result,
+                "timer_syncs": dataset.syncs - syncs - (0 if isinstance(result, Exception) else 1),
+                "rows_since_last_cycle": dataset.rows - rows,
+                "bytes_since_last_cycle": dataset.bytes - size,
+                "interval_seconds": round(dataset.interval, 1)
+            }
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "running": bool(self._tasks),
+            "leader": self.is_leader(),
+            "datasets": {name: dataset.stats() for name, dataset in self.datasets.items()}
+        }
+
+
+class SensorStatusFeed:
+    """Newest sensor readings, read from the sensor buffer's memory; `rows` counts readings above the last mark"""
+
+    def __init__(self, buffer, keep: int = 100):
+        self.buffer = buffer
+        self.keep = keep
+        # (recorded_at, reading_id, sensor_id) of the newest readings, newest first
+        self._newest = []
+        self.watermark = None
+
+    async def sync(self) -> dict:
+        rows = self.buffer.newest(self.keep)
+        if rows is None:
+            # The buffer has not had its first sync: look again at the shortest interval
+            return {"rows": 0, "bytes": 0, "changed": True}
+        self._newest = [(row['recorded_at'], row['reading_id'], row['sensor_id']) for row in rows if row.get('recorded_at')]
+        fresh = [item for item in self._newest if self.watermark is None or item[:2] > self.watermark]
+        if self._newest:
+            self.watermark = self._newest[0][:2]
+        return {"rows": len(fresh), "bytes": 0}
+
+    def status(self) -> Optional[dict]:
+        """Distinct sensors among the newest readings and the newest reading time, None before any reading"""
+        if not self._newest:
+            return None
+        return {
+            "active_sensors": len({item[2] for item in self._newest}),
+            "last_reading": self._newest[0][0]
+        }
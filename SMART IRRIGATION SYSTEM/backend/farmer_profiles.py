@@ -0,0 +1,263 @@
+"""
+Materialized per-farmer soil/climate profiles for farmer-specific auto-analysis
+
+A profile holds what `/api/crop-recommendation/auto-analyze-farmer/{farmer_id}`
+needs: the farmer's lands, average N/P/K/pH over all their soil analysis rows,
+average temperature/moisture over their most recent sensor readings, and the
+row counts behind them. Soil averages come from the per-land running
+aggregates; recent readings are kept per farmer in a small heap fed by the
+sensor aggregates' sync (when that sync was seeded without passing the older
+rows through, a farmer's heap is first loaded with one query). Both subscriptions drop the cached profile of the
+farmers whose rows changed, so the next request rebuilds it from memory.
+
+Land and sensor ownership (the "topology") is loaded with two queries. After
+that `sync_topology()` only fetches lands and sensors with ids above the
+highest seen, on the refresh job's adaptive interval; a full reload picks up
+edits and deletes, and runs when a farmer or sensor that is not in the
+topology yet shows up.
+"""
+import asyncio
+import bisect
+import heapq
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+import database as db
+from running_aggregates import RunningAggregates, soil_aggregates, sensor_aggregates
+
+FARMER_PROFILE_RECENT_READINGS = int(os.getenv("FARMER_PROFILE_RECENT_READINGS", "100"))
+# Readings of sensors missing from the topology, kept until it is reloaded
+FARMER_PROFILE_MAX_UNROUTED = int(os.getenv("FARMER_PROFILE_MAX_UNROUTED", "10000"))
+
+
+class FarmerProfiles:
+    def __init__(self, soil: RunningAggregates, sensors: RunningAggregates,
+                 recent_readings: int = FARMER_PROFILE_RECENT_READINGS):
+        self.soil = soil
+        self.sensors = sensors
+        self.recent_readings = recent_readings
+        self._land_farmer = {}
+        self._land_names = {}
+        self._farmer_lands = {}
+        self._sensor_land = {}
+        self._land_sensors = {}
+        self._sensor_ids = np.zeros(0, dtype=np.int64)
+        # Highest land_id / sensor_id seen, for sync_topology()
+        self._land_watermark = 0
+        self._sensor_watermark = 0
+        # farmer_id -> min-heap of (recorded_at, reading_id, temperature, moisture), newest kept
+        self._recent = {}
+        self._unrouted = deque(maxlen=FARMER_PROFILE_MAX_UNROUTED)
+        # False once the sensor sync was seeded; heaps then need one load per farmer of
+        # the readings up to the seeded watermark (later ones are routed by the sync)
+        self._recent_complete = True
+        self._seed_watermark = 0
+        self._recent_loaded = set()
+        self._recent_lock = asyncio.Lock()
+        self._profiles = {}
+        self._topology_lock = asyncio.Lock()
+        self.topology_loaded_at = None
+        self.hits = 0
+        self.builds = 0
+        self.lookups = 0
+        soil.subscribe(self._on_soil_rows, self._on_soil_reset, self._on_soil_reset)
+        sensors.subscribe(self._route_readings, on_seed=self._on_sensor_seed)
+
+    # ---------- topology ----------
+
+    async def load_topology(self) -> dict:
+        """Reload which lands belong to which farmer and which sensors to which land"""
+        async with self._topology_lock:
+            (lands_response, land_bytes), (sensors_response, sensor_bytes) = await asyncio.gather(
+                db.execute_measured(db.table('land').select('land_id, land_name, farmer_id')),
+                db.execute_measured(db.table('sensor').select('sensor_id, land_id'))
+            )
+            self._land_farmer, self._land_names, self._farmer_lands = {}, {}, {}
+            self._sensor_land, self._land_sensors = {}, {}
+            self._sensor_ids = np.zeros(0, dtype=np.int64)
+            self._land_watermark = self._sensor_watermark = 0
+            self._add_lands(lands_response.data or [])
+            self._add_sensors(sensors_response.data or [])
+            self._profiles.clear()
+            self.topology_loaded_at = time.monotonic()
+            self._reroute()
+            return {"rows": len(lands_response.data or []) + len(sensors_response.data or []), "bytes": land_bytes + sensor_bytes}
+
+    async def sync_topology(self) -> dict:
+        """
+        Add the lands and sensors created since the last load (ids above the watermarks)
+        The tables have no updated_at, so edits and deletes wait for the next full load_topology()
+        """
+        if self.topology_loaded_at is None:
+            return await self.load_topology()
+        async with self._topology_lock:
+            (lands_response, land_bytes), (sensors_response, sensor_bytes) = await asyncio.gather(
+                db.execute_measured(db.table('land').select('land_id, land_name, farmer_id').gt('land_id', self._land_watermark).order('land_id')),
+                db.execute_measured(db.table('sensor').select('sensor_id, land_id').gt('sensor_id', self._sensor_watermark).order('sensor_id'))
+            )
+            lands, sensors = lands_response.data or [], sensors_response.data or []
+            self._add_lands(lands)
+            self._add_sensors(sensors)
+            if lands or sensors:
+                self._reroute()
+            return {"rows": len(lands) + len(sensors), "bytes": land_bytes + sensor_bytes}
+
+    def _add_lands(self, lands: list):
+        for land in lands:
+            land_id, farmer_id = land['land_id'], land['farmer_id']
+            self._land_farmer[land_id] = farmer_id
+            self._land_names[land_id] = land.get('land_name')
+            farmer_lands = self._farmer_lands.setdefault(farmer_id, [])
+            if land_id not in farmer_lands:
+                bisect.insort(farmer_lands, land_id)
+            self._profiles.pop(farmer_id, None)
+            self._land_watermark = max(self._land_watermark, land_id)
+
+    def _add_sensors(self, sensors: list):
+        if not sensors:
+            return
+        for sensor in sensors:
+            sensor_id, land_id = sensor['sensor_id'], sensor['land_id']
+            self._sensor_land[sensor_id] = land_id
+            self._land_sensors.setdefault(land_id, []).append(sensor_id)
+            self._profiles.pop(self._land_farmer.get(land_id), None)
+            self._sensor_watermark = max(self._sensor_watermark, sensor_id)
+        self._sensor_ids = np.fromiter(self._sensor_land, dtype=np.int64, count=len(self._sensor_land))
+
+    def _reroute(self):
+        unrouted = list(self._unrouted)
+        self._unrouted.clear()
+        self._route_readings(unrouted)
+
+    @property
+    def unrouted(self) -> int:
+        return len(self._unrouted)
+
+    def land_of_sensor(self, sensor_id: int) -> Optional[int]:
+        return self._sensor_land.get(sensor_id)
+
+    def sensors_of_land(self, land_id: int) -> list:
+        return self._land_sensors.get(land_id, [])
+
+    def sensors_exist(self, sensor_ids: np.ndarray) -> np.ndarray:
+        """Mask of the sensor ids that are in the topology"""
+        return np.isin(sensor_ids, self._sensor_ids)
+
+    # ---------- updates from the running aggregates ----------
+
+    def _on_soil_rows(self, rows: list):
+        for land_id in {row.get('land_id') for row in rows}:
+            self._profiles.pop(self._land_farmer.get(land_id), None)
+
+    def _on_soil_reset(self):
+        self._profiles.clear()
+
+    def _on_sensor_seed(self):
+        self._recent_complete = False
+        self._seed_watermark = self.sensors.watermark
+
+    async def _load_recent(self, farmer_id: int):
+        """Fill a farmer's heap with their newest readings at or below the seeded watermark"""
+        async with self._recent_lock:
+            if farmer_id in self._recent_loaded:
+                return
+            sensor_ids = [sensor_id for land_id in self._farmer_lands.get(farmer_id, []) for sensor_id in self._land_sensors.get(land_id, [])]
+            if sensor_ids:
+                response = await db.execute(
+                    db.table('sensor_readings').select('reading_id, sensor_id, temperature, moisture, recorded_at')
+                    .in_('sensor_id', sensor_ids)
+                    .lte('reading_id', self._seed_watermark)
+                    .order('recorded_at', desc=True)
+                    .order('reading_id', desc=True)
+                    .limit(self.recent_readings)
+                )
+                self._route_readings(response.data or [])
+            self._recent_loaded.add(farmer_id)
+            self._profiles.pop(farmer_id, None)
+
+    def _route_readings(self, rows: list):
+        for row in rows:
+            farmer_id = self._land_farmer.get(self._sensor_land.get(row.get('sensor_id')))
+            if farmer_id is None:
+                self._unrouted.append(row)
+                continue
+            heap = self._recent.setdefault(farmer_id, [])
+            item = (row.get('recorded_at') or '', row['reading_id'], row.get('temperature'), row.get('moisture'))
+            if len(heap) < self.recent_readings:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            else:
+                continue
+            self._profiles.pop(farmer_id, None)
+
+    # ---------- reading ----------
+
+    def _build(self, farmer_id: int) -> dict:
+        land_ids = self._farmer_lands[farmer_id]
+        soil = self.soil.summary(land_ids)
+        readings = self._recent.get(farmer_id, [])
+        temperatures = [r[2] for r in readings if r[2] is not None]
+        moistures = [r[3] for r in readings if r[3] is not None]
+        self.builds += 1
+        return {
+            "farmer_id": farmer_id,
+            "land_ids": land_ids,
+            "land_names": [self._land_names.get(land_id) for land_id in land_ids],
+            "soil_records": soil["rows"],
+            "soil": soil["metrics"],
+            "recent_readings": len(readings),
+            "recent_temperature": sum(temperatures) / len(temperatures) if temperatures else None,
+            "recent_moisture": sum(moistures) / len(moistures) if moistures else None,
+            "built_at": time.time()
+        }
+
+    def cached(self, farmer_id: int) -> Optional[dict]:
+        """Profile from memory, rebuilt if its rows changed; None if the farmer has no known lands"""
+        profile = self._profiles.get(farmer_id)
+        if profile is not None:
+            self.hits += 1
+            return profile
+        if farmer_id not in self._farmer_lands:
+            return None
+        profile = self._profiles[farmer_id] = self._build(farmer_id)
+        return profile
+
+    async def get(self, farmer_id: int) -> Optional[dict]:
+        """
+        Profile for a farmer; a farmer missing from the topology costs one lookup
+        to tell a farmer added since the last reload from one with no lands
+        """
+        if not self._recent_complete and farmer_id in self._farmer_lands and farmer_id not in self._recent_loaded:
+            await self._load_recent(farmer_id)
+        profile = self.cached(farmer_id)
+        if profile is not None:
+            return profile
+        self.lookups += 1
+        lands_response = await db.execute(db.table('land').select('land_id').eq('farmer_id', farmer_id).limit(1))
+        if not lands_response.data:
+            return None
+        await self.load_topology()
+        if not self._recent_complete and farmer_id not in self._recent_loaded:
+            await self._load_recent(farmer_id)
+        return self.cached(farmer_id)
+
+    def stats(self) -> dict:
+        return {
+            "farmers": len(self._farmer_lands),
+            "lands": len(self._land_farmer),
+            "sensors": len(self._sensor_land),
+            "cached_profiles": len(self._profiles),
+            "hits": self.hits,
+            "builds": self.builds,
+            "lookups": self.lookups,
+            "unrouted_readings": len(self._unrouted),
+            "topology_age_seconds": round(time.monotonic() - self.topology_loaded_at, 1) if self.topology_loaded_at is not None else None
+        }
+
+
+farmer_profiles = FarmerProfiles(soil_aggregates, sensor_aggregates)
@@ -0,0 +1,42 @@
+"""
+JSON encoding for hot response paths
+
+`dumps` returns UTF-8 bytes using orjson (listed in requirements.txt) and the
+standard library when it is missing, with the same compact output Starlette's
+`JSONResponse` produces. `FastJSONResponse` is a drop-in `JSONResponse` that
+renders through it and is the app's default response class, and
+`json_bytes_response` serves a body that was encoded earlier.
+"""
+import json
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_AVAILABLE = orjson is not None
+JSON_ENCODER = "orjson" if ORJSON_AVAILABLE else "json"
+
+if ORJSON_AVAILABLE:
+    # Integer dict keys (land ids) and NumPy scalars/arrays are encoded like the stdlib would after conversion
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON bytes"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=_ORJSON_OPTIONS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """Response for a body that is already encoded JSON"""
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
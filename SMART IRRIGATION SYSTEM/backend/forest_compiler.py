@@ -0,0 +1,141 @@
+"""
+Pure-NumPy evaluator for the crop-recommendation RandomForest
+
+`compile_forest` flattens every tree of a fitted RandomForestClassifier into
+one set of contiguous node arrays (split feature, threshold, left/right child,
+per-class leaf probabilities). `CompiledForest.predict_proba` then walks all
+trees for all rows at once: one vectorized step per tree level instead of
+sklearn's per-call validation, thread dispatch and per-tree Python loop.
+
+Leaves point to themselves with an infinite threshold, so every row can take
+exactly `max_depth` steps without checking whether it already reached a leaf.
+Splits are evaluated on float32 inputs, NaN follows each split's
+`missing_go_to_left` side, and leaf probabilities are normalized and summed
+tree by tree exactly like sklearn, so the output matches `model.predict_proba`.
+
+Convert a pickled model once with:
+    python forest_compiler.py crop_model.pkl crop_model.forest.npz
+"""
+import sys
+from typing import Optional
+
+import numpy as np
+
+# Rows scored per traversal chunk; bounds the (rows, trees, classes) gather buffer
+COMPILED_FOREST_CHUNK_ROWS = 256
+
+
+class CompiledForest:
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, classes: np.ndarray, n_features: int,
+                 missing_left: Optional[np.ndarray] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Side taken by NaN at each split (sklearn sends it right when the tree predates missing-value support)
+        self.missing_left = missing_left if missing_left is not None else np.zeros(len(feature), dtype=bool)
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features = int(n_features)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Average per-tree class probabilities for an (N, n_features) matrix"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features).astype(np.float64)
+        if len(X) <= COMPILED_FOREST_CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate([
+            self._predict_chunk(X[start:start + COMPILED_FOREST_CHUNK_ROWS])
+            for start in range(0, len(X), COMPILED_FOREST_CHUNK_ROWS)
+        ])
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows = len(X)
+        flat = X.ravel()
+        row_offsets = (np.arange(n_rows) * self.n_features)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+        for _ in range(self.max_depth):
+            values = flat[row_offsets + self.feature[nodes]]
+            go_left = (values <= self.threshold[nodes]) | (np.isnan(values) & self.missing_left[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        # Summing over the tree axis adds one tree at a time, in the same order as sklearn
+        return self.value[nodes].sum(axis=1) / self.n_trees
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, max_depth=self.max_depth, missing_left=self.missing_left,
+            classes=self.classes_.astype(str), n_features=self.n_features
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        with np.load(path) as data:
+            return cls(
+                data["feature"], data["threshold"], data["left"], data["right"], data["value"],
+                data["roots"], int(data["max_depth"]), data["classes"], int(data["n_features"]),
+                data["missing_left"] if "missing_left" in data.files else None
+            )
+
+
+def compile_forest(model, n_features: Optional[int] = None) -> CompiledForest:
+    """Flatten a fitted single-output RandomForestClassifier into a CompiledForest"""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    counts = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    total = int(counts.sum())
+    n_classes = len(model.classes_)
+
+    feature = np.zeros(total, dtype=np.intp)
+    threshold = np.full(total, np.inf)
+    left = np.empty(total, dtype=np.intp)
+    right = np.empty(total, dtype=np.intp)
+    value = np.empty((total, n_classes))
+    missing_left = np.zeros(total, dtype=bool)
+
+    for tree, offset, count in zip(trees, offsets, counts):
+        nodes = slice(offset, offset + count)
+        own = np.arange(offset, offset + count)
+        is_leaf = tree.children_left == -1
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+        left[nodes] = np.where(is_leaf, own, tree.children_left + offset)
+        right[nodes] = np.where(is_leaf, own, tree.children_right + offset)
+        if getattr(tree, "missing_go_to_left", None) is not None:
+            missing_left[nodes] = np.asarray(tree.missing_go_to_left, dtype=bool) & ~is_leaf
+        # Same per-leaf normalization as DecisionTreeClassifier.predict_proba
+        leaf_value = tree.value[:, 0, :n_classes]
+        normalizer = leaf_value.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        value[nodes] = leaf_value / normalizer
+
+    return CompiledForest(
+        feature, threshold, left, right, value,
+        roots=offsets.astype(np.intp),
+        max_depth=max(tree.max_depth for tree in trees),
+        classes=np.asarray(model.classes_),
+        n_features=n_features or model.n_features_in_,
+        missing_left=missing_left
+    )
+
+
+if __name__ == "__main__":
+    import joblib
+
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python forest_compiler.py <model.pkl> <output.npz>")
+    forest = compile_forest(joblib.load(sys.argv[1]))
+    forest.save(sys.argv[2])
+    print(f"✓ Compiled {forest.n_trees} trees ({forest.n_nodes} nodes, depth {forest.max_depth}) to {sys.argv[2]}")
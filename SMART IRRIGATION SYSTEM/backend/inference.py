@@ -0,0 +1,175 @@
+"""
+Shared crop-recommendation inference
+
+Every endpoint that scores soil samples goes through `CropInferenceEngine`.
+The RandomForest is walked once per call (`predict_proba`); the predicted
+label is the probability argmax, which is exactly what `predict` computes
+internally, and top-k ranking uses `argpartition` instead of a full sort.
+
+With the `numpy` backend the forest is also flattened into a `CompiledForest`
+(`forest_compiler.py`) when it is loaded. Small batches, which is every
+single-row request and micro-batch, are scored by that vectorized NumPy walk
+without sklearn's per-call overhead; larger batches, where sklearn's compiled
+traversal wins, still go to the sklearn model. Both give identical probabilities.
+
+The model is loaded lazily: constructing the engine is free, and the pickle is
+read on a worker thread by `ensure_loaded()` (started in the background at app
+startup), so importing the API never pays for it.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from forest_compiler import compile_forest
+from metrics import record_inference
+
+# Feature order expected by crop_model.pkl
+FEATURE_NAMES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+# joblib mmap_mode for loading the model ("r" maps stored numpy arrays instead of copying them)
+CROP_MODEL_MMAP_MODE = os.getenv("CROP_MODEL_MMAP_MODE", "r") or None
+
+# "numpy" scores small batches with the compiled forest, "sklearn" always calls the model
+CROP_INFERENCE_BACKEND = os.getenv("CROP_INFERENCE_BACKEND", "numpy").lower()
+# Largest batch scored by the compiled forest; sklearn is faster above roughly 300 rows
+CROP_COMPILED_FOREST_MAX_ROWS = int(os.getenv("CROP_COMPILED_FOREST_MAX_ROWS", "256"))
+
+
+def top_k_indices(probabilities: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return the indices of the k largest probabilities per row, best first
+    Partial selection is O(n_classes) per row; only the k winners get sorted.
+    Equal probabilities rank by class index, so rank 1 is always the argmax
+    label that `predict` would return
+    """
+    probabilities = np.atleast_2d(probabilities)
+    n_rows, n_classes = probabilities.shape
+    k = max(1, min(k, n_classes))
+
+    # Keep everything above the k-th largest value, then fill up with the
+    # left-most classes tied at it
+    kth = np.partition(probabilities, n_classes - k, axis=1)[:, n_classes - k][:, None]
+    above = probabilities > kth
+    tied = probabilities == kth
+    needed = k - above.sum(axis=1, keepdims=True)
+    selected = above | (tied & (np.cumsum(tied, axis=1) <= needed))
+    candidates = np.nonzero(selected)[1].reshape(n_rows, k)
+
+    candidate_scores = np.take_along_axis(probabilities, candidates, axis=1)
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def file_version(path: str) -> str:
+    """Short content hash identifying a model file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class CropInferenceEngine:
+    def __init__(self, model=None, model_path: Optional[str] = None, mmap_mode: Optional[str] = CROP_MODEL_MMAP_MODE,
+                 backend: str = CROP_INFERENCE_BACKEND, compiled_max_rows: int = CROP_COMPILED_FOREST_MAX_ROWS):
+        if backend not in ("numpy", "sklearn"):
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.model_path = model_path
+        self.mmap_mode = mmap_mode
+        self.backend = backend
+        self.compiled_max_rows = compiled_max_rows
+        self.model = None
+        self.model_version = None
+        self.forest = None
+        self.classes = []
+        self.load_seconds = None
+        self.load_error = None
+        self._load_lock = threading.Lock()
+        if model is not None:
+            self._set_model(model)
+
+    def _set_model(self, model, model_version: Optional[str] = None):
+        if self.backend == "numpy":
+            try:
+                self.forest = compile_forest(model, len(FEATURE_NAMES))
+            except Exception as e:
+                print(f"⚠️ Warning: Could not compile crop model, using sklearn inference: {str(e)}")
+        self.classes = [str(c) for c in model.classes_]
+        self.model_version = model_version or f"{type(model).__name__}-{id(model):x}"
+        self.model = model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self):
+        """Load the model from model_path (blocking; safe to call from several threads)"""
+        with self._load_lock:
+            if self.model is None:
+                started = time.perf_counter()
+                try:
+                    self._set_model(joblib.load(self.model_path, mmap_mode=self.mmap_mode), file_version(self.model_path))
+                except Exception as e:
+                    self.load_error = str(e)
+                    print(f"⚠️ Warning: Could not load crop model: {str(e)}")
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.load_error = None
+                print(f"✓ Crop recommendation model loaded successfully from {self.model_path} in {self.load_seconds * 1000:.0f} ms")
+        return self.model
+
+    async def ensure_loaded(self) -> bool:
+        """Load the model off the event loop if needed; False if it cannot be loaded"""
+        if self.model is not None:
+            return True
+        try:
+            await asyncio.to_thread(self.load)
+            return True
+        except Exception:
+            return False
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Run the forest once over an (N, 7) feature matrix"""
+        started = time.perf_counter()
+        matrix = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+        if self.forest is not None and len(matrix) <= self.compiled_max_rows:
+            probabilities = self.forest.predict_proba(matrix)
+            record_inference("compiled_forest", len(matrix), started)
+        else:
+            probabilities = self.model.predict_proba(matrix)
+            record_inference("sklearn", len(matrix), started)
+        return probabilities
+
+    def rank(self, probabilities: np.ndarray, top_k: int = 3) -> List[dict]:
+        """Turn an (N, n_classes) probability matrix into per-row predictions"""
+        top = top_k_indices(probabilities, top_k)
+        results = []
+        for row, indices in enumerate(top):
+            best = indices[0]
+            results.append({
+                "recommended_crop": self.classes[best],
+                "confidence": float(probabilities[row, best] * 100),
+                "top_recommendations": [
+                    {
+                        "rank": rank + 1,
+                        "crop_name": self.classes[idx],
+                        "probability": float(probabilities[row, idx] * 100)
+                    }
+                    for rank, idx in enumerate(indices)
+                ]
+            })
+        return results
+
+    def predict_batch(self, features: np.ndarray, top_k: int = 3) -> List[dict]:
+        """Score many samples with a single forest pass"""
+        return self.rank(self.predict_proba(features), top_k)
+
+    def predict_one(self, features: Sequence[float], top_k: int = 3) -> dict:
+        """Score one sample given in FEATURE_NAMES order"""
+        return self.predict_batch(np.asarray([features], dtype=np.float64), top_k)[0]
@@ -0,0 +1,312 @@
+"""
+Live per-land updates for dashboards over Server-Sent Events and WebSockets
+
+Instead of every open dashboard re-polling chart-data, water-level and sensor
+endpoints, a client subscribes to the lands it shows and receives only what
+changed:
+
+- `reading`: a new sensor reading (from the sensor running aggregates' sync),
+- `water_level`: a water resource row whose level changed,
+- `recommendations`: the land's top crop recommendations changed.
+
+One poller serves every subscriber. While anyone is subscribed it runs every
+`LIVE_UPDATES_POLL_SECONDS`: an incremental sensor sync, then one water-level
+query and one recommendation query covering all subscribed lands (a land keeps
+one row per crop, so the top N per land are picked in memory), diffed against
+the previous poll. Each event is encoded once and the same
+string is queued for every subscriber of its land, so upstream cost does not
+grow with the number of sessions. A land's first poll only records a baseline; clients load the
+initial state from the regular endpoints.
+
+A subscriber whose queue overflows gets a single `resync` event in place of the
+events it missed. Recent events are kept so an SSE client reconnecting with
+`Last-Event-ID` gets what it missed. A `resync` carries the id of the latest
+event, so a client that reloads and reconnects from it is not resynced again.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Iterable, Optional
+
+import database as db
+from farmer_profiles import FarmerProfiles, farmer_profiles
+from response_cache import response_cache
+from running_aggregates import RunningAggregates, sensor_aggregates
+
+LIVE_UPDATES_POLL_SECONDS = float(os.getenv("LIVE_UPDATES_POLL_SECONDS", "5"))
+LIVE_UPDATES_QUEUE_SIZE = int(os.getenv("LIVE_UPDATES_QUEUE_SIZE", "256"))
+LIVE_UPDATES_MAX_SUBSCRIBERS = int(os.getenv("LIVE_UPDATES_MAX_SUBSCRIBERS", "10000"))
+LIVE_UPDATES_MAX_LANDS = int(os.getenv("LIVE_UPDATES_MAX_LANDS", "100"))
+LIVE_UPDATES_HEARTBEAT_SECONDS = float(os.getenv("LIVE_UPDATES_HEARTBEAT_SECONDS", "15"))
+# Recent events kept for SSE reconnects with Last-Event-ID
+LIVE_UPDATES_HISTORY = int(os.getenv("LIVE_UPDATES_HISTORY", "1000"))
+
+# Recommendations sent per land in a `recommendations` event
+RECOMMENDATIONS_PER_EVENT = 5
+# Largest `in` filter per poll query
+POLL_CHUNK_IDS = 500
+
+
+class LiveUpdatesFull(Exception):
+    """Subscriber or land limit reached"""
+
+
+class LiveEvent:
+    __slots__ = ("id", "type", "land_id", "data", "sse")
+
+    def __init__(self, event_id: int, event_type: str, land_id: Optional[int], payload: dict):
+        self.id = event_id
+        self.type = event_type
+        self.land_id = land_id
+        # Encoded once, shared by every subscriber
+        self.data = json.dumps({"id": event_id, "type": event_type, "land_id": land_id, **payload}, default=str)
+        self.sse = f"id: {event_id}\nevent: {event_type}\ndata: {self.data}\n\n"
+
+
+class LiveSubscriber:
+    __slots__ = ("land_ids", "queue", "connected_at", "transport", "delivered", "resyncs")
+
+    def __init__(self, land_ids: set, transport: str, queue_size: int):
+        self.land_ids = land_ids
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.connected_at = time.monotonic()
+        self.transport = transport
+        self.delivered = 0
+        self.resyncs = 0
+
+
+class LiveUpdateHub:
+    def __init__(self, sensors: RunningAggregates, profiles: FarmerProfiles,
+                 poll_seconds: float = LIVE_UPDATES_POLL_SECONDS, queue_size: int = LIVE_UPDATES_QUEUE_SIZE):
+        self.sensors = sensors
+        self.profiles = profiles
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self._subscribers = set()
+        # land_id -> subscribers of that land
+        self._by_land = {}
+        self._history = deque(maxlen=LIVE_UPDATES_HISTORY)
+        self._next_id = 1
+        self._has_subscribers = asyncio.Event()
+        self._worker = None
+        # Previous poll: lands it covered, water_id -> (land_id, sensor_id, level), land_id -> top recommendations
+        self._water_lands = set()
+        self._water = {}
+        self._recommendation_lands = set()
+        self._recommendations = {}
+        self.polls = 0
+        self.poll_errors = 0
+        self.last_poll_ms = None
+        self.events = {"reading": 0, "water_level": 0, "recommendations": 0, "resync": 0}
+        sensors.subscribe(self._on_readings)
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    # ---------- subscriptions ----------
+
+    def subscribe(self, land_ids: Iterable[int], transport: str) -> LiveSubscriber:
+        if len(self._subscribers) >= LIVE_UPDATES_MAX_SUBSCRIBERS:
+            raise LiveUpdatesFull(f"Live updates are at their limit of {LIVE_UPDATES_MAX_SUBSCRIBERS} subscribers")
+        subscriber = LiveSubscriber(set(), transport, self.queue_size)
+        self._subscribers.add(subscriber)
+        try:
+            self.update(subscriber, add=land_ids)
+        except LiveUpdatesFull:
+            self.unsubscribe(subscriber)
+            raise
+        self._has_subscribers.set()
+        return subscriber
+
+    def update(self, subscriber: LiveSubscriber, add: Iterable[int] = (), remove: Iterable[int] = ()):
+        add, remove = set(add), set(remove)
+        if len((subscriber.land_ids | add) - remove) > LIVE_UPDATES_MAX_LANDS:
+            raise LiveUpdatesFull(f"At most {LIVE_UPDATES_MAX_LANDS} lands per subscription")
+        for land_id in remove & subscriber.land_ids:
+            subscribers = self._by_land[land_id]
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._by_land[land_id]
+        for land_id in add - subscriber.land_ids:
+            self._by_land.setdefault(land_id, set()).add(subscriber)
+        subscriber.land_ids = (subscriber.land_ids | add) - remove
+
+    def unsubscribe(self, subscriber: LiveSubscriber):
+        self.update(subscriber, remove=set(subscriber.land_ids))
+        self._subscribers.discard(subscriber)
+        if not self._subscribers:
+            self._has_subscribers.clear()
+
+    def replay(self, subscriber: LiveSubscriber, last_event_id: int):
+        """Queue the kept events after last_event_id for the subscriber's lands (resync if they are gone)"""
+        # Ids past the last event were issued before a restart
+        if last_event_id >= self._next_id or (self._history and self._history[0].id > last_event_id + 1):
+            self._deliver(subscriber, self._resync_event())
+            return
+        for event in self._history:
+            if event.id > last_event_id and event.land_id in subscriber.land_ids:
+                self._deliver(subscriber, event)
+
+    # ---------- publishing ----------
+
+    def publish(self, event_type: str, land_id: int, payload: dict) -> Optional[LiveEvent]:
+        subscribers = self._by_land.get(land_id)
+        if not subscribers:
+            return None
+        event = LiveEvent(self._next_id, event_type, land_id, {**payload, "at": datetime.now().isoformat()})
+        self._next_id += 1
+        self._history.append(event)
+        self.events[event_type] += 1
+        # Changed outside this process too, so cached responses for the land are stale
+        if event_type != "reading":
+            response_cache.invalidate_land(land_id)
+        for subscriber in list(subscribers):
+            self._deliver(subscriber, event)
+        return event
+
+    def _resync_event(self) -> LiveEvent:
+        self.events["resync"] += 1
+        # Not kept in the history; carries the latest id so replaying from it skips what was dropped
+        return LiveEvent(self._next_id - 1, "resync", None, {"reason": "events were dropped, reload the charts"})
+
+    def _deliver(self, subscriber: LiveSubscriber, event: LiveEvent):
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: replace the backlog with one resync
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.resyncs += 1
+            subscriber.queue.put_nowait(self._resync_event())
+
+    def _on_readings(self, rows: list):
+        # The first full pass is history, not news
+        if not self._by_land or self.sensors.synced_at is None:
+            return
+        for row in rows:
+            land_id = self.profiles.land_of_sensor(row.get('sensor_id'))
+            if land_id in self._by_land:
+                self.publish("reading", land_id, {
+                    "reading_id": row.get('reading_id'),
+                    "sensor_id": row.get('sensor_id'),
+                    "temperature": row.get('temperature'),
+                    "moisture": row.get('moisture'),
+                    "recorded_at": row.get('recorded_at')
+                })
+
+    # ---------- shared upstream poll ----------
+
+    async def _run(self):
+        while True:
+            await self._has_subscribers.wait()
+            started = time.perf_counter()
+            try:
+                await self.poll()
+            except Exception as e:
+                self.poll_errors += 1
+                print(f"⚠️ Live updates poll failed: {str(e)}")
+            self.last_poll_ms = round((time.perf_counter() - started) * 1000, 2)
+            await asyncio.sleep(self.poll_seconds)
+
+    async def poll(self):
+        """One round for all subscribers: new readings, water level changes, recommendation changes"""
+        self.polls += 1
+        if self.profiles.topology_loaded_at is None:
+            await self.profiles.load_topology()
+        await self.sensors.sync(max_age=self.poll_seconds / 2)
+        lands = sorted(self._by_land)
+        await asyncio.gather(self._poll_water(lands), self._poll_recommendations(lands))
+
+    @staticmethod
+    async def _select_in(table: str, columns: str, column: str, ids: list) -> list:
+        chunks = [ids[i:i + POLL_CHUNK_IDS] for i in range(0, len(ids), POLL_CHUNK_IDS)]
+        responses = await asyncio.gather(*(
+            db.execute(db.table(table).select(columns).in_(column, chunk)) for chunk in chunks
+        ))
+        return [row for response in responses for row in response.data or []]
+
+    async def _poll_water(self, lands: list):
+        sensor_ids = [sensor_id for land_id in lands for sensor_id in self.profiles.sensors_of_land(land_id)]
+        rows = await self._select_in('water_resource', 'water_id, sensor_id, water_level', 'sensor_id', sensor_ids) if sensor_ids else []
+        current = {}
+        for row in rows:
+            land_id = self.profiles.land_of_sensor(row.get('sensor_id'))
+            current[row.get('water_id')] = (land_id, row.get('sensor_id'), row.get('water_level'))
+        for water_id, (land_id, sensor_id, level) in current.items():
+            previous = self._water.get(water_id)
+            # Lands polled for the first time only set the baseline
+            if land_id in self._water_lands and (previous is None or previous[2] != level):
+                self.publish("water_level", land_id, {
+                    "water_id": water_id,
+                    "sensor_id": sensor_id,
+                    "water_level": level,
+                    "previous_water_level": previous[2] if previous is not None else None
+                })
+        self._water, self._water_lands = current, set(lands)
+
+    @staticmethod
+    def _ranking(row: dict) -> tuple:
+        """Sort key of the keyset listing: suitability_score DESC NULLS LAST, recommendation_id DESC"""
+        score = row.get('suitability_score')
+        return (score is None, -(score or 0), -(row.get('recommendation_id') or 0))
+
+    async def _poll_recommendations(self, lands: list):
+        # One query for every subscribed land: (land_id, crop_name) is unique, so it is a few rows per land
+        rows = await self._select_in(
+            'crop_recommendations', 'recommendation_id, land_id, crop_name, suitability_score, is_optimal, crop_type',
+            'land_id', lands
+        ) if lands else []
+        by_land = {}
+        for row in rows:
+            by_land.setdefault(row.get('land_id'), []).append(row)
+        current = {}
+        for land_id, land_rows in by_land.items():
+            land_rows.sort(key=self._ranking)
+            current[land_id] = tuple(
+                (row.get('crop_name'), row.get('suitability_score'), row.get('is_optimal'), row.get('crop_type'))
+                for row in land_rows[:RECOMMENDATIONS_PER_EVENT]
+            )
+        for land_id in lands:
+            top = current.get(land_id, ())
+            if land_id in self._recommendation_lands and top != self._recommendations.get(land_id, ()):
+                self.publish("recommendations", land_id, {
+                    "crops": [
+                        {"crop_name": name, "suitability_score": score, "is_optimal": optimal, "crop_type": crop_type}
+                        for name, score, optimal, crop_type in top
+                    ]
+                })
+        self._recommendations, self._recommendation_lands = current, set(lands)
+
+    def stats(self) -> dict:
+        by_transport = {}
+        for subscriber in self._subscribers:
+            by_transport[subscriber.transport] = by_transport.get(subscriber.transport, 0) + 1
+        return {
+            "running": self._worker is not None,
+            "subscribers": len(self._subscribers),
+            "by_transport": by_transport,
+            "lands": len(self._by_land),
+            "poll_seconds": self.poll_seconds,
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "last_poll_ms": self.last_poll_ms,
+            "events": dict(self.events),
+            "queued_events": sum(subscriber.queue.qsize() for subscriber in self._subscribers),
+            "last_event_id": self._next_id - 1
+        }
+
+
+live_updates = LiveUpdateHub(sensor_aggregates, farmer_profiles)
@@ -1,19 +1,40 @@
-from fastapi import FastAPI, HTTPException
+import time
+BOOT_STARTED = time.perf_counter()
+
+from fastapi import Body, FastAPI, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 import os
-from typing import Optional
-from supabase import create_client, Client
+import json
+import functools
+from typing import Any, List, Optional
 from pydantic import BaseModel
-import joblib
 import numpy as np
 import warnings
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime
 import asyncio
+import database as db
+from inference import CropInferenceEngine, CROP_INFERENCE_BACKEND
+from micro_batching import MicroBatcher, CROP_MICRO_BATCH_ENABLED
+from model_pool import ModelPool, CROP_MODEL_WORKERS, CROP_MODEL_WORKER_HEALTH_SECONDS
+from response_cache import response_cache
+from prediction_cache import prediction_cache
+from running_aggregates import soil_aggregates, sensor_aggregates, RUNNING_AGGREGATES_SYNC_SECONDS, RUNNING_AGGREGATES_REBUILD_HOURS, RUNNING_AGGREGATES_RECENT_READINGS
+from farmer_profiles import farmer_profiles
+from sensor_buffer import sensor_buffer
+from sensor_ingest import SensorIngestQueue, IngestRejected
+from live_updates import live_updates, LiveUpdatesFull, LIVE_UPDATES_HEARTBEAT_SECONDS
+from chart_payloads import soil_chart_payloads, SOIL_CHART_DESCRIPTOR_BODY, SOIL_CHART_DESCRIPTOR_ETAG
+from fast_json import FastJSONResponse, json_bytes_response, JSON_ENCODER
+from shared_state import shared_state
+from metrics import metrics, MetricsMiddleware, timed_job, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from delta_refresh import DeltaRefresher, RefreshDataset, SensorStatusFeed, format_bytes, SENSOR_STATUS_REFRESH_SECONDS, FARMER_TOPOLOGY_SYNC_SECONDS
+from pagination import decode_cursor, keyset_newer, keyset_page, split_page
+from columnar_stats import ColumnarFrame, format_timestamp, lttb_indices, parse_resolution, parse_timestamp
 warnings.filterwarnings("ignore")
 
-app = FastAPI(title="Smart Irrigation System API", version="1.0.0")
+app = FastAPI(title="Smart Irrigation System API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Initialize scheduler for automatic refresh
 scheduler = AsyncIOScheduler()
@@ -22,17 +43,126 @@ scheduler = AsyncIOScheduler()
 cache = {
     "last_refresh": None,
     "dashboard_stats": None,
-    "sensor_status": None
+    "sensor_status": None,
+    "fleet_recommendations": None
+}
+
+# Dashboard counts: response key -> (table, column). Fetched concurrently into
+# a versioned snapshot that /api/dashboard/stats serves without touching the database.
+DASHBOARD_COUNT_QUERIES = {
+    "total_farmers": ('farm', 'farmer_id'),
+    "total_lands": ('land', 'land_id'),
+    "total_crops": ('crop', 'crop_id'),
+    "total_sensors": ('sensor', 'sensor_id'),
+    "total_readings": ('sensor_readings', 'reading_id')
+}
+DASHBOARD_STATS_REFRESH_SECONDS = int(os.getenv("DASHBOARD_STATS_REFRESH_SECONDS", "60"))
+dashboard_stats_lock = asyncio.Lock()
+
+# Largest number of samples accepted by /api/crop-recommendation/predict-batch
+CROP_BATCH_MAX_ROWS = int(os.getenv("CROP_BATCH_MAX_ROWS", "1000"))
+
+# Scheduled recommendations for every land (0 disables the job)
+CROP_FLEET_JOB_INTERVAL_MINUTES = int(os.getenv("CROP_FLEET_JOB_INTERVAL_MINUTES", "360"))
+CROP_FLEET_PAGE_SIZE = int(os.getenv("CROP_FLEET_PAGE_SIZE", "1000"))
+# Newest-first pages read before the lands still missing a row are looked up one by one
+CROP_FLEET_MAX_PAGES = int(os.getenv("CROP_FLEET_MAX_PAGES", "5"))
+
+# Unique key of crop_recommendations: re-scoring a land updates its rows instead of adding more
+RECOMMENDATION_CONFLICT_COLUMNS = "land_id,crop_name"
+CROP_FLEET_UPSERT_CHUNK_ROWS = int(os.getenv("CROP_FLEET_UPSERT_CHUNK_ROWS", "500"))
+fleet_job_lock = asyncio.Lock()
+
+# Water level bands: below 30 is Low, 30-80 Normal, above 80 High
+WATER_LEVEL_STATUSES = np.array(["Low", "Normal", "High"], dtype=object)
+
+# Ranged history (from/to/resolution/points on soil history and sensor analysis)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "1000"))
+HISTORY_MAX_ROWS = int(os.getenv("HISTORY_MAX_ROWS", "100000"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "500"))
+
+# Soil history response key -> soil_analysis column
+SOIL_HISTORY_METRICS = {
+    "ph_level": "ph_level",
+    "moisture": "moisture_level",
+    "nitrogen": "nitrogen",
+    "phosphorus": "phosphorus",
+    "potassium": "potassium",
+    "organic_matter": "organic_matter"
 }
 
-# Load Crop Recommendation Model
-try:
-    MODEL_PATH = os.path.join(os.path.dirname(__file__), "crop_model.pkl")
-    crop_model = joblib.load(MODEL_PATH)
-    print(f"✓ Crop recommendation model loaded successfully from {MODEL_PATH}")
-except Exception as e:
-    print(f"⚠️ Warning: Could not load crop model: {str(e)}")
-    crop_model = None
+# Keyset pagination of soil history and crop recommendation listings
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv("PAGINATION_MAX_PAGE_SIZE", "500"))
+CROP_RECOMMENDATIONS_PAGE_SIZE = int(os.getenv("CROP_RECOMMENDATIONS_PAGE_SIZE", "50"))
+
+# Soonest reload of farmer/land/sensor ownership when readings arrive from unknown sensors
+FARMER_TOPOLOGY_RELOAD_SECONDS = int(os.getenv("FARMER_TOPOLOGY_RELOAD_SECONDS", "300"))
+# Full ownership reload for edits and deletes; new lands and sensors arrive through the delta refresh (0 disables it)
+FARMER_TOPOLOGY_FULL_RELOAD_HOURS = int(os.getenv("FARMER_TOPOLOGY_FULL_RELOAD_HOURS", "6"))
+
+# Delta refresh: each dataset fetches only rows past its high-water mark on its own adaptive interval
+sensor_status_feed = SensorStatusFeed(sensor_buffer, keep=RUNNING_AGGREGATES_RECENT_READINGS)
+delta_refresher = DeltaRefresher(is_leader=lambda: shared_state.is_leader)
+
+# With several uvicorn workers, one leader runs the jobs that publish cache entries and every worker pulls them
+SHARED_CACHE_KEYS = ("last_refresh", "dashboard_stats", "sensor_status", "fleet_recommendations")
+
+# Crop Recommendation Model (loaded in the background at startup, or by the first request)
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "crop_model.pkl")
+
+# Single-pass inference shared by every crop-recommendation endpoint
+crop_engine = CropInferenceEngine(model_path=MODEL_PATH, backend=CROP_INFERENCE_BACKEND)
+
+# Opt-in process pool that runs the forest outside the API event loop (started with the app)
+model_pool = ModelPool(MODEL_PATH, CROP_MODEL_WORKERS) if CROP_MODEL_WORKERS > 0 else None
+
+# Write-behind queue for batched sensor readings from field gateways (started with the app)
+# Unknown sensor ids trigger at most one topology reload per FARMER_TOPOLOGY_RELOAD_SECONDS (function defined below)
+sensor_ingest = SensorIngestQueue(farmer_profiles.sensors_exist, refresh_sensors=lambda: reload_farmer_topology_if_stale())
+
+# Opt-in micro-batching of single-row predictions (started with the app)
+crop_batcher = MicroBatcher(
+    crop_engine,
+    scorer=model_pool.predict_proba if model_pool is not None else None
+) if CROP_MICRO_BATCH_ENABLED else None
+
+
+async def predict_proba(features) -> np.ndarray:
+    """Score an (N, 7) feature matrix in the model process pool when enabled, else inline"""
+    if model_pool is not None:
+        return await model_pool.predict_proba(features)
+    return crop_engine.predict_proba(features)
+
+
+async def predict_proba_one(features) -> np.ndarray:
+    """Score one feature vector, through the micro-batch queue when enabled"""
+    if crop_batcher is not None:
+        return await crop_batcher.predict_proba_one(features)
+    return (await predict_proba([features]))[0]
+
+
+async def predict_proba_cached(features: np.ndarray) -> np.ndarray:
+    """Score an (N, 7) feature matrix, reusing memoized rows and scoring only the rest"""
+    if not prediction_cache.enabled:
+        return await predict_proba(features)
+    steps = prediction_cache.quantize(features).reshape(-1, 7)
+    rows = [prediction_cache.get(crop_engine.model_version, row) for row in steps]
+    missing = [i for i, probabilities in enumerate(rows) if probabilities is None]
+    if missing:
+        scored = await predict_proba(np.asarray(features, dtype=np.float64).reshape(-1, 7)[missing])
+        for i, probabilities in zip(missing, scored):
+            prediction_cache.put(crop_engine.model_version, steps[i], probabilities)
+            rows[i] = probabilities
+    return np.stack(rows)
+
+
+async def predict_single(features: list, top_k: int = 3) -> dict:
+    """Score one feature vector; repeated inputs are served from the prediction cache"""
+    if prediction_cache.enabled:
+        probabilities = await prediction_cache.get_or_score(crop_engine.model_version, features, predict_proba_one)
+    else:
+        probabilities = await predict_proba_one(features)
+    return crop_engine.rank(probabilities[None, :], top_k)[0]
 
 # Pydantic models for request/response
 class CropPredictionRequest(BaseModel):
@@ -51,11 +181,6 @@ class CropPredictionResponse(BaseModel):
     top_3_recommendations: list
     input_parameters: dict
 
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL", "https://enjjjqprgihcsmubvxyh.supabase.co")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY", "sb_publishable_pfFLEoIWFQmHYhjrqIGfrg_LQ5TMG7F")  # Replace with your actual key
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 origins = [
     "http://localhost",
     "http://localhost:5173", # Vite Default
@@ -71,72 +196,455 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # ==================== AUTOMATIC REFRESH FUNCTION ====================
 
+async def refresh_dashboard_stats():
+    """
+    Fetch all dashboard counts concurrently and publish them as a new snapshot
+    HEAD requests with count='exact' return only the count, never the rows
+    """
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        db.execute(db.table(table_name).select(column, count='exact', head=True))
+        for table_name, column in DASHBOARD_COUNT_QUERIES.values()
+    ))
+    previous = cache["dashboard_stats"]
+    cache["dashboard_stats"] = {
+        "version": previous["version"] + 1 if previous else 1,
+        "refreshed_at": time.time(),
+        "last_updated": datetime.now().isoformat(),
+        "refresh_duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        "stats": {
+            key: response.count or 0
+            for key, response in zip(DASHBOARD_COUNT_QUERIES, responses)
+        }
+    }
+    return cache["dashboard_stats"]
+
+
+async def sync_dashboard_stats() -> dict:
+    """Dashboard counts as a refresh dataset: HEAD requests carry no rows, so only the counts tell a change"""
+    previous = cache["dashboard_stats"]
+    snapshot = await refresh_dashboard_stats()
+    await shared_state.publish({"dashboard_stats": snapshot})
+    return {"rows": 0, "bytes": 0, "changed": previous is None or previous["stats"] != snapshot["stats"]}
+
+
+async def sync_sensor_status() -> dict:
+    """Republish the sensor status from the sensor buffer, after bringing the sensor stream up to date"""
+    if sensor_buffer.ready:
+        await sensor_aggregates.sync(max_age=RUNNING_AGGREGATES_SYNC_SECONDS)
+    result = await sensor_status_feed.sync()
+    status = sensor_status_feed.status()
+    if status is not None:
+        cache["sensor_status"] = {**status, "last_updated": datetime.now().isoformat()}
+        await shared_state.publish({"sensor_status": cache["sensor_status"]})
+    return result
+
+
+delta_refresher.add(RefreshDataset("dashboard_stats", sync_dashboard_stats, DASHBOARD_STATS_REFRESH_SECONDS, leader_only=True))
+delta_refresher.add(RefreshDataset("sensor_status", sync_sensor_status, SENSOR_STATUS_REFRESH_SECONDS, leader_only=True))
+# Ownership lives in each worker's memory, so every worker keeps its own current
+delta_refresher.add(RefreshDataset("farmer_topology", farmer_profiles.sync_topology, FARMER_TOPOLOGY_SYNC_SECONDS))
+
+
+def apply_shared_cache(key: str, value):
+    """Take a cache entry published by the leader (or by any worker, for manual fleet runs)"""
+    if key in SHARED_CACHE_KEYS:
+        cache[key] = value
+
+
+shared_state.subscribe(apply_shared_cache)
+
+
+def leader_only(job):
+    """Scheduler job wrapper: run only in the leader worker"""
+    @functools.wraps(job)
+    async def wrapper(*args, **kwargs):
+        if not shared_state.is_leader:
+            return None
+        return await job(*args, **kwargs)
+    return wrapper
+
+
 async def refresh_system_data():
     """
-    Automatic refresh function that runs every 1 hour
-    Updates cached data, sensor status, and system health
+    Automatic refresh function that runs every 30 minutes
+    Syncs every dataset past its high-water mark and logs rows and bytes fetched; between
+    runs each dataset also syncs on its own adaptive interval
     """
     try:
         print(f"\n🔄 [AUTO-REFRESH] Starting system refresh at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
-        # Refresh dashboard statistics
-        try:
-            response = supabase.table('land').select('*').execute()
-            cache["dashboard_stats"] = {
-                "total_lands": len(response.data) if response.data else 0,
-                "last_updated": datetime.now().isoformat()
-            }
-            print(f"✓ Dashboard stats refreshed: {cache['dashboard_stats']['total_lands']} lands found")
-        except Exception as e:
-            print(f"⚠️ Error refreshing dashboard stats: {str(e)}")
-        
-        # Refresh sensor status
-        try:
-            sensor_response = supabase.table('soil_analysis').select('land_id, recorded_at').order('recorded_at', desc=True).limit(100).execute()
-            if sensor_response.data:
-                cache["sensor_status"] = {
-                    "active_sensors": len(set([r['land_id'] for r in sensor_response.data])),
-                    "last_reading": sensor_response.data[0]['recorded_at'] if sensor_response.data else None,
-                    "last_updated": datetime.now().isoformat()
-                }
-                print(f"✓ Sensor status refreshed: {cache['sensor_status']['active_sensors']} active sensors")
-        except Exception as e:
-            print(f"⚠️ Error refreshing sensor status: {str(e)}")
+        report = await delta_refresher.cycle()
+        total_rows = total_bytes = 0
+        for name, entry in report.items():
+            result = entry["result"]
+            if isinstance(result, Exception):
+                print(f"⚠️ Error refreshing {name}: {str(result)}")
+                continue
+            total_rows += entry["rows_since_last_cycle"]
+            total_bytes += entry["bytes_since_last_cycle"]
+            print(f"✓ {name}: {result['rows']} rows, {format_bytes(result['bytes'])} in {result['duration_ms']:.0f} ms "
+                  f"({entry['rows_since_last_cycle'] - result['rows']} rows over {entry['timer_syncs']} syncs since the last run, "
+                  f"now every {entry['interval_seconds']:g}s)")
+        
+        if cache["dashboard_stats"] is not None:
+            print(f"✓ Dashboard stats refreshed: {cache['dashboard_stats']['stats']['total_lands']} lands found (snapshot v{cache['dashboard_stats']['version']})")
+        if cache["sensor_status"] is not None:
+            print(f"✓ Sensor status refreshed: {cache['sensor_status']['active_sensors']} active sensors")
+        print(f"✓ Farmer profiles topology refreshed: {farmer_profiles.stats()['farmers']} farmers")
         
         # Update last refresh time
         cache["last_refresh"] = datetime.now().isoformat()
-        print(f"✅ [AUTO-REFRESH] Completed successfully at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        await shared_state.publish({"last_refresh": cache["last_refresh"]})
+        print(f"✅ [AUTO-REFRESH] Completed successfully at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}: "
+              f"{total_rows} rows, {format_bytes(total_bytes)} fetched since the last run\n")
         
     except Exception as e:
         print(f"❌ [AUTO-REFRESH] Error during refresh: {str(e)}")
 
+
+async def reload_farmer_topology():
+    """Full reload of farmer/land/sensor ownership, to pick up edited and deleted rows"""
+    try:
+        result = await farmer_profiles.load_topology()
+        print(f"✓ Farmer profiles topology reloaded: {result['rows']} rows, {format_bytes(result['bytes'])}")
+    except Exception as e:
+        print(f"⚠️ Error reloading farmer profiles topology: {str(e)}")
+
+async def refresh_running_aggregates(max_age: Optional[float] = None):
+    """
+    Fold soil and sensor rows newer than the stored watermarks into the running aggregates
+    Farmer ownership is loaded first so every new reading can be routed to its farmer's profile
+    """
+    if farmer_profiles.topology_loaded_at is None:
+        await farmer_profiles.load_topology()
+    await asyncio.gather(
+        soil_aggregates.sync(max_age=max_age),
+        sensor_aggregates.sync(max_age=max_age)
+    )
+
+
+async def recent_sensor_readings(land_id: int, sensor_ids: list, limit: int) -> list:
+    """
+    Newest `limit` readings of a land's sensors, newest first
+    Served from the ring buffer (at most RUNNING_AGGREGATES_SYNC_SECONDS behind), else queried
+    """
+    if sensor_buffer.ready:
+        await sensor_aggregates.sync(max_age=RUNNING_AGGREGATES_SYNC_SECONDS)
+    readings = await sensor_buffer.recent(land_id, sensor_ids, limit)
+    if readings is None:
+        readings = (await db.execute(db.table('sensor_readings').select('*').in_('sensor_id', sensor_ids).order('recorded_at', desc=True).limit(limit))).data or []
+    return readings
+
+
+async def reload_farmer_topology_if_stale() -> bool:
+    """Reload farmer/land/sensor ownership unless it is newer than FARMER_TOPOLOGY_RELOAD_SECONDS"""
+    loaded_at = farmer_profiles.topology_loaded_at
+    if loaded_at is not None and time.monotonic() - loaded_at <= FARMER_TOPOLOGY_RELOAD_SECONDS:
+        return False
+    await farmer_profiles.load_topology()
+    return True
+
+
+async def sync_running_aggregates():
+    """Scheduled sync of the running aggregates and farmer profiles"""
+    try:
+        await refresh_running_aggregates()
+        # Readings from sensors added since the last topology load wait for a reload
+        if farmer_profiles.unrouted:
+            await reload_farmer_topology_if_stale()
+    except Exception as e:
+        print(f"⚠️ Error syncing running aggregates: {str(e)}")
+
+
+async def rebuild_running_aggregates():
+    """Recount the running aggregates from scratch to pick up edited or deleted rows"""
+    try:
+        soil_result, sensor_result = await asyncio.gather(soil_aggregates.rebuild(), sensor_aggregates.rebuild())
+        print(f"✓ Running aggregates rebuilt: {soil_aggregates.rows} soil rows, {sensor_aggregates.rows} sensor readings")
+    except Exception as e:
+        print(f"⚠️ Error rebuilding running aggregates: {str(e)}")
+
+# ==================== FLEET RECOMMENDATION JOB ====================
+
+async def latest_rows_per_land(query_factory, fallback_function: str, land_of, wanted: set) -> dict:
+    """
+    Latest row for each wanted land
+    At most CROP_FLEET_MAX_PAGES pages are read newest first, which covers every land with
+    recent data; lands still missing then come from one `DISTINCT ON (land_id)` function call.
+    Lands with no row at all are left out and scored as having no data
+    """
+    latest = {}
+    for page in range(CROP_FLEET_MAX_PAGES):
+        offset = page * CROP_FLEET_PAGE_SIZE
+        query = query_factory().order('recorded_at', desc=True).range(offset, offset + CROP_FLEET_PAGE_SIZE - 1)
+        rows = (await db.execute(query)).data or []
+        for row in rows:
+            land_id = land_of(row)
+            if land_id is not None:
+                latest.setdefault(land_id, row)
+        # A short page means the whole table was read
+        if len(rows) < CROP_FLEET_PAGE_SIZE or wanted <= latest.keys():
+            return latest
+
+    missing = sorted(wanted - latest.keys())
+    if missing:
+        rows = (await db.execute(db.rpc(fallback_function, {"land_ids": missing}))).data or []
+        for row in rows:
+            land_id = land_of(row)
+            if land_id is not None:
+                latest.setdefault(land_id, row)
+    return latest
+
+
+def _value_or(row: dict, key: str, default: float) -> float:
+    value = row.get(key) if row else None
+    return default if value is None else value
+
+
+async def run_fleet_recommendations() -> dict:
+    """
+    Recommend crops for every land that has soil analysis data
+    Latest soil and sensor rows come from a few paged set-based queries, all lands
+    are scored in one vectorized pass and results are written with chunked bulk upserts
+    """
+    async with fleet_job_lock:
+        started = time.perf_counter()
+        print(f"\n🌾 [FLEET] Starting crop recommendations for all lands at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+        lands_response, sensors_response = await asyncio.gather(
+            db.execute(db.table('land').select('land_id')),
+            db.execute(db.table('sensor').select('sensor_id, land_id'))
+        )
+        land_ids = {land['land_id'] for land in lands_response.data or []}
+        sensor_land = {s['sensor_id']: s['land_id'] for s in sensors_response.data or []}
+        land_sensors = {}
+        for sensor_id, land_id in sensor_land.items():
+            land_sensors.setdefault(land_id, []).append(sensor_id)
+
+        soil_by_land, readings_by_land = await asyncio.gather(
+            latest_rows_per_land(
+                lambda: db.table('soil_analysis').select('land_id, nitrogen, phosphorus, potassium, ph_level, recorded_at'),
+                'latest_soil_analysis_per_land',
+                lambda row: row['land_id'],
+                land_ids
+            ),
+            latest_rows_per_land(
+                lambda: db.table('sensor_readings').select('sensor_id, temperature, moisture, recorded_at'),
+                'latest_sensor_readings_per_land',
+                lambda row: sensor_land.get(row['sensor_id']),
+                set(land_sensors)
+            )
+        )
+        fetched = time.perf_counter()
+
+        # Same inputs and defaults as /api/crop-recommendation/predict-from-soil
+        scored_lands = sorted(soil_by_land)
+        input_data = np.array([
+            [
+                _value_or(soil_by_land[land_id], 'nitrogen', 50),
+                _value_or(soil_by_land[land_id], 'phosphorus', 50),
+                _value_or(soil_by_land[land_id], 'potassium', 50),
+                _value_or(readings_by_land.get(land_id), 'temperature', 25.0),
+                _value_or(readings_by_land.get(land_id), 'moisture', 50.0),
+                _value_or(soil_by_land[land_id], 'ph_level', 7.0),
+                100.0  # Default rainfall
+            ]
+            for land_id in scored_lands
+        ], dtype=np.float64).reshape(-1, 7)
+
+        recommendation_rows = []
+        if scored_lands:
+            if not await crop_engine.ensure_loaded():
+                raise RuntimeError("Crop recommendation model not available")
+            results = crop_engine.rank(await predict_proba_cached(input_data), 3)
+            for land_id, result in zip(scored_lands, results):
+                for rec in result["top_recommendations"]:
+                    recommendation_rows.append({
+                        "land_id": land_id,
+                        "crop_name": rec["crop_name"],
+                        "suitability_score": int(rec["probability"]),
+                        "is_optimal": rec["probability"] > 80,
+                        "crop_type": "ML Predicted"
+                    })
+        scored = time.perf_counter()
+
+        chunks = [
+            recommendation_rows[i:i + CROP_FLEET_UPSERT_CHUNK_ROWS]
+            for i in range(0, len(recommendation_rows), CROP_FLEET_UPSERT_CHUNK_ROWS)
+        ]
+        await asyncio.gather(*(
+            db.execute(db.table('crop_recommendations').upsert(chunk, on_conflict=RECOMMENDATION_CONFLICT_COLUMNS))
+            for chunk in chunks
+        ))
+        for land_id in scored_lands:
+            response_cache.invalidate_land(land_id)
+        finished = time.perf_counter()
+
+        total_seconds = finished - started
+        report = {
+            "finished_at": datetime.now().isoformat(),
+            "total_lands": len(land_ids),
+            "lands_scored": len(scored_lands),
+            "lands_without_soil_data": len(land_ids - soil_by_land.keys()),
+            "lands_without_sensor_readings": len(soil_by_land.keys() - readings_by_land.keys()),
+            "rows_written": len(recommendation_rows),
+            "upsert_chunks": len(chunks),
+            "timings_ms": {
+                "fetch": round((fetched - started) * 1000, 2),
+                "score": round((scored - fetched) * 1000, 2),
+                "write": round((finished - scored) * 1000, 2),
+                "total": round(total_seconds * 1000, 2)
+            },
+            "lands_per_second": round(len(scored_lands) / total_seconds, 1) if total_seconds > 0 else 0.0
+        }
+        cache["fleet_recommendations"] = report
+        await shared_state.publish({"fleet_recommendations": report})
+        print(f"✅ [FLEET] {len(scored_lands)} lands scored, {len(recommendation_rows)} rows written in {total_seconds * 1000:.0f} ms ({report['lands_per_second']} lands/sec)")
+        return report
+
+
+async def scheduled_fleet_recommendations():
+    """Scheduler entry point; errors are logged so the job keeps its schedule"""
+    if fleet_job_lock.locked():
+        print("⚠️ [FLEET] Previous run still in progress, skipping")
+        return
+    try:
+        await run_fleet_recommendations()
+    except Exception as e:
+        print(f"❌ [FLEET] Error during crop recommendations: {str(e)}")
+
 # ==================== STARTUP & SHUTDOWN EVENTS ====================
 
+# Seconds spent in each boot phase, logged once warm-up finishes and served by /api/health/ready
+startup_timings = {"imports": round(time.perf_counter() - BOOT_STARTED, 3)}
+
+async def _timed(phase: str, coro):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        startup_timings[phase] = round(time.perf_counter() - started, 3)
+
+async def initial_refresh():
+    """Leader: first full refresh. Other workers: load ownership and take the leader's published cache"""
+    if shared_state.is_leader:
+        await refresh_system_data()
+    else:
+        await farmer_profiles.sync_topology()
+        await shared_state.pull()
+        print(f"✓ Worker {shared_state.worker_id} follows the scheduler leader")
+
+async def warm_up():
+    """Load the crop model and run the first data refresh in the background"""
+    phases = [
+        _timed("model_load", crop_engine.ensure_loaded()),
+        _timed("initial_refresh", initial_refresh()),
+        _timed("running_aggregates", sync_running_aggregates())
+    ]
+    if model_pool is not None:
+        # One ping per worker makes each one spawn and load the model
+        phases.append(_timed("model_pool", model_pool.health_check()))
+    await asyncio.gather(*phases)
+    startup_timings["ready"] = round(time.perf_counter() - BOOT_STARTED, 3)
+    breakdown = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in startup_timings.items())
+    print(f"⏱️ Startup breakdown: {breakdown}")
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize scheduler and run first refresh on startup"""
+    """Initialize scheduler and start warming up in the background"""
     print("🚀 Starting Smart Irrigation System API...")
+    started = time.perf_counter()
     
-    # Run initial refresh
-    await refresh_system_data()
+    # Elect the worker that runs the shared refresh and fleet jobs; the others pull what it publishes
+    shared_state.start()
     
     # Schedule automatic refresh every 30 minutes
     scheduler.add_job(
-        refresh_system_data,
+        leader_only(timed_job(refresh_system_data)),
         'interval',
         minutes=30,  # Runs every 30 minutes
         id='refresh_system_data',
         replace_existing=True
     )
+    if FARMER_TOPOLOGY_FULL_RELOAD_HOURS > 0:
+        scheduler.add_job(
+            timed_job(reload_farmer_topology),
+            'interval',
+            hours=FARMER_TOPOLOGY_FULL_RELOAD_HOURS,
+            id='reload_farmer_topology',
+            replace_existing=True
+        )
+    # Keep the soil/sensor running aggregates current, with a periodic full recount
+    scheduler.add_job(
+        timed_job(sync_running_aggregates),
+        'interval',
+        seconds=RUNNING_AGGREGATES_SYNC_SECONDS,
+        id='sync_running_aggregates',
+        replace_existing=True
+    )
+    if RUNNING_AGGREGATES_REBUILD_HOURS > 0:
+        scheduler.add_job(
+            timed_job(rebuild_running_aggregates),
+            'interval',
+            hours=RUNNING_AGGREGATES_REBUILD_HOURS,
+            id='rebuild_running_aggregates',
+            replace_existing=True
+        )
+    if CROP_FLEET_JOB_INTERVAL_MINUTES > 0:
+        scheduler.add_job(
+            leader_only(timed_job(scheduled_fleet_recommendations)),
+            'interval',
+            minutes=CROP_FLEET_JOB_INTERVAL_MINUTES,
+            id='fleet_recommendations',
+            replace_existing=True
+        )
     scheduler.start()
-    print("✅ Scheduler started: Auto-refresh every 30 minutes")
+    
+    if model_pool is not None:
+        model_pool.start()
+        scheduler.add_job(
+            timed_job(model_pool.health_check),
+            'interval',
+            seconds=CROP_MODEL_WORKER_HEALTH_SECONDS,
+            id='model_pool_health_check',
+            replace_existing=True
+        )
+        print(f"✅ Crop model process pool enabled: {model_pool.workers} workers")
+    
+    sensor_ingest.start()
+    # Dashboard counts, sensor status and topology between full refreshes, each on its own interval
+    delta_refresher.start()
+    live_updates.start()
+    if crop_batcher is not None:
+        crop_batcher.start()
+        print(f"✅ Crop prediction micro-batching enabled: {crop_batcher.window * 1000:g} ms window, up to {crop_batcher.max_rows} rows")
+    print(f"✅ Scheduler started: Auto-refresh every 30 minutes, delta refresh of {', '.join(delta_refresher.datasets)} on adaptive intervals")
+    if CROP_FLEET_JOB_INTERVAL_MINUTES > 0:
+        print(f"✅ Fleet crop recommendations scheduled every {CROP_FLEET_JOB_INTERVAL_MINUTES} minutes")
+    startup_timings["startup_hook"] = round(time.perf_counter() - started, 3)
+    
+    # Serve requests right away; the model, the workers and the first refresh load in the background
+    app.state.warm_up = asyncio.create_task(warm_up())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown scheduler gracefully"""
     scheduler.shutdown()
+    await shared_state.stop()
+    await sensor_ingest.stop()
+    await delta_refresher.stop()
+    await live_updates.stop()
+    if crop_batcher is not None:
+        await crop_batcher.stop()
+    if model_pool is not None:
+        model_pool.shutdown()
+    db.shutdown()
     print("👋 Scheduler stopped")
 
 @app.get("/")
@@ -147,96 +655,259 @@ async def root():
         "auto_refresh": {
             "enabled": True,
             "interval": "30 minutes",
+            "leader": shared_state.is_leader,
             "last_refresh": cache.get("last_refresh"),
             "next_refresh": scheduler.get_job('refresh_system_data').next_run_time.isoformat() if scheduler.get_job('refresh_system_data') else None
         }
     }
 
+@app.get("/api/health/ready")
+async def readiness():
+    """
+    Readiness probe: 200 once the model is loaded and the first refresh has run, 503 while warming up
+    """
+    warm_up_task = getattr(app.state, "warm_up", None)
+    components = {
+        "crop_model": {
+            "ready": crop_engine.is_loaded,
+            "load_seconds": round(crop_engine.load_seconds, 3) if crop_engine.load_seconds is not None else None,
+            "mmap_mode": crop_engine.mmap_mode,
+            "backend": crop_engine.backend,
+            "compiled_forest": crop_engine.forest is not None,
+            "error": crop_engine.load_error
+        },
+        "database_client": {"ready": db.has_client()},
+        "initial_refresh": {
+            "ready": cache.get("last_refresh") is not None,
+            "last_refresh": cache.get("last_refresh")
+        },
+        "dashboard_snapshot": {"ready": cache.get("dashboard_stats") is not None},
+        "running_aggregates": {
+            "ready": soil_aggregates.synced_at is not None and sensor_aggregates.synced_at is not None,
+            "soil_analysis": soil_aggregates.stats(),
+            "sensor_readings": sensor_aggregates.stats(),
+            "farmer_profiles": farmer_profiles.stats(),
+            "sensor_buffer": sensor_buffer.stats()
+        }
+    }
+    if model_pool is not None:
+        health = model_pool.last_health
+        components["model_pool"] = {"ready": bool(health and health["healthy"]), "last_health": health}
+    components["shared_state"] = {"ready": True, **shared_state.stats()}
+    components["sensor_ingest"] = {"ready": sensor_ingest.stats()["running"], "queue_depth": sensor_ingest.queued_rows}
+    if crop_batcher is not None:
+        components["micro_batcher"] = {"ready": crop_batcher.stats()["enabled"]}
+    
+    ready = all(component["ready"] for component in components.values())
+    return FastJSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "warm_up_running": warm_up_task is not None and not warm_up_task.done(),
+            "components": components,
+            "startup_seconds": startup_timings
+        }
+    )
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Get response cache size and hit/miss counters
+    """
+    return FastJSONResponse(content={
+        **response_cache.stats(),
+        "soil_chart_payloads": soil_chart_payloads.stats(),
+        "db_single_flight": db.single_flight_stats(),
+        "json_encoder": JSON_ENCODER
+    })
+
+# ==================== METRICS ====================
+
+def _cache_stats() -> dict:
+    """name -> (hits, misses, entries) of each in-memory cache"""
+    responses = response_cache.stats()
+    predictions = prediction_cache.stats()
+    charts = soil_chart_payloads.stats()
+    return {
+        "response": (responses["hits"] + responses["stale_hits"], responses["misses"], responses["entries"]),
+        "prediction": (predictions["hits"] + predictions["coalesced"], predictions["misses"], predictions["entries"]),
+        "soil_chart": (charts["hits"], charts["renders"], charts["lands"])
+    }
+
+def _cache_lookups() -> dict:
+    samples = {}
+    for name, (hits, misses, _) in _cache_stats().items():
+        samples[(name, "hit")] = hits
+        samples[(name, "miss")] = misses
+    return samples
+
+metrics.callback(
+    "cache_lookups_total", "Cache lookups by result", "counter", ("cache", "result"), _cache_lookups
+)
+metrics.callback(
+    "cache_hit_ratio", "Share of cache lookups served from memory", "gauge", ("cache",),
+    lambda: {(name,): hits / (hits + misses) if hits + misses else 0.0 for name, (hits, misses, _) in _cache_stats().items()}
+)
+metrics.callback(
+    "cache_entries", "Entries held by each cache", "gauge", ("cache",),
+    lambda: {(name,): entries for name, (_, _, entries) in _cache_stats().items()}
+)
+metrics.callback(
+    "db_queries_in_flight", "Distinct reads waiting on PostgREST, each possibly shared by several callers", "gauge", (),
+    lambda: {(): db.single_flight_stats()["in_flight"]}
+)
+metrics.callback(
+    "sensor_ingest_queued_rows", "Sensor readings waiting in the write-behind queue", "gauge", (),
+    lambda: {(): sensor_ingest.queued_rows}
+)
+metrics.callback(
+    "live_update_subscribers", "Open live update streams", "gauge", (),
+    lambda: {(): live_updates.stats()["subscribers"]}
+)
+metrics.callback(
+    "scheduler_leader", "1 while this worker runs the shared scheduled jobs", "gauge", (),
+    lambda: {(): int(shared_state.is_leader)}
+)
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics: route latencies, Supabase round trips per table, model inference,
+    cache hit ratios and scheduler job durations
+    """
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/refresh/stats")
+async def get_refresh_stats():
+    """
+    Get each refreshed dataset's current interval, syncs, rows and bytes fetched
+    """
+    return FastJSONResponse(content={**delta_refresher.stats(), "shared_state": shared_state.stats()})
+
+# ==================== PAGINATION HELPERS ====================
+
+def parse_cursor(cursor: Optional[str], scope: str) -> Optional[tuple]:
+    """Key of the row a page starts after, 400 if the cursor is invalid or from another listing"""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, scope)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ==================== TIME RANGE HELPERS ====================
+
+def parse_time_window(start: Optional[str], end: Optional[str], resolution: Optional[str], points: Optional[int]) -> Optional[dict]:
+    """
+    Validated from/to/resolution/points options, or None when none is set (latest raw rows)
+    Bad timestamps or resolutions are a 400
+    """
+    if start is None and end is None and resolution is None and points is None:
+        return None
+    try:
+        start_at = parse_timestamp(start)
+        end_at = parse_timestamp(end)
+        width = parse_resolution(resolution) if resolution is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if start_at is not None and end_at is not None and start_at > end_at:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return {
+        "from": start_at.isoformat() if start_at is not None else None,
+        "to": end_at.isoformat() if end_at is not None else None,
+        "resolution": resolution,
+        "width": width,
+        "points": min(points or HISTORY_MAX_POINTS, HISTORY_MAX_POINTS)
+    }
+
+
+async def fetch_time_window(query_factory, time_column: str, id_column: str, window: dict) -> tuple:
+    """
+    All timestamped rows inside the window, oldest first, paged HISTORY_PAGE_SIZE at a time
+    Each page starts after the (time, id) of the previous page's last row, so it is one index
+    range scan however deep the window, and rows inserted meanwhile cannot shift the pages.
+    Returns (rows, truncated); reading stops after HISTORY_MAX_ROWS rows
+    """
+    rows = []
+    while len(rows) < HISTORY_MAX_ROWS:
+        query = query_factory().not_.is_(time_column, 'null')
+        if window["from"] is not None:
+            query = query.gte(time_column, window["from"])
+        if window["to"] is not None:
+            query = query.lte(time_column, window["to"])
+        if rows:
+            query = keyset_newer(query, time_column, id_column, (rows[-1][time_column], rows[-1][id_column]))
+        page_size = min(HISTORY_PAGE_SIZE, HISTORY_MAX_ROWS - len(rows))
+        query = query.order(time_column).order(id_column).limit(page_size)
+        page = (await db.execute(query)).data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows, False
+    return rows, True
+
+
+def sample_time_window(frame: ColumnarFrame, time_column: str, metrics: list, window: dict) -> tuple:
+    """
+    Reduce time-ordered rows to at most window["points"] chart points
+    With a resolution, rows are aggregated into buckets first and LTTB picks among the buckets;
+    without one, LTTB picks raw rows. Returns (buckets or None, selected positions, points before LTTB)
+    """
+    if window["width"] is not None:
+        buckets = frame.time_buckets(time_column, metrics, window["width"])
+        means = np.column_stack([buckets["metrics"][metric]["mean"] for metric in metrics])
+        return buckets, lttb_indices(buckets["start"], means, window["points"]), len(buckets["start"])
+    times = frame.timestamps(time_column)
+    timed = np.flatnonzero(~np.isnan(times))
+    series = np.column_stack([frame.numeric(metric) for metric in metrics])[timed]
+    return None, timed[lttb_indices(times[timed], series, window["points"])], len(timed)
+
+
+def _rounded(value, digits: int = 2):
+    """Rounded float, None for NaN (empty bucket)"""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def window_summary(window: dict, raw_points: int, returned_points: int, truncated: bool) -> dict:
+    return {
+        "from": window["from"],
+        "to": window["to"],
+        "resolution": window["resolution"],
+        "max_points": window["points"],
+        "raw_points": raw_points,
+        "returned_points": returned_points,
+        "truncated": truncated
+    }
+
 # ==================== SOIL ANALYSIS CHART ENDPOINTS ====================
 
+@app.get("/api/soil-analysis/chart-descriptor")
+async def get_soil_chart_descriptor(if_none_match: Optional[str] = Header(None)):
+    """
+    Get the static soil chart metadata (labels, colors, optimal bands) used by compact chart payloads
+    Cacheable by clients: answers 304 when If-None-Match carries the current ETag
+    """
+    headers = {"ETag": SOIL_CHART_DESCRIPTOR_ETAG, "Cache-Control": "public, max-age=86400"}
+    if if_none_match == SOIL_CHART_DESCRIPTOR_ETAG:
+        return Response(status_code=304, headers=headers)
+    return json_bytes_response(SOIL_CHART_DESCRIPTOR_BODY, headers=headers)
+
+
 @app.get("/api/soil-analysis/{land_id}/chart-data")
-async def get_soil_chart_data(land_id: int):
+@response_cache.cached("soil-analysis-chart-data", ttl=60, stale_ttl=300)
+async def get_soil_chart_data(land_id: int, compact: bool = Query(False, description="Values only; labels, colors and optimal bands come from /api/soil-analysis/chart-descriptor")):
     """
     Get soil analysis data formatted for charts
     Returns data for bar charts, line charts, and histograms
     """
     try:
         # Fetch latest soil analysis
-        response = supabase.table('soil_analysis').select('*').eq('land_id', land_id).order('recorded_at', desc=True).limit(1).execute()
+        response = await db.execute(db.table('soil_analysis').select('*').eq('land_id', land_id).order('recorded_at', desc=True).limit(1))
         
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=404, detail=f"No soil analysis data found for land_id {land_id}")
         
-        soil_data = response.data[0]
-        
-        # Prepare data for different chart types
-        chart_data = {
-            "land_id": land_id,
-            "recorded_at": soil_data.get('recorded_at'),
-            
-            # NPK Bar Chart Data
-            "npk_bar_chart": [
-                {"nutrient": "Nitrogen (N)", "value": soil_data.get('nitrogen', 0), "color": "#15803d"},
-                {"nutrient": "Phosphorus (P)", "value": soil_data.get('phosphorus', 0), "color": "#16a34a"},
-                {"nutrient": "Potassium (K)", "value": soil_data.get('potassium', 0), "color": "#22c55e"}
-            ],
-            
-            # Soil Health Overview (Radar/Polar Chart Data)
-            "soil_health_radar": [
-                {"metric": "pH Level", "value": (soil_data.get('ph_level', 0) / 14) * 100, "optimal": 70},
-                {"metric": "Moisture", "value": soil_data.get('moisture_level', 0), "optimal": 50},
-                {"metric": "Nitrogen", "value": soil_data.get('nitrogen', 0), "optimal": 80},
-                {"metric": "Phosphorus", "value": soil_data.get('phosphorus', 0), "optimal": 65},
-                {"metric": "Potassium", "value": soil_data.get('potassium', 0), "optimal": 85},
-                {"metric": "Organic Matter", "value": soil_data.get('organic_matter', 0) * 10, "optimal": 40}
-            ],
-            
-            # Comparison with Optimal Values
-            "comparison_chart": [
-                {
-                    "parameter": "pH",
-                    "current": soil_data.get('ph_level', 0),
-                    "optimal_min": 6.0,
-                    "optimal_max": 7.5
-                },
-                {
-                    "parameter": "Moisture",
-                    "current": soil_data.get('moisture_level', 0),
-                    "optimal_min": 30,
-                    "optimal_max": 60
-                },
-                {
-                    "parameter": "N",
-                    "current": soil_data.get('nitrogen', 0),
-                    "optimal_min": 70,
-                    "optimal_max": 90
-                },
-                {
-                    "parameter": "P",
-                    "current": soil_data.get('phosphorus', 0),
-                    "optimal_min": 50,
-                    "optimal_max": 70
-                },
-                {
-                    "parameter": "K",
-                    "current": soil_data.get('potassium', 0),
-                    "optimal_min": 75,
-                    "optimal_max": 95
-                }
-            ],
-            
-            # Raw values
-            "raw_data": {
-                "ph_level": soil_data.get('ph_level', 0),
-                "moisture_level": soil_data.get('moisture_level', 0),
-                "nitrogen": soil_data.get('nitrogen', 0),
-                "phosphorus": soil_data.get('phosphorus', 0),
-                "potassium": soil_data.get('potassium', 0),
-                "organic_matter": soil_data.get('organic_matter', 0)
-            }
-        }
-        
-        return JSONResponse(content=chart_data)
+        # Rendered and encoded once per soil_analysis row, then served as bytes
+        return json_bytes_response(soil_chart_payloads.get(land_id, response.data[0], compact=compact))
     
     except HTTPException:
         raise
@@ -245,18 +916,41 @@ async def get_soil_chart_data(land_id: int):
 
 
 @app.get("/api/soil-analysis/{land_id}/history")
-async def get_soil_history(land_id: int, limit: int = 10):
+@response_cache.cached("soil-analysis-history", ttl=60, stale_ttl=300)
+async def get_soil_history(
+    land_id: int,
+    limit: int = Query(10, ge=1, le=PAGINATION_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    resolution: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3)
+):
     """
     Get historical soil analysis data for trend charts
+    Pages go from newest to oldest; pass next_cursor back as cursor for the previous `limit` records.
+    With from/to/resolution/points, the whole range is bucketed and/or downsampled instead
     """
     try:
-        response = supabase.table('soil_analysis').select('*').eq('land_id', land_id).order('recorded_at', desc=True).limit(limit).execute()
-        
-        if not response.data:
+        window = parse_time_window(start, end, resolution, points)
+        if window is not None:
+            if cursor is not None:
+                raise HTTPException(status_code=400, detail="cursor cannot be combined with from, to, resolution or points")
+            return await get_soil_history_window(land_id, window)
+        
+        scope = f"soil-history:{land_id}"
+        after = parse_cursor(cursor, scope)
+        response = await db.execute(keyset_page(
+            db.table('soil_analysis').select('*').eq('land_id', land_id),
+            'recorded_at', 'analysis_id', limit, after
+        ))
+        
+        if not response.data and after is None:
             raise HTTPException(status_code=404, detail=f"No historical data found for land_id {land_id}")
+        page, next_cursor = split_page(response.data or [], limit, scope, 'recorded_at', 'analysis_id')
         
         # Reverse to show oldest first
-        history_data = list(reversed(response.data))
+        history_data = list(reversed(page))
         
         # Format for line chart
         trend_data = {
@@ -273,10 +967,11 @@ async def get_soil_history(land_id: int, limit: int = 10):
                     "organic_matter": record.get('organic_matter', 0)
                 }
                 for record in history_data
-            ]
+            ],
+            "next_cursor": next_cursor
         }
         
-        return JSONResponse(content=trend_data)
+        return FastJSONResponse(content=trend_data)
     
     except HTTPException:
         raise
@@ -284,16 +979,69 @@ async def get_soil_history(land_id: int, limit: int = 10):
         raise HTTPException(status_code=500, detail=f"Error fetching history: {str(e)}")
 
 
+async def get_soil_history_window(land_id: int, window: dict) -> FastJSONResponse:
+    """Soil history over a time range, as buckets (mean with min/max) or LTTB-selected records"""
+    columns = list(SOIL_HISTORY_METRICS.values())
+    rows, truncated = await fetch_time_window(
+        lambda: db.table('soil_analysis').select(', '.join(['analysis_id', 'recorded_at', *columns])).eq('land_id', land_id),
+        'recorded_at', 'analysis_id', window
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No historical data found for land_id {land_id}")
+    
+    history = ColumnarFrame(rows)
+    buckets, selected, raw_points = sample_time_window(history, 'recorded_at', columns, window)
+    if buckets is not None:
+        stats = buckets["metrics"]
+        timeline = [
+            {
+                "date": format_timestamp(buckets["start"][i]),
+                **{key: _rounded(stats[column]["mean"][i]) for key, column in SOIL_HISTORY_METRICS.items()},
+                "count": int(buckets["rows"][i]),
+                "min": {key: _rounded(stats[column]["min"][i]) for key, column in SOIL_HISTORY_METRICS.items()},
+                "max": {key: _rounded(stats[column]["max"][i]) for key, column in SOIL_HISTORY_METRICS.items()}
+            }
+            for i in selected.tolist()
+        ]
+    else:
+        timeline = [
+            {
+                "date": rows[i].get('recorded_at'),
+                **{key: rows[i].get(column, 0) for key, column in SOIL_HISTORY_METRICS.items()}
+            }
+            for i in selected.tolist()
+        ]
+    
+    return FastJSONResponse(content={
+        "land_id": land_id,
+        "data_points": len(timeline),
+        "timeline": timeline,
+        "range": window_summary(window, raw_points, len(timeline), truncated)
+    })
+
+
 @app.get("/api/crop-recommendations/{land_id}/chart-data")
-async def get_crop_recommendations_chart(land_id: int):
+@response_cache.cached("crop-recommendations-chart-data", ttl=60, stale_ttl=300)
+async def get_crop_recommendations_chart(
+    land_id: int,
+    limit: int = Query(CROP_RECOMMENDATIONS_PAGE_SIZE, ge=1, le=PAGINATION_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
     """
     Get crop recommendations formatted for charts
+    Best suitability first, `limit` per page; pass next_cursor back as cursor for the next page
     """
     try:
-        response = supabase.table('crop_recommendations').select('*').eq('land_id', land_id).order('suitability_score', desc=True).execute()
-        
-        if not response.data:
+        scope = f"crop-recommendations:{land_id}"
+        after = parse_cursor(cursor, scope)
+        response = await db.execute(keyset_page(
+            db.table('crop_recommendations').select('*').eq('land_id', land_id),
+            'suitability_score', 'recommendation_id', limit, after
+        ))
+        
+        if not response.data and after is None:
             raise HTTPException(status_code=404, detail=f"No crop recommendations found for land_id {land_id}")
+        page, next_cursor = split_page(response.data or [], limit, scope, 'suitability_score', 'recommendation_id')
         
         # Format for horizontal bar chart
         recommendations_chart = {
@@ -306,11 +1054,12 @@ async def get_crop_recommendations_chart(land_id: int):
                     "is_optimal": rec.get('is_optimal', False),
                     "crop_type": rec.get('crop_type', 'Other')
                 }
-                for rec in response.data
-            ]
+                for rec in page
+            ],
+            "next_cursor": next_cursor
         }
         
-        return JSONResponse(content=recommendations_chart)
+        return FastJSONResponse(content=recommendations_chart)
     
     except HTTPException:
         raise
@@ -322,24 +1071,26 @@ async def get_crop_recommendations_chart(land_id: int):
 async def get_dashboard_stats():
     """
     Get overall statistics for dashboard charts
+    Served from the scheduler-maintained snapshot; only the very first call
+    (before any refresh has succeeded) waits for the database
     """
     try:
-        # Get counts from different tables
-        farms_response = supabase.table('farm').select('farmer_id', count='exact').execute()
-        lands_response = supabase.table('land').select('land_id', count='exact').execute()
-        crops_response = supabase.table('crop').select('crop_id', count='exact').execute()
-        sensors_response = supabase.table('sensor').select('sensor_id', count='exact').execute()
-        readings_response = supabase.table('sensor_readings').select('reading_id', count='exact').execute()
+        snapshot = cache["dashboard_stats"]
+        if snapshot is None:
+            # Concurrent first callers share one refresh instead of each running five counts
+            async with dashboard_stats_lock:
+                snapshot = cache["dashboard_stats"] or await refresh_dashboard_stats()
         
         stats = {
-            "total_farmers": farms_response.count or 0,
-            "total_lands": lands_response.count or 0,
-            "total_crops": crops_response.count or 0,
-            "total_sensors": sensors_response.count or 0,
-            "total_readings": readings_response.count or 0
+            **snapshot["stats"],
+            "snapshot": {
+                "version": snapshot["version"],
+                "last_updated": snapshot["last_updated"],
+                "age_seconds": round(time.time() - snapshot["refreshed_at"], 1)
+            }
         }
         
-        return JSONResponse(content=stats)
+        return FastJSONResponse(content=stats)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching stats: {str(e)}")
@@ -348,13 +1099,14 @@ async def get_dashboard_stats():
 # ==================== SENSOR AVAILABILITY ENDPOINTS ====================
 
 @app.get("/api/sensors/availability/{land_id}")
+@response_cache.cached("sensors-availability", ttl=300, stale_ttl=900)
 async def get_sensor_availability(land_id: int):
     """
     Get sensor availability and distribution by type for a specific land
     """
     try:
         # Get sensors for this land
-        response = supabase.table('sensor').select('*, land(land_name)').eq('land_id', land_id).execute()
+        response = await db.execute(db.table('sensor').select('*, land(land_name)').eq('land_id', land_id))
         
         if not response.data:
             raise HTTPException(status_code=404, detail=f"No sensors found for land_id {land_id}")
@@ -388,7 +1140,7 @@ async def get_sensor_availability(land_id: int):
             ]
         }
         
-        return JSONResponse(content=chart_data)
+        return FastJSONResponse(content=chart_data)
     
     except HTTPException:
         raise
@@ -403,51 +1155,43 @@ async def get_all_sensor_availability():
     """
     try:
         # Get all sensors with land info
-        response = supabase.table('sensor').select('*, land(land_name, land_id)').execute()
+        response = await db.execute(db.table('sensor').select('*, land(land_name, land_id)'))
         
         if not response.data:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "total_sensors": 0,
                 "sensors_by_type": [],
                 "sensors_by_land": []
             })
         
-        # Count by type
-        sensor_types = {}
-        for sensor in response.data:
-            sensor_type = sensor.get('sensor_type', 'Unknown')
-            sensor_types[sensor_type] = sensor_types.get(sensor_type, 0) + 1
+        sensors = ColumnarFrame(response.data)
         
-        # Count by land
-        sensors_by_land = {}
-        for sensor in response.data:
-            land_id = sensor.get('land_id')
-            land_name = sensor.get('land', {}).get('land_name', f'Land {land_id}')
-            if land_id:
-                key = f"{land_name} (ID: {land_id})"
-                sensors_by_land[key] = sensors_by_land.get(key, 0) + 1
+        # Count by type and by land, one grouping pass each
+        by_type = sensors.group_by('sensor_type', 'Unknown')
+        land_names = sensors.values('land.land_name')
+        by_land = sensors.group_by('land_id', mask=np.array(sensors.values('land_id'), dtype=object).astype(bool))
         
         chart_data = {
-            "total_sensors": len(response.data),
+            "total_sensors": sensors.size,
             "sensors_by_type": [
                 {
                     "sensor_type": sensor_type,
                     "count": count,
-                    "percentage": round((count / len(response.data)) * 100, 1),
+                    "percentage": round((count / sensors.size) * 100, 1),
                     "color": f"#{hash(sensor_type) % 0xFFFFFF:06x}"
                 }
-                for sensor_type, count in sorted(sensor_types.items(), key=lambda x: x[1], reverse=True)
+                for sensor_type, count, _ in by_type.ranked()
             ],
             "sensors_by_land": [
                 {
-                    "land": land,
+                    "land": f"{land_names[first] if land_names[first] is not None else f'Land {land_id}'} (ID: {land_id})",
                     "count": count
                 }
-                for land, count in sorted(sensors_by_land.items(), key=lambda x: x[1], reverse=True)[:10]
+                for land_id, count, first in by_land.ranked(limit=10)
             ]
         }
         
-        return JSONResponse(content=chart_data)
+        return FastJSONResponse(content=chart_data)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching sensor availability: {str(e)}")
@@ -456,13 +1200,14 @@ async def get_all_sensor_availability():
 # ==================== WATER LEVELS ENDPOINTS ====================
 
 @app.get("/api/water-levels/{land_id}")
+@response_cache.cached("water-levels", ttl=30, stale_ttl=120)
 async def get_water_levels_by_land(land_id: int):
     """
     Get water levels for sensors on a specific land
     """
     try:
         # Get sensors for this land
-        sensors_response = supabase.table('sensor').select('sensor_id, sensor_type').eq('land_id', land_id).execute()
+        sensors_response = await db.execute(db.table('sensor').select('sensor_id, sensor_type').eq('land_id', land_id))
         
         if not sensors_response.data:
             raise HTTPException(status_code=404, detail=f"No sensors found for land_id {land_id}")
@@ -470,25 +1215,31 @@ async def get_water_levels_by_land(land_id: int):
         sensor_ids = [s['sensor_id'] for s in sensors_response.data]
         
         # Get water resource data for these sensors
-        water_response = supabase.table('water_resource').select('*').in_('sensor_id', sensor_ids).execute()
+        water_response = await db.execute(db.table('water_resource').select('*').in_('sensor_id', sensor_ids))
         
-        water_levels_data = []
-        for water in water_response.data:
-            sensor_id = water.get('sensor_id')
-            sensor_type = next((s['sensor_type'] for s in sensors_response.data if s['sensor_id'] == sensor_id), 'Unknown')
-            water_levels_data.append({
-                "sensor_id": sensor_id,
-                "sensor_type": sensor_type,
-                "water_level": water.get('water_level', 0)
-            })
+        # Join each water row to its sensor through a dict instead of scanning the sensor list
+        sensor_types = {}
+        for s in sensors_response.data:
+            sensor_types.setdefault(s['sensor_id'], s['sensor_type'])
+        water = ColumnarFrame(water_response.data)
+        water_levels = water.values('water_level', 0)
         
         chart_data = {
             "land_id": land_id,
-            "water_levels": water_levels_data,
-            "average_water_level": round(sum(w['water_level'] for w in water_levels_data) / len(water_levels_data), 2) if water_levels_data else 0
+            "water_levels": [
+                {
+                    "sensor_id": sensor_id,
+                    "sensor_type": sensor_type,
+                    "water_level": water_level
+                }
+                for sensor_id, sensor_type, water_level in zip(
+                    water.values('sensor_id'), water.lookup('sensor_id', sensor_types, 'Unknown'), water_levels
+                )
+            ],
+            "average_water_level": water.describe('water_level', 0)["average"]
         }
         
-        return JSONResponse(content=chart_data)
+        return FastJSONResponse(content=chart_data)
     
     except HTTPException:
         raise
@@ -503,41 +1254,52 @@ async def get_all_water_levels():
     """
     try:
         # Get all water resources with sensor info
-        response = supabase.table('water_resource').select('*, sensor(sensor_type, land_id, land(land_name))').execute()
+        response = await db.execute(db.table('water_resource').select('*, sensor(sensor_type, land_id, land(land_name))'))
         
         if not response.data:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "total_sensors": 0,
                 "water_levels": [],
                 "average_water_level": 0
             })
         
+        water = ColumnarFrame(response.data)
+        levels = water.numeric('water_level', 0)
+        # 0 = Low, 1 = Normal, 2 = High; every row classified and counted in one pass
+        status_codes = np.select([levels < 30, levels <= 80], [0, 1], 2)
+        status_counts = np.bincount(status_codes, minlength=len(WATER_LEVEL_STATUSES))
+        
         water_levels = [
             {
-                "sensor_id": w.get('sensor_id'),
-                "sensor_type": w.get('sensor', {}).get('sensor_type', 'Unknown'),
-                "land_id": w.get('sensor', {}).get('land_id'),
-                "land_name": w.get('sensor', {}).get('land', {}).get('land_name', 'Unknown'),
-                "water_level": w.get('water_level', 0),
-                "status": "Normal" if 30 <= w.get('water_level', 0) <= 80 else ("Low" if w.get('water_level', 0) < 30 else "High")
+                "sensor_id": sensor_id,
+                "sensor_type": sensor_type,
+                "land_id": sensor_land_id,
+                "land_name": land_name,
+                "water_level": water_level,
+                "status": status
             }
-            for w in response.data
+            for sensor_id, sensor_type, sensor_land_id, land_name, water_level, status in zip(
+                water.values('sensor_id'),
+                water.values('sensor.sensor_type', 'Unknown'),
+                water.values('sensor.land_id'),
+                water.values('sensor.land.land_name', 'Unknown'),
+                water.values('water_level', 0),
+                WATER_LEVEL_STATUSES[status_codes].tolist()
+            )
         ]
         
-        avg_level = round(sum(w['water_level'] for w in water_levels) / len(water_levels), 2) if water_levels else 0
-        
         chart_data = {
-            "total_sensors": len(water_levels),
+            "total_sensors": water.size,
             "water_levels": water_levels,
-            "average_water_level": avg_level,
+            "average_water_level": water.describe('water_level', 0)["average"],
             "by_status": {
-                "low": len([w for w in water_levels if w['status'] == 'Low']),
-                "normal": len([w for w in water_levels if w['status'] == 'Normal']),
-                "high": len([w for w in water_levels if w['status'] == 'High'])
+                "low": int(status_counts[0]),
+                "normal": int(status_counts[1]),
+                "high": int(status_counts[2])
             }
         }
         
-        return JSONResponse(content=chart_data)
+        return FastJSONResponse(content=chart_data)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching water levels: {str(e)}")
@@ -546,68 +1308,65 @@ async def get_all_water_levels():
 # ==================== SENSOR READINGS ANALYSIS ENDPOINTS ====================
 
 @app.get("/api/sensor-readings/analysis/{land_id}")
-async def get_sensor_readings_analysis(land_id: int, limit: int = 50):
+async def get_sensor_readings_analysis(
+    land_id: int,
+    limit: int = 50,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    resolution: Optional[str] = None,
+    points: Optional[int] = Query(None, ge=3)
+):
     """
     Get sensor readings analysis (moisture & temperature trends) for a land
+    With from/to/resolution/points, trends cover the whole range, bucketed and/or downsampled
     """
     try:
+        window = parse_time_window(start, end, resolution, points)
+        
         # Get sensors for this land
-        sensors_response = supabase.table('sensor').select('sensor_id, sensor_type').eq('land_id', land_id).execute()
+        sensors_response = await db.execute(db.table('sensor').select('sensor_id, sensor_type').eq('land_id', land_id))
         
         if not sensors_response.data:
             raise HTTPException(status_code=404, detail=f"No sensors found for land_id {land_id}")
         
         sensor_ids = [s['sensor_id'] for s in sensors_response.data]
         
+        if window is not None:
+            return await get_sensor_readings_window(land_id, sensor_ids, window)
+        
         # Get recent readings for these sensors
-        readings_response = supabase.table('sensor_readings').select('*').in_('sensor_id', sensor_ids).order('recorded_at', desc=True).limit(limit).execute()
+        recent_readings = await recent_sensor_readings(land_id, sensor_ids, limit)
         
-        if not readings_response.data:
+        if not recent_readings:
             raise HTTPException(status_code=404, detail=f"No sensor readings found for land_id {land_id}")
         
-        # Process data for charts
-        readings = sorted(readings_response.data, key=lambda x: x.get('recorded_at', ''))
+        readings = ColumnarFrame(recent_readings)
         
-        moisture_data = []
-        temperature_data = []
+        # Oldest first for charts; only the last 20 readings are plotted
+        latest = readings.argsort('recorded_at', '')[-20:].tolist()
+        timestamps = readings.values('recorded_at', '')
+        reading_sensors = readings.values('sensor_id')
         
-        for reading in readings:
-            recorded_at = reading.get('recorded_at', '')
-            moisture_data.append({
-                "timestamp": recorded_at,
-                "value": reading.get('moisture', 0),
-                "sensor_id": reading.get('sensor_id')
-            })
-            temperature_data.append({
-                "timestamp": recorded_at,
-                "value": reading.get('temperature', 0),
-                "sensor_id": reading.get('sensor_id')
-            })
+        def trend(column: str) -> list:
+            values = readings.values(column, 0)
+            return [{"timestamp": timestamps[i], "value": values[i], "sensor_id": reading_sensors[i]} for i in latest]
         
         # Calculate statistics
-        moisture_values = [r.get('moisture', 0) for r in readings_response.data]
-        temperature_values = [r.get('temperature', 0) for r in readings_response.data]
+        moisture = readings.describe('moisture', 0)
+        temperature = readings.describe('temperature', 0)
         
         chart_data = {
             "land_id": land_id,
-            "moisture_trend": moisture_data[-20:],  # Last 20 readings
-            "temperature_trend": temperature_data[-20:],
+            "moisture_trend": trend('moisture'),  # Last 20 readings
+            "temperature_trend": trend('temperature'),
             "statistics": {
-                "moisture": {
-                    "average": round(sum(moisture_values) / len(moisture_values), 2) if moisture_values else 0,
-                    "min": min(moisture_values) if moisture_values else 0,
-                    "max": max(moisture_values) if moisture_values else 0
-                },
-                "temperature": {
-                    "average": round(sum(temperature_values) / len(temperature_values), 2) if temperature_values else 0,
-                    "min": min(temperature_values) if temperature_values else 0,
-                    "max": max(temperature_values) if temperature_values else 0
-                }
+                "moisture": {"average": moisture["average"], "min": moisture["min"], "max": moisture["max"]},
+                "temperature": {"average": temperature["average"], "min": temperature["min"], "max": temperature["max"]}
             },
-            "total_readings": len(readings_response.data)
+            "total_readings": readings.size
         }
         
-        return JSONResponse(content=chart_data)
+        return FastJSONResponse(content=chart_data)
     
     except HTTPException:
         raise
@@ -615,6 +1374,188 @@ async def get_sensor_readings_analysis(land_id: int, limit: int = 50):
         raise HTTPException(status_code=500, detail=f"Error fetching sensor readings analysis: {str(e)}")
 
 
+async def get_sensor_readings_window(land_id: int, sensor_ids: list, window: dict) -> FastJSONResponse:
+    """Moisture and temperature trends over a time range, as buckets or LTTB-selected readings"""
+    rows, truncated = await fetch_time_window(
+        lambda: db.table('sensor_readings').select('reading_id, sensor_id, moisture, temperature, recorded_at').in_('sensor_id', sensor_ids),
+        'recorded_at', 'reading_id', window
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No sensor readings found for land_id {land_id}")
+    
+    readings = ColumnarFrame(rows)
+    buckets, selected, raw_points = sample_time_window(readings, 'recorded_at', ['moisture', 'temperature'], window)
+    positions = selected.tolist()
+    
+    def trend(column: str) -> list:
+        if buckets is not None:
+            stats = buckets["metrics"][column]
+            return [
+                {
+                    "timestamp": format_timestamp(buckets["start"][i]),
+                    "value": _rounded(stats["mean"][i]),
+                    "min": _rounded(stats["min"][i]),
+                    "max": _rounded(stats["max"][i]),
+                    "count": int(stats["count"][i])
+                }
+                for i in positions
+            ]
+        values = readings.values(column, 0)
+        timestamps = readings.values('recorded_at', '')
+        reading_sensors = readings.values('sensor_id')
+        return [{"timestamp": timestamps[i], "value": values[i], "sensor_id": reading_sensors[i]} for i in positions]
+    
+    moisture = readings.describe('moisture', 0)
+    temperature = readings.describe('temperature', 0)
+    
+    return FastJSONResponse(content={
+        "land_id": land_id,
+        "moisture_trend": trend('moisture'),
+        "temperature_trend": trend('temperature'),
+        "statistics": {
+            "moisture": {"average": moisture["average"], "min": moisture["min"], "max": moisture["max"]},
+            "temperature": {"average": temperature["average"], "min": temperature["min"], "max": temperature["max"]}
+        },
+        "total_readings": readings.size,
+        "range": window_summary(window, raw_points, len(positions), truncated)
+    })
+
+
+# ==================== SENSOR READINGS INGEST ENDPOINTS ====================
+
+@app.post("/api/sensor-readings/ingest", status_code=202)
+async def ingest_sensor_readings(payload: Any = Body(...)):
+    """
+    Accept a batch of sensor readings from field gateways
+    Body is a list of {sensor_id, temperature, moisture, recorded_at} objects or an object of equal-length columns.
+    Valid rows are queued and written with chunked bulk inserts; 429 when the queue is full
+    """
+    try:
+        result = await sensor_ingest.ingest(payload)
+        return FastJSONResponse(status_code=202, content=result)
+    
+    except IngestRejected as e:
+        headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error ingesting sensor readings: {str(e)}")
+
+
+@app.get("/api/sensor-readings/ingest/stats")
+async def get_sensor_ingest_stats():
+    """
+    Get ingest rate, queue depth and flush latency of the sensor readings write-behind queue
+    """
+    return FastJSONResponse(content=sensor_ingest.stats())
+
+
+# ==================== LIVE UPDATE ENDPOINTS ====================
+
+def parse_land_ids(text: Optional[str]) -> list:
+    """Land ids from a comma separated query value, 400 if any is not an integer"""
+    try:
+        return sorted({int(part) for part in (text or "").split(",") if part.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="land_ids must be comma separated integers, e.g. 1,2,3")
+
+
+@app.get("/api/live/stream")
+async def stream_live_updates(
+    land_ids: str = Query(..., description="Comma separated land ids, e.g. 1,2,3"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Server-Sent Events stream of new readings, water level changes and recommendation updates for the given lands
+    Reconnecting with Last-Event-ID replays the events missed in between
+    """
+    lands = parse_land_ids(land_ids)
+    if not lands:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one land_id")
+    try:
+        subscriber = live_updates.subscribe(lands, "sse")
+    except LiveUpdatesFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    if last_event_id is not None:
+        live_updates.replay(subscriber, last_event_id)
+    
+    async def events():
+        try:
+            yield f"retry: 3000\nevent: subscribed\ndata: {json.dumps({'land_ids': lands})}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=LIVE_UPDATES_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                subscriber.delivered += 1
+                yield event.sse
+        finally:
+            live_updates.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.websocket("/api/live/ws")
+async def live_updates_websocket(websocket: WebSocket, land_ids: Optional[str] = None):
+    """
+    WebSocket stream of the same events as /api/live/stream
+    Clients change their lands with {"subscribe": [..]} and {"unsubscribe": [..]} messages
+    """
+    await websocket.accept()
+    try:
+        lands = parse_land_ids(land_ids)
+        subscriber = live_updates.subscribe(lands, "websocket")
+    except (HTTPException, LiveUpdatesFull) as e:
+        await websocket.close(code=1008, reason=str(getattr(e, "detail", e)))
+        return
+    
+    async def send_events():
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=LIVE_UPDATES_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_text('{"type":"keep-alive"}')
+                continue
+            subscriber.delivered += 1
+            await websocket.send_text(event.data)
+    
+    sender = asyncio.create_task(send_events())
+    try:
+        await websocket.send_json({"type": "subscribed", "land_ids": sorted(subscriber.land_ids)})
+        while True:
+            try:
+                message = await websocket.receive_json()
+                live_updates.update(
+                    subscriber,
+                    add=[int(land_id) for land_id in message.get("subscribe", [])],
+                    remove=[int(land_id) for land_id in message.get("unsubscribe", [])]
+                )
+                await websocket.send_json({"type": "subscribed", "land_ids": sorted(subscriber.land_ids)})
+            except LiveUpdatesFull as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+            except (AttributeError, TypeError, ValueError):
+                await websocket.send_json({"type": "error", "detail": 'Expected {"subscribe": [land ids]} or {"unsubscribe": [land ids]}'})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        live_updates.unsubscribe(subscriber)
+
+
+@app.get("/api/live/stats")
+async def get_live_update_stats():
+    """
+    Get live update subscribers, shared poll timings and events sent
+    """
+    return FastJSONResponse(content=live_updates.stats())
+
+
 # ==================== CROP RECOMMENDATION ML MODEL ENDPOINTS ====================
 
 @app.post("/api/crop-recommendation/predict")
@@ -624,11 +1565,11 @@ async def predict_crop(request: CropPredictionRequest):
     Uses Random Forest ML model trained on agricultural data
     """
     try:
-        if crop_model is None:
+        if not await crop_engine.ensure_loaded():
             raise HTTPException(status_code=503, detail="Crop recommendation model not available")
         
-        # Prepare input data
-        input_data = np.array([[
+        # Make prediction (one forest pass, top 3 recommendations)
+        result = await predict_single([
             request.N,
             request.P,
             request.K,
@@ -636,29 +1577,15 @@ async def predict_crop(request: CropPredictionRequest):
             request.humidity,
             request.ph,
             request.rainfall
-        ]])
-        
-        # Make prediction
-        prediction = crop_model.predict(input_data)[0]
-        prediction_proba = crop_model.predict_proba(input_data)[0]
-        confidence = float(max(prediction_proba) * 100)
-        
-        # Get top 3 recommendations
-        top_indices = prediction_proba.argsort()[-3:][::-1]
-        top_3_recommendations = [
-            {
-                "rank": i + 1,
-                "crop_name": crop_model.classes_[idx],
-                "probability": float(prediction_proba[idx] * 100)
-            }
-            for i, idx in enumerate(top_indices)
-        ]
+        ], top_k=3)
+        prediction = result["recommended_crop"]
+        confidence = result["confidence"]
         
         # Prepare response
         response_data = {
             "recommended_crop": prediction,
             "confidence": confidence,
-            "top_3_recommendations": top_3_recommendations,
+            "top_3_recommendations": result["top_recommendations"],
             "input_parameters": {
                 "nitrogen": request.N,
                 "phosphorus": request.P,
@@ -681,13 +1608,14 @@ async def predict_crop(request: CropPredictionRequest):
                     "is_optimal": confidence > 80,
                     "crop_type": "ML Predicted"
                 }
-                supabase.table('crop_recommendations').insert(recommendation_data).execute()
+                await db.execute(db.table('crop_recommendations').insert(recommendation_data))
+                response_cache.invalidate_land(request.land_id)
                 response_data["saved_to_database"] = True
             except Exception as db_error:
                 print(f"Warning: Could not save to database: {str(db_error)}")
                 response_data["saved_to_database"] = False
         
-        return JSONResponse(content=response_data)
+        return FastJSONResponse(content=response_data)
     
     except HTTPException:
         raise
@@ -695,6 +1623,75 @@ async def predict_crop(request: CropPredictionRequest):
         raise HTTPException(status_code=500, detail=f"Error making crop prediction: {str(e)}")
 
 
+@app.post("/api/crop-recommendation/predict-batch")
+async def predict_crop_batch(samples: List[CropPredictionRequest], top_k: int = 3):
+    """
+    Predict the best crops for many soil samples in one call
+    Scores all samples with a single vectorized predict_proba over an (N, 7) matrix
+    and saves rows that carry a land_id with one bulk insert
+    """
+    try:
+        if not await crop_engine.ensure_loaded():
+            raise HTTPException(status_code=503, detail="Crop recommendation model not available")
+        
+        if not samples:
+            raise HTTPException(status_code=400, detail="At least one sample is required")
+        
+        if len(samples) > CROP_BATCH_MAX_ROWS:
+            raise HTTPException(status_code=400, detail=f"Batch too large: {len(samples)} samples (max {CROP_BATCH_MAX_ROWS})")
+        
+        # Prepare input matrix in the model's feature order
+        input_data = np.array([
+            [s.N, s.P, s.K, s.temperature, s.humidity, s.ph, s.rainfall]
+            for s in samples
+        ], dtype=np.float64)
+        
+        # One forest pass for every sample not already in the prediction cache
+        results = crop_engine.rank(await predict_proba_cached(input_data), top_k)
+        
+        predictions = []
+        recommendation_rows = []
+        for row, (sample, result) in enumerate(zip(samples, results)):
+            predictions.append({
+                "index": row,
+                "land_id": sample.land_id,
+                **result
+            })
+            if sample.land_id:
+                recommendation_rows.append({
+                    "land_id": sample.land_id,
+                    "crop_name": result["recommended_crop"],
+                    "suitability_score": int(result["confidence"]),
+                    "is_optimal": result["confidence"] > 80,
+                    "crop_type": "ML Predicted"
+                })
+        
+        response_data = {
+            "total_samples": len(samples),
+            "predictions": predictions
+        }
+        
+        # Save all land-bound predictions in one bulk insert
+        if recommendation_rows:
+            try:
+                await db.execute(db.table('crop_recommendations').insert(recommendation_rows))
+                response_data["saved_to_database"] = True
+                response_data["saved_rows"] = len(recommendation_rows)
+            except Exception as db_error:
+                print(f"Warning: Could not save batch to database: {str(db_error)}")
+                response_data["saved_to_database"] = False
+                response_data["saved_rows"] = 0
+            for land_id in {row["land_id"] for row in recommendation_rows}:
+                response_cache.invalidate_land(land_id)
+        
+        return FastJSONResponse(content=response_data)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error making batch crop prediction: {str(e)}")
+
+
 @app.post("/api/crop-recommendation/predict-from-soil/{land_id}")
 async def predict_crop_from_soil_analysis(land_id: int):
     """
@@ -702,11 +1699,11 @@ async def predict_crop_from_soil_analysis(land_id: int):
     Automatically fetches soil parameters from database
     """
     try:
-        if crop_model is None:
+        if not await crop_engine.ensure_loaded():
             raise HTTPException(status_code=503, detail="Crop recommendation model not available")
         
         # Fetch latest soil analysis for the land
-        soil_response = supabase.table('soil_analysis').select('*').eq('land_id', land_id).order('recorded_at', desc=True).limit(1).execute()
+        soil_response = await db.execute(db.table('soil_analysis').select('*').eq('land_id', land_id).order('recorded_at', desc=True).limit(1))
         
         if not soil_response.data:
             raise HTTPException(status_code=404, detail=f"No soil analysis found for land_id {land_id}")
@@ -714,15 +1711,15 @@ async def predict_crop_from_soil_analysis(land_id: int):
         soil_data = soil_response.data[0]
         
         # Fetch sensor readings for temperature and humidity
-        sensors_response = supabase.table('sensor').select('sensor_id').eq('land_id', land_id).execute()
+        sensors_response = await db.execute(db.table('sensor').select('sensor_id').eq('land_id', land_id))
         
         if sensors_response.data:
             sensor_ids = [s['sensor_id'] for s in sensors_response.data]
-            readings_response = supabase.table('sensor_readings').select('temperature, moisture').in_('sensor_id', sensor_ids).order('recorded_at', desc=True).limit(1).execute()
+            latest_readings = await recent_sensor_readings(land_id, sensor_ids, 1)
             
-            if readings_response.data:
-                temperature = readings_response.data[0].get('temperature', 25.0)
-                humidity = readings_response.data[0].get('moisture', 50.0)
+            if latest_readings:
+                temperature = latest_readings[0].get('temperature', 25.0)
+                humidity = latest_readings[0].get('moisture', 50.0)
             else:
                 temperature = 25.0
                 humidity = 50.0
@@ -730,8 +1727,8 @@ async def predict_crop_from_soil_analysis(land_id: int):
             temperature = 25.0
             humidity = 50.0
         
-        # Prepare input (use default rainfall if not available)
-        input_data = np.array([[
+        # Make prediction (use default rainfall if not available)
+        result = await predict_single([
             soil_data.get('nitrogen', 50),
             soil_data.get('phosphorus', 50),
             soil_data.get('potassium', 50),
@@ -739,37 +1736,27 @@ async def predict_crop_from_soil_analysis(land_id: int):
             humidity,
             soil_data.get('ph_level', 7.0),
             100.0  # Default rainfall
-        ]])
-        
-        # Make prediction
-        prediction = crop_model.predict(input_data)[0]
-        prediction_proba = crop_model.predict_proba(input_data)[0]
-        confidence = float(max(prediction_proba) * 100)
-        
-        # Get top 3 recommendations
-        top_indices = prediction_proba.argsort()[-3:][::-1]
-        top_3_recommendations = [
-            {
-                "rank": i + 1,
-                "crop_name": crop_model.classes_[idx],
-                "probability": float(prediction_proba[idx] * 100)
-            }
-            for i, idx in enumerate(top_indices)
-        ]
+        ], top_k=3)
+        prediction = result["recommended_crop"]
+        confidence = result["confidence"]
+        top_3_recommendations = result["top_recommendations"]
         
         # Save to database
         try:
-            for rec in top_3_recommendations:
-                recommendation_data = {
+            recommendation_rows = [
+                {
                     "land_id": land_id,
                     "crop_name": rec["crop_name"],
                     "suitability_score": int(rec["probability"]),
                     "is_optimal": rec["probability"] > 80,
                     "crop_type": "ML Predicted"
                 }
-                supabase.table('crop_recommendations').upsert(recommendation_data).execute()
+                for rec in top_3_recommendations
+            ]
+            await db.execute(db.table('crop_recommendations').upsert(recommendation_rows, on_conflict=RECOMMENDATION_CONFLICT_COLUMNS))
         except Exception as db_error:
             print(f"Warning: Could not save to database: {str(db_error)}")
+        response_cache.invalidate_land(land_id)
         
         response_data = {
             "land_id": land_id,
@@ -786,7 +1773,7 @@ async def predict_crop_from_soil_analysis(land_id: int):
             }
         }
         
-        return JSONResponse(content=response_data)
+        return FastJSONResponse(content=response_data)
     
     except HTTPException:
         raise
@@ -794,6 +1781,14 @@ async def predict_crop_from_soil_analysis(land_id: int):
         raise HTTPException(status_code=500, detail=f"Error predicting crop from soil data: {str(e)}")
 
 
+def round_statistics(metrics: dict, digits: int = 4) -> dict:
+    """Round the mean/variance/std of running aggregate summaries for the response"""
+    return {
+        metric: {key: round(value, digits) if isinstance(value, float) else value for key, value in values.items()}
+        for metric, values in metrics.items()
+    }
+
+
 @app.get("/api/crop-recommendation/auto-analyze")
 async def auto_analyze_all_lands():
     """
@@ -801,37 +1796,36 @@ async def auto_analyze_all_lands():
     and provide crop recommendations
     """
     try:
-        if crop_model is None:
+        if not await crop_engine.ensure_loaded():
             raise HTTPException(status_code=503, detail="Crop recommendation model not available")
         
-        # Fetch all soil analysis data
-        soil_response = supabase.table('soil_analysis').select('*').execute()
+        # Averages over all soil analysis rows, from the running aggregates kept current by the scheduler
+        if soil_aggregates.synced_at is None or sensor_aggregates.synced_at is None:
+            raise HTTPException(status_code=503, detail="Running aggregates are still loading, retry shortly")
+        soil_summary = soil_aggregates.summary()
         
-        if not soil_response.data or len(soil_response.data) == 0:
+        if soil_summary["rows"] == 0:
             raise HTTPException(status_code=404, detail="No soil analysis data found")
         
-        # Calculate averages
-        total_records = len(soil_response.data)
-        avg_nitrogen = sum(s.get('nitrogen', 0) for s in soil_response.data) / total_records
-        avg_phosphorus = sum(s.get('phosphorus', 0) for s in soil_response.data) / total_records
-        avg_potassium = sum(s.get('potassium', 0) for s in soil_response.data) / total_records
-        avg_ph = sum(s.get('ph_level', 0) for s in soil_response.data) / total_records
-        
-        # Fetch all sensor readings for temperature and humidity
-        readings_response = supabase.table('sensor_readings').select('temperature, moisture').order('recorded_at', desc=True).limit(100).execute()
+        total_records = soil_summary["rows"]
+        soil_metrics = soil_summary["metrics"]
+        avg_nitrogen = soil_metrics['nitrogen']['mean'] or 0
+        avg_phosphorus = soil_metrics['phosphorus']['mean'] or 0
+        avg_potassium = soil_metrics['potassium']['mean'] or 0
+        avg_ph = soil_metrics['ph_level']['mean'] or 0
         
-        if readings_response.data and len(readings_response.data) > 0:
-            avg_temperature = sum(r.get('temperature', 25.0) for r in readings_response.data) / len(readings_response.data)
-            avg_humidity = sum(r.get('moisture', 50.0) for r in readings_response.data) / len(readings_response.data)
-        else:
-            avg_temperature = 25.0
-            avg_humidity = 50.0
+        # Newest sensor readings for temperature and humidity, kept by the sensor aggregates
+        readings = sensor_aggregates.recent()
+        temperatures = [r['temperature'] for r in readings if r.get('temperature') is not None]
+        moistures = [r['moisture'] for r in readings if r.get('moisture') is not None]
+        avg_temperature = sum(temperatures) / len(temperatures) if temperatures else 25.0
+        avg_humidity = sum(moistures) / len(moistures) if moistures else 50.0
         
         # Default rainfall (could be added to database in future)
         avg_rainfall = 150.0
         
-        # Prepare input for prediction
-        input_data = np.array([[
+        # Make prediction (one forest pass, top 5 recommendations)
+        result = await predict_single([
             avg_nitrogen,
             avg_phosphorus,
             avg_potassium,
@@ -839,28 +1833,15 @@ async def auto_analyze_all_lands():
             avg_humidity,
             avg_ph,
             avg_rainfall
-        ]])
-        
-        # Make prediction
-        prediction = crop_model.predict(input_data)[0]
-        prediction_proba = crop_model.predict_proba(input_data)[0]
-        confidence = float(max(prediction_proba) * 100)
-        
-        # Get top 5 recommendations
-        top_indices = prediction_proba.argsort()[-5:][::-1]
-        top_recommendations = [
-            {
-                "rank": i + 1,
-                "crop_name": crop_model.classes_[idx],
-                "probability": float(prediction_proba[idx] * 100)
-            }
-            for i, idx in enumerate(top_indices)
-        ]
+        ], top_k=5)
+        prediction = result["recommended_crop"]
+        confidence = result["confidence"]
+        top_recommendations = result["top_recommendations"]
         
         response_data = {
             "analysis_type": "Auto Analysis - All Lands Average",
             "total_soil_records": total_records,
-            "total_sensor_readings": len(readings_response.data) if readings_response.data else 0,
+            "total_sensor_readings": len(readings),
             "recommended_crop": prediction,
             "confidence": confidence,
             "top_5_recommendations": top_recommendations,
@@ -872,10 +1853,14 @@ async def auto_analyze_all_lands():
                 "humidity": round(avg_humidity, 2),
                 "ph_level": round(avg_ph, 2),
                 "rainfall": round(avg_rainfall, 2)
+            },
+            "parameter_statistics": {
+                "soil": round_statistics(soil_metrics),
+                "sensor_all_readings": round_statistics(sensor_aggregates.summary()["metrics"])
             }
         }
         
-        return JSONResponse(content=response_data)
+        return FastJSONResponse(content=response_data)
     
     except HTTPException:
         raise
@@ -890,56 +1875,39 @@ async def auto_analyze_farmer_lands(farmer_id: int):
     and provide personalized crop recommendations
     """
     try:
-        if crop_model is None:
+        if not await crop_engine.ensure_loaded():
             raise HTTPException(status_code=503, detail="Crop recommendation model not available")
         
-        # Get all lands for this farmer
-        lands_response = supabase.table('land').select('land_id, land_name').eq('farmer_id', farmer_id).execute()
+        # Materialized profile: answered from memory, rebuilt only after this farmer's rows changed
+        await refresh_running_aggregates(max_age=RUNNING_AGGREGATES_SYNC_SECONDS)
+        profile = await farmer_profiles.get(farmer_id)
         
-        if not lands_response.data or len(lands_response.data) == 0:
+        if profile is None:
             raise HTTPException(status_code=404, detail=f"No lands found for farmer_id {farmer_id}")
         
-        land_ids = [land['land_id'] for land in lands_response.data]
-        land_names = [land['land_name'] for land in lands_response.data]
-        
-        # Fetch soil analysis data for farmer's lands
-        soil_response = supabase.table('soil_analysis').select('*').in_('land_id', land_ids).execute()
+        land_ids = profile["land_ids"]
+        land_names = profile["land_names"]
         
-        if not soil_response.data or len(soil_response.data) == 0:
+        if profile["soil_records"] == 0:
             raise HTTPException(status_code=404, detail=f"No soil analysis data found for farmer_id {farmer_id}")
         
-        # Calculate averages for farmer's lands
-        total_records = len(soil_response.data)
-        avg_nitrogen = sum(s.get('nitrogen', 0) for s in soil_response.data) / total_records
-        avg_phosphorus = sum(s.get('phosphorus', 0) for s in soil_response.data) / total_records
-        avg_potassium = sum(s.get('potassium', 0) for s in soil_response.data) / total_records
-        avg_ph = sum(s.get('ph_level', 0) for s in soil_response.data) / total_records
+        # Averages over all soil analysis rows of the farmer's lands
+        total_records = profile["soil_records"]
+        avg_nitrogen = profile["soil"]['nitrogen']['mean'] or 0
+        avg_phosphorus = profile["soil"]['phosphorus']['mean'] or 0
+        avg_potassium = profile["soil"]['potassium']['mean'] or 0
+        avg_ph = profile["soil"]['ph_level']['mean'] or 0
         
-        # Fetch sensor readings for farmer's lands
-        sensors_response = supabase.table('sensor').select('sensor_id').in_('land_id', land_ids).execute()
-        
-        if sensors_response.data and len(sensors_response.data) > 0:
-            sensor_ids = [s['sensor_id'] for s in sensors_response.data]
-            readings_response = supabase.table('sensor_readings').select('temperature, moisture').in_('sensor_id', sensor_ids).order('recorded_at', desc=True).limit(100).execute()
-            
-            if readings_response.data and len(readings_response.data) > 0:
-                avg_temperature = sum(r.get('temperature', 25.0) for r in readings_response.data) / len(readings_response.data)
-                avg_humidity = sum(r.get('moisture', 50.0) for r in readings_response.data) / len(readings_response.data)
-                sensor_reading_count = len(readings_response.data)
-            else:
-                avg_temperature = 25.0
-                avg_humidity = 50.0
-                sensor_reading_count = 0
-        else:
-            avg_temperature = 25.0
-            avg_humidity = 50.0
-            sensor_reading_count = 0
+        # Averages over the farmer's most recent sensor readings
+        sensor_reading_count = profile["recent_readings"]
+        avg_temperature = profile["recent_temperature"] if profile["recent_temperature"] is not None else 25.0
+        avg_humidity = profile["recent_moisture"] if profile["recent_moisture"] is not None else 50.0
         
         # Default rainfall
         avg_rainfall = 150.0
         
-        # Prepare input for prediction
-        input_data = np.array([[
+        # Make prediction (one forest pass, top 5 recommendations)
+        result = await predict_single([
             avg_nitrogen,
             avg_phosphorus,
             avg_potassium,
@@ -947,23 +1915,10 @@ async def auto_analyze_farmer_lands(farmer_id: int):
             avg_humidity,
             avg_ph,
             avg_rainfall
-        ]])
-        
-        # Make prediction
-        prediction = crop_model.predict(input_data)[0]
-        prediction_proba = crop_model.predict_proba(input_data)[0]
-        confidence = float(max(prediction_proba) * 100)
-        
-        # Get top 5 recommendations
-        top_indices = prediction_proba.argsort()[-5:][::-1]
-        top_recommendations = [
-            {
-                "rank": i + 1,
-                "crop_name": crop_model.classes_[idx],
-                "probability": float(prediction_proba[idx] * 100)
-            }
-            for i, idx in enumerate(top_indices)
-        ]
+        ], top_k=5)
+        prediction = result["recommended_crop"]
+        confidence = result["confidence"]
+        top_recommendations = result["top_recommendations"]
         
         response_data = {
             "analysis_type": f"Farmer-Specific Analysis (Farmer ID: {farmer_id})",
@@ -986,7 +1941,7 @@ async def auto_analyze_farmer_lands(farmer_id: int):
             }
         }
         
-        return JSONResponse(content=response_data)
+        return FastJSONResponse(content=response_data)
     
     except HTTPException:
         raise
@@ -1000,10 +1955,10 @@ async def get_farmers_list():
     Get list of all farmers for dropdown selection
     """
     try:
-        response = supabase.table('farm').select('farmer_id, name').order('farmer_id').execute()
+        response = await db.execute(db.table('farm').select('farmer_id, name').order('farmer_id'))
         
         if not response.data:
-            return JSONResponse(content={"farmers": []})
+            return FastJSONResponse(content={"farmers": []})
         
         farmers_list = [
             {
@@ -1013,20 +1968,75 @@ async def get_farmers_list():
             for farmer in response.data
         ]
         
-        return JSONResponse(content={"farmers": farmers_list})
+        return FastJSONResponse(content={"farmers": farmers_list})
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching farmers list: {str(e)}")
 
 
+@app.get("/api/crop-recommendation/micro-batch/stats")
+async def get_micro_batch_stats():
+    """
+    Get batch size and queue wait metrics of the prediction micro-batcher
+    """
+    if crop_batcher is None:
+        return FastJSONResponse(content={"enabled": False})
+    return FastJSONResponse(content=crop_batcher.stats())
+
+@app.get("/api/crop-recommendation/prediction-cache/stats")
+async def get_prediction_cache_stats():
+    """
+    Get size and hit rate of the memoized crop predictions
+    """
+    return FastJSONResponse(content={**prediction_cache.stats(), "model_version": crop_engine.model_version})
+
+@app.post("/api/crop-recommendation/fleet-run")
+async def trigger_fleet_recommendations():
+    """
+    Run the fleet-wide recommendation job now and return its report
+    """
+    try:
+        if fleet_job_lock.locked():
+            raise HTTPException(status_code=409, detail="Fleet recommendation job is already running")
+        return FastJSONResponse(content=await run_fleet_recommendations())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running fleet recommendations: {str(e)}")
+
+@app.get("/api/crop-recommendation/fleet-run/last")
+async def get_last_fleet_run():
+    """
+    Get the report of the most recent fleet recommendation run
+    """
+    job = scheduler.get_job('fleet_recommendations')
+    return FastJSONResponse(content={
+        "running": fleet_job_lock.locked(),
+        "interval_minutes": CROP_FLEET_JOB_INTERVAL_MINUTES,
+        "next_run": job.next_run_time.isoformat() if job and job.next_run_time else None,
+        "last_run": cache.get("fleet_recommendations")
+    })
+
+
+@app.get("/api/crop-recommendation/model-pool/health")
+async def get_model_pool_health():
+    """
+    Ping the model worker processes and report pool statistics
+    """
+    if model_pool is None:
+        return FastJSONResponse(content={"enabled": False})
+    await model_pool.health_check()
+    return FastJSONResponse(content=model_pool.stats())
+
+
 @app.get("/api/crop-recommendation/model-info")
 async def get_model_info():
     """
     Get information about the crop recommendation model
     """
     try:
-        if crop_model is None:
-            return JSONResponse(content={
+        if not await crop_engine.ensure_loaded():
+            return FastJSONResponse(content={
                 "status": "unavailable",
                 "message": "Crop recommendation model is not loaded"
             })
@@ -1034,8 +2044,8 @@ async def get_model_info():
         model_info = {
             "status": "available",
             "model_type": "Random Forest Classifier",
-            "supported_crops": list(crop_model.classes_),
-            "total_crops": len(crop_model.classes_),
+            "supported_crops": crop_engine.classes,
+            "total_crops": len(crop_engine.classes),
             "input_features": [
                 "Nitrogen (N)",
                 "Phosphorus (P)",
@@ -1048,7 +2058,7 @@ async def get_model_info():
             "feature_count": 7
         }
         
-        return JSONResponse(content=model_info)
+        return FastJSONResponse(content=model_info)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching model info: {str(e)}")
@@ -0,0 +1,251 @@
+"""
+Prometheus metrics for the API, served in the text exposition format on `/metrics`
+
+The registry is small and dependency-free: counters and histograms keep
+their samples per label set under a lock (database round trips record from
+the thread pool), and callback metrics read a component's own `stats()` when
+`/metrics` is scraped, so the caches and queues need no extra bookkeeping.
+
+Recorded here:
+
+- `http_request_duration_seconds` per method, route template and status
+  (`MetricsMiddleware`),
+- `db_queries_total`, `db_query_duration_seconds` and `db_response_bytes_total`
+  per table and HTTP method, and `db_queries_coalesced_total` per table
+  (`database.execute`),
+- `model_inference_seconds` and `model_batch_rows` per backend
+  (`CropInferenceEngine`, `ModelPool`),
+- `scheduler_job_duration_seconds` per job (`timed_job`) and
+  `refresh_sync_duration_seconds` per delta refresh dataset.
+"""
+import functools
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# Seconds; covers cached responses (~1 ms) up to slow PostgREST pages and jobs
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+JOB_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+BATCH_ROW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1000, 5000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts (not cumulative), sum, count]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from `collect()` at scrape time: {label values: value}"""
+
+    def __init__(self, name: str, documentation: str, metric_type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.collect().items():
+            if value is None:
+                continue
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, metric_type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple, float]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, metric_type, labelnames, collect))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # One broken stats() must not take the whole scrape down
+                lines.append(f"# {metric.name} failed to collect: {_escape(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+db_queries = metrics.counter(
+    "db_queries_total", "Supabase (PostgREST) round trips", ("table", "method", "outcome")
+)
+db_queries_coalesced = metrics.counter(
+    "db_queries_coalesced_total", "Reads served by an identical read already in flight (round trips saved)", ("table",)
+)
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds", "Supabase (PostgREST) round-trip time on the database thread pool",
+    ("table", "method")
+)
+db_response_bytes = metrics.counter(
+    "db_response_bytes_total", "Response body bytes received from PostgREST", ("table",)
+)
+model_inference_duration = metrics.histogram(
+    "model_inference_seconds", "Crop model scoring time per call", ("backend",)
+)
+model_batch_rows = metrics.histogram(
+    "model_batch_rows", "Feature rows scored per crop model call", ("backend",), buckets=BATCH_ROW_BUCKETS
+)
+scheduler_job_duration = metrics.histogram(
+    "scheduler_job_duration_seconds", "Scheduled job run time", ("job", "outcome"), buckets=JOB_BUCKETS
+)
+refresh_sync_duration = metrics.histogram(
+    "refresh_sync_duration_seconds", "Delta refresh sync time per dataset", ("dataset", "outcome")
+)
+
+
+def record_inference(backend: str, rows: int, started: float):
+    """Record one crop model call that began at perf_counter() `started`"""
+    model_inference_duration.observe(time.perf_counter() - started, backend=backend)
+    model_batch_rows.observe(rows, backend=backend)
+
+
+def timed_job(job):
+    """Scheduler job wrapper recording the job's run time and outcome"""
+    @functools.wraps(job)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await job(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            scheduler_job_duration.observe(time.perf_counter() - started, job=job.__name__, outcome=outcome)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template (`/api/soil-analysis/{land_id}/history`)"""
+
+    def __init__(self, app, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = scope.get("route")
+            template: Optional[str] = getattr(route, "path", None) or "<unmatched>"
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=template, status=str(status["code"])
+            )
@@ -0,0 +1,164 @@
+"""
+Micro-batching queue for single-row crop predictions
+
+Bursts of `/api/crop-recommendation/predict` calls each pay sklearn's fixed
+per-call overhead for a single row. When enabled, single-row requests are put
+on a queue; a worker collects everything that arrives within a short window
+(or until `max_rows` is reached), scores the whole batch with one
+`predict_proba` call on a dedicated thread (or through an async scorer such as
+the model process pool) and resolves each caller's future.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+CROP_MICRO_BATCH_ENABLED = os.getenv("CROP_MICRO_BATCH_ENABLED", "false").lower() == "true"
+CROP_MICRO_BATCH_WINDOW_MS = float(os.getenv("CROP_MICRO_BATCH_WINDOW_MS", "3"))
+CROP_MICRO_BATCH_MAX_ROWS = int(os.getenv("CROP_MICRO_BATCH_MAX_ROWS", "64"))
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, float("inf"))
+
+
+class PendingPrediction:
+    __slots__ = ("features", "future", "enqueued_at")
+
+    def __init__(self, features: np.ndarray, future: asyncio.Future):
+        self.features = features
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    def __init__(self, engine, window_ms: float = CROP_MICRO_BATCH_WINDOW_MS,
+                 max_rows: int = CROP_MICRO_BATCH_MAX_ROWS, scorer: Optional[Callable] = None):
+        self.engine = engine
+        # Async callable (matrix -> probabilities) used instead of the dedicated thread
+        self.scorer = scorer
+        self.window = window_ms / 1000
+        self.max_rows = max(1, max_rows)
+        self._queue = None
+        self._worker = None
+        # One dedicated thread so batches never compete with the database pool
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crop-batch")
+        self._recent_waits = deque(maxlen=1024)
+        self._size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_size = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.errors = 0
+
+    def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False)
+
+    async def predict_proba_one(self, features: Sequence[float]) -> np.ndarray:
+        """Queue one feature vector and wait for its probability row"""
+        if self._worker is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(PendingPrediction(np.asarray(features, dtype=np.float64), future))
+        return await future
+
+    async def predict_one(self, features: Sequence[float], top_k: int = 3) -> dict:
+        """Same result as CropInferenceEngine.predict_one, scored in a shared batch"""
+        probabilities = await self.predict_proba_one(features)
+        return self.engine.rank(probabilities[None, :], top_k)[0]
+
+    async def _collect(self) -> list:
+        first = await self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.window
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Window closed: take whatever is already waiting, but do not wait for more
+                while len(batch) < self.max_rows and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item.future.cancelled()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            self._record(batch, started)
+            try:
+                matrix = np.stack([item.features for item in batch])
+                if self.scorer is not None:
+                    probabilities = await self.scorer(matrix)
+                else:
+                    probabilities = await loop.run_in_executor(self._executor, self.engine.predict_proba, matrix)
+            except Exception as e:
+                self.errors += 1
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            for row, item in enumerate(batch):
+                if not item.future.done():
+                    item.future.set_result(probabilities[row])
+
+    def _record(self, batch: list, started: float):
+        size = len(batch)
+        self.batches += 1
+        self.rows += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self._size_histogram[bucket] += 1
+                break
+        for item in batch:
+            wait_ms = (started - item.enqueued_at) * 1000
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self._recent_waits.append(wait_ms)
+
+    def stats(self) -> dict:
+        recent = np.array(self._recent_waits) if self._recent_waits else np.zeros(1)
+        return {
+            "enabled": self._worker is not None,
+            "window_ms": self.window * 1000,
+            "max_rows": self.max_rows,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "rows": self.rows,
+            "errors": self.errors,
+            "batch_size": {
+                "average": round(self.rows / self.batches, 2) if self.batches else 0,
+                "max": self.max_batch_size,
+                "histogram": {f"<={bucket}": count for bucket, count in self._size_histogram.items()}
+            },
+            "queue_wait_ms": {
+                "average": round(self.total_wait_ms / self.rows, 3) if self.rows else 0,
+                "p50": round(float(np.percentile(recent, 50)), 3),
+                "p95": round(float(np.percentile(recent, 95)), 3),
+                "max": round(self.max_wait_ms, 3)
+            }
+        }
@@ -0,0 +1,154 @@
+"""
+Process-pool model serving for the crop-recommendation RandomForest
+
+RandomForest inference holds the GIL, so running it inside the uvicorn worker
+stalls every other request while a forest is walked. When enabled, inference
+is dispatched to a pool of worker processes instead. Each worker loads
+crop_model.pkl once in its initializer into its own CropInferenceEngine (with
+joblib `mmap_mode="r"`, so any numpy arrays stored in the file are mapped rather
+than copied, and the same inference backend as the API process) and then only
+receives feature matrices and returns probability matrices.
+
+A crashed worker breaks a ProcessPoolExecutor; the pool is rebuilt and the
+request retried once. A periodic health check pings the workers and rebuilds
+the pool if they stop answering.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import numpy as np
+
+from inference import CROP_MODEL_MMAP_MODE, CropInferenceEngine
+from metrics import record_inference
+
+CROP_MODEL_WORKERS = int(os.getenv("CROP_MODEL_WORKERS", "0"))
+CROP_MODEL_WORKER_HEALTH_SECONDS = int(os.getenv("CROP_MODEL_WORKER_HEALTH_SECONDS", "30"))
+CROP_MODEL_WORKER_TIMEOUT_SECONDS = float(os.getenv("CROP_MODEL_WORKER_TIMEOUT_SECONDS", "10"))
+
+# ==================== WORKER PROCESS SIDE ====================
+
+_worker_engine = None
+
+
+def _init_worker(model_path: str, mmap_mode: Optional[str]):
+    """Load the model once per worker process"""
+    global _worker_engine
+    warnings.filterwarnings("ignore")
+    engine = CropInferenceEngine(model_path=model_path, mmap_mode=mmap_mode)
+    engine.load()
+    _worker_engine = engine
+
+
+def _worker_predict_proba(features: np.ndarray) -> np.ndarray:
+    return _worker_engine.predict_proba(features)
+
+
+def _worker_ping() -> dict:
+    return {"pid": os.getpid(), "model_loaded": _worker_engine is not None and _worker_engine.is_loaded}
+
+# ==================== API PROCESS SIDE ====================
+
+
+class ModelPool:
+    def __init__(self, model_path: str, workers: int = CROP_MODEL_WORKERS, mmap_mode: Optional[str] = CROP_MODEL_MMAP_MODE):
+        self.model_path = model_path
+        self.workers = max(1, workers)
+        self.mmap_mode = mmap_mode
+        # spawn: workers never inherit the API process's threads or sockets
+        self._context = multiprocessing.get_context("spawn")
+        self._pool = None
+        self.restarts = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_health = None
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.mmap_mode)
+        )
+
+    def start(self):
+        if self._pool is None:
+            self._pool = self._create_pool()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _restart(self, broken_pool: ProcessPoolExecutor):
+        # Several requests can fail on the same broken pool; rebuild it only once
+        if self._pool is not broken_pool:
+            return
+        print(f"⚠️ Model worker pool broken, restarting {self.workers} workers")
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._create_pool()
+        self.restarts += 1
+
+    async def _submit(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                self.failures += 1
+                self._restart(pool)
+                if attempt == 1:
+                    raise
+
+    async def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Score an (N, 7) feature matrix in a worker process"""
+        self.requests += 1
+        started = time.perf_counter()
+        matrix = np.asarray(features, dtype=np.float64)
+        probabilities = await self._submit(_worker_predict_proba, matrix)
+        # Includes the trip to the worker process, which is what callers wait for
+        record_inference("process_pool", len(matrix), started)
+        return probabilities
+
+    async def health_check(self) -> dict:
+        """
+        Ping the workers; rebuild the pool if they do not answer in time
+        One ping per worker slot also makes idle workers spawn and load the model
+        """
+        started = time.perf_counter()
+        pool = self._pool
+        try:
+            replies = await asyncio.wait_for(
+                asyncio.gather(*(self._submit(_worker_ping) for _ in range(self.workers))),
+                timeout=CROP_MODEL_WORKER_TIMEOUT_SECONDS
+            )
+            pids = sorted({reply["pid"] for reply in replies})
+            healthy = all(reply["model_loaded"] for reply in replies)
+        except Exception as e:
+            print(f"⚠️ Model worker health check failed: {str(e)}")
+            self._restart(pool)
+            pids, healthy = [], False
+        self.last_health = {
+            "healthy": healthy,
+            "responding_pids": pids,
+            "checked_at": time.time(),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        return self.last_health
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._pool is not None,
+            "workers": self.workers,
+            "mmap_mode": self.mmap_mode,
+            "requests": self.requests,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "last_health": self.last_health
+        }
@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination for listings that grow without bound
+
+Offset pagination makes the database walk and discard every earlier row, so
+deep pages get slower as history grows. Here each page is ordered by a sort
+column plus the primary key as tiebreaker, both descending with nulls last,
+and the next page starts strictly after the last row returned:
+
+    (sort < last_sort) OR (sort = last_sort AND id < last_id) OR (sort IS NULL)
+
+That is one index range scan per page however deep the client goes. The
+cursor handed to clients is the last row's key, base64url-encoded together
+with the listing it belongs to; clients treat it as opaque and send it back
+as `cursor`.
+"""
+import base64
+import json
+from typing import Optional, Tuple
+
+PAGINATION_CURSOR_VERSION = 1
+
+
+def encode_cursor(scope: str, sort_value, id_value) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    payload = json.dumps({"v": PAGINATION_CURSOR_VERSION, "s": scope, "k": [sort_value, id_value]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str) -> Tuple:
+    """(sort_value, id_value) from a cursor; ValueError if it is malformed or from another listing"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sort_value, id_value = payload["k"]
+        version, cursor_scope = payload["v"], payload["s"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if version != PAGINATION_CURSOR_VERSION or cursor_scope != scope:
+        raise ValueError("Cursor does not belong to this listing")
+    if not isinstance(id_value, int) or isinstance(id_value, bool) or not isinstance(sort_value, (str, int, float, type(None))):
+        raise ValueError("Invalid cursor")
+    return sort_value, id_value
+
+
+def _literal(value) -> str:
+    """Value quoted for a PostgREST logic filter (timestamps contain `:` and `+`)"""
+    text = value if isinstance(value, str) else repr(value)
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def keyset_page(query, sort_column: str, id_column: str, page_size: int, after: Optional[Tuple] = None):
+    """
+    Order the query by (sort_column, id_column) descending with nulls last and fetch one
+    extra row, so `split_page` can tell whether another page follows
+    """
+    if after is not None:
+        sort_value, id_value = after
+        if sort_value is None:
+            # Only rows with a null sort value and a lower id follow a null-sorted row
+            query = query.is_(sort_column, 'null').lt(id_column, id_value)
+        else:
+            literal = _literal(sort_value)
+            query = query.or_(
+                f"{sort_column}.lt.{literal},"
+                f"and({sort_column}.eq.{literal},{id_column}.lt.{id_value}),"
+                f"{sort_column}.is.null"
+            )
+    return (query.order(sort_column, desc=True, nullsfirst=False)
+            .order(id_column, desc=True)
+            .limit(page_size + 1))
+
+
+def keyset_newer(query, sort_column: str, id_column: str, key: Tuple):
+    """Rows whose (sort_column, id_column) is above `key`, for change feeds and oldest-first pages"""
+    sort_value, id_value = key
+    literal = _literal(sort_value)
+    return query.or_(
+        f"{sort_column}.gt.{literal},"
+        f"and({sort_column}.eq.{literal},{id_column}.gt.{id_value})"
+    )
+
+
+def split_page(rows: list, page_size: int, scope: str, sort_column: str, id_column: str) -> Tuple[list, Optional[str]]:
+    """The page's rows and the cursor of the next page (None on the last page)"""
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, encode_cursor(scope, last.get(sort_column), last[id_column])
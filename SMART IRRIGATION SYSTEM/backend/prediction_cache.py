@@ -0,0 +1,119 @@
+"""
+LRU memo of crop-model probabilities keyed on quantized inputs
+
+Lands often report identical or near-identical soil values, and
+predict-from-soil fills missing climate data with fixed defaults, so the same
+feature vectors are scored again and again. Inputs are snapped to sensor
+precision (whole mg/kg for N/P/K, 0.1 for temperature/humidity/rainfall, 0.01
+for pH) to form the cache key only; a miss scores the caller's own inputs, and
+inputs that agree to sensor precision share that result. Keys include the
+model version, so entries from a previous model file are never served.
+Concurrent requests for the same uncached vector wait for a single scoring call.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from inference import FEATURE_NAMES
+
+CROP_PREDICTION_CACHE_ENABLED = os.getenv("CROP_PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+CROP_PREDICTION_CACHE_SIZE = int(os.getenv("CROP_PREDICTION_CACHE_SIZE", "10000"))
+
+# Sensor precision per feature, in FEATURE_NAMES order (N, P, K, temperature, humidity, ph, rainfall)
+FEATURE_PRECISION = np.array([1.0, 1.0, 1.0, 0.1, 0.1, 0.01, 0.1])
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = CROP_PREDICTION_CACHE_SIZE, enabled: bool = CROP_PREDICTION_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled and max_entries > 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def quantize(features: Sequence[float]) -> np.ndarray:
+        """Integer sensor-precision steps for an (N, 7) matrix or a single vector"""
+        return np.rint(np.asarray(features, dtype=np.float64) / FEATURE_PRECISION).astype(np.int64)
+
+    def get(self, model_version: str, steps: np.ndarray) -> Optional[np.ndarray]:
+        probabilities = self._lookup((model_version, steps.tobytes()))
+        if probabilities is None:
+            self.misses += 1
+        return probabilities
+
+    def put(self, model_version: str, steps: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+        return self._store((model_version, steps.tobytes()), probabilities)
+
+    async def get_or_score(self, model_version: str, features: Sequence[float], score: Callable) -> np.ndarray:
+        """
+        Cached probabilities for the quantized vector, else `await score(features)`
+        Concurrent callers with the same key share one scoring call
+        """
+        key = (model_version, self.quantize(features).tobytes())
+        probabilities = self._lookup(key)
+        if probabilities is not None:
+            return probabilities
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # Scored in its own task, so a caller that is cancelled does not cancel the others waiting on it
+        task = asyncio.ensure_future(self._score(key, features, score))
+        # Callers re-raise a failure; do not log it as unretrieved when all of them are gone
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._pending[key] = task
+        return await asyncio.shield(task)
+
+    async def _score(self, key, features: Sequence[float], score: Callable) -> np.ndarray:
+        try:
+            return self._store(key, await score(features))
+        finally:
+            del self._pending[key]
+
+    def _lookup(self, key) -> Optional[np.ndarray]:
+        probabilities = self._entries.get(key)
+        if probabilities is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return probabilities
+
+    def _store(self, key, probabilities: np.ndarray) -> np.ndarray:
+        # Own copy, so a cached row never keeps a whole batch result alive
+        probabilities = np.array(probabilities, dtype=np.float64)
+        probabilities.flags.writeable = False
+        self._entries[key] = probabilities
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return probabilities
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        served = self.hits + self.coalesced
+        lookups = served + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "precision": dict(zip(FEATURE_NAMES, FEATURE_PRECISION.tolist()))
+        }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,185 @@
+"""
+Bounded response cache for read endpoints that dashboards poll constantly
+
+Entries are the encoded JSON bodies of successful responses, keyed by route
+name and handler parameters. The cache is bounded by both entry count and
+total body bytes and evicts least recently used entries first. Each route has
+its own TTL; after it expires an entry is still served for `stale_ttl`
+seconds while a single background task reloads it (stale-while-revalidate).
+Entries are tagged with their `land_id` so writes can invalidate them.
+"""
+import asyncio
+import functools
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Rough per-entry bookkeeping cost (key tuple, dict slots, timestamps)
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class CacheEntry:
+    __slots__ = ("body", "status_code", "stored_at", "ttl", "stale_ttl", "land_id", "size")
+
+    def __init__(self, body: bytes, status_code: int, ttl: float, stale_ttl: float, land_id):
+        self.body = body
+        self.status_code = status_code
+        self.stored_at = time.monotonic()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.land_id = land_id
+        self.size = len(body) + ENTRY_OVERHEAD_BYTES
+
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._keys_by_land = {}
+        self._land_generations = {}
+        self._refreshing = set()
+        self._background_tasks = set()
+        self.total_bytes = 0
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "refresh_errors": 0
+        }
+
+    # ---------- storage ----------
+
+    def _store(self, key, entry: CacheEntry):
+        self._remove(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        if entry.land_id is not None:
+            self._keys_by_land.setdefault(entry.land_id, set()).add(key)
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.counters["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry.size
+        if entry.land_id is not None:
+            keys = self._keys_by_land.get(entry.land_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_land[entry.land_id]
+
+    def invalidate_land(self, land_id: int) -> int:
+        """Drop every cached response for a land; returns how many were removed"""
+        # Bump the generation so loads that started before the write are not stored
+        self._land_generations[land_id] = self._land_generations.get(land_id, 0) + 1
+        keys = list(self._keys_by_land.get(land_id, ()))
+        for key in keys:
+            self._remove(key)
+        self.counters["invalidations"] += len(keys)
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_land.clear()
+        self.total_bytes = 0
+
+    # ---------- loading ----------
+
+    async def _load(self, key, handler, kwargs, ttl, stale_ttl, land_id) -> CacheEntry:
+        generation = self._land_generations.get(land_id, 0)
+        response = await handler(**kwargs)
+        entry = CacheEntry(response.body, response.status_code, ttl, stale_ttl, land_id)
+        if 200 <= response.status_code < 300 and generation == self._land_generations.get(land_id, 0):
+            self._store(key, entry)
+        return entry
+
+    async def _revalidate(self, key, handler, kwargs, ttl, stale_ttl, land_id):
+        try:
+            await self._load(key, handler, kwargs, ttl, stale_ttl, land_id)
+        except Exception as e:
+            # Keep serving the stale copy until it ages out; the next miss surfaces the error
+            self.counters["refresh_errors"] += 1
+            print(f"⚠️ Cache revalidation failed for {key[0]}: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+    def cached(self, route: str, ttl: float, stale_ttl: float = 0):
+        """
+        Decorator for FastAPI handlers that return a JSONResponse
+        Handler exceptions (404s, 500s) propagate and are never cached
+        """
+        def decorator(handler):
+            @functools.wraps(handler)
+            async def wrapper(**kwargs):
+                if not self.enabled:
+                    return await handler(**kwargs)
+
+                key = (route, tuple(sorted(kwargs.items())))
+                entry = self._entries.get(key)
+                if entry is not None:
+                    age = entry.age()
+                    if age < entry.ttl:
+                        self._entries.move_to_end(key)
+                        self.counters["hits"] += 1
+                        return self._respond(entry, "HIT")
+                    if age < entry.ttl + entry.stale_ttl:
+                        self._entries.move_to_end(key)
+                        self.counters["stale_hits"] += 1
+                        if key not in self._refreshing:
+                            self._refreshing.add(key)
+                            task = asyncio.create_task(
+                                self._revalidate(key, handler, kwargs, ttl, stale_ttl, kwargs.get("land_id"))
+                            )
+                            self._background_tasks.add(task)
+                            task.add_done_callback(self._background_tasks.discard)
+                        return self._respond(entry, "STALE")
+
+                self.counters["misses"] += 1
+                entry = await self._load(key, handler, kwargs, ttl, stale_ttl, kwargs.get("land_id"))
+                return self._respond(entry, "MISS")
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _respond(entry: CacheEntry, status: str) -> Response:
+        return Response(
+            content=entry.body,
+            status_code=entry.status_code,
+            media_type="application/json",
+            headers={"X-Cache": status, "Age": str(int(entry.age()))}
+        )
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            **self.counters,
+            "hit_ratio": round((self.counters["hits"] + self.counters["stale_hits"]) / lookups, 4) if lookups else 0.0
+        }
+
+
+response_cache = ResponseCache()
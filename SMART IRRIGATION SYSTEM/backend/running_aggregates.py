@@ -0,0 +1,347 @@
+"""
+Incremental running aggregates over soil and sensor metrics
+
+Instead of pulling every historical row to average it, each `RunningAggregates`
+keeps count, sum and sum of squares per metric for every group (land for soil
+analysis, sensor for readings) and for the whole table. `sync()` reads only the
+rows whose primary key is above the stored watermark, so after the first full
+pass an update costs one small query and answering needs no query at all.
+Mean and (population) variance come straight from the three sums.
+
+The first sync (and every `rebuild()`) is seeded from the table's aggregate
+function (`<table>_running_aggregates()` in `database_schema_soil_analysis.sql`):
+one GROUP BY in Postgres returns the sums of every group and the watermark
+they cover, instead of paging through every row in every worker. Without the
+function the first sync falls back to reading all rows. An instance can also
+keep the newest `recent_rows` rows (by `recent_column`), read with one query
+when seeding and topped up by every sync, so "latest N" answers need no query.
+
+The watermark is the table's auto-increment id rather than `recorded_at`, so
+rows that arrive late with an older timestamp are still counted. Ids are handed
+out before commit, so a row can become visible after a higher id was already
+synced; every sync therefore also re-reads the ids of the last `rescan_ids`
+below the watermark and folds in any it has not counted. Edits and deletes of
+rows already counted, and rows that commit later than that, are picked up by `rebuild()`.
+"""
+import asyncio
+import heapq
+import os
+import time
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+
+import database as db
+
+RUNNING_AGGREGATES_SYNC_SECONDS = int(os.getenv("RUNNING_AGGREGATES_SYNC_SECONDS", "30"))
+RUNNING_AGGREGATES_PAGE_SIZE = int(os.getenv("RUNNING_AGGREGATES_PAGE_SIZE", "1000"))
+RUNNING_AGGREGATES_REBUILD_HOURS = int(os.getenv("RUNNING_AGGREGATES_REBUILD_HOURS", "24"))
+RUNNING_AGGREGATES_RECENT_READINGS = int(os.getenv("RUNNING_AGGREGATES_RECENT_READINGS", "100"))
+RUNNING_AGGREGATES_RESCAN_IDS = int(os.getenv("RUNNING_AGGREGATES_RESCAN_IDS", "1000"))
+
+# Rows of each group's state matrix
+COUNT, SUM, SUMSQ = 0, 1, 2
+
+
+class RunningAggregates:
+    def __init__(self, table: str, id_column: str, group_column: str, metrics: Sequence[str],
+                 extra_columns: Sequence[str] = (), page_size: int = RUNNING_AGGREGATES_PAGE_SIZE,
+                 seed_function: Optional[str] = None, recent_rows: int = 0, recent_column: Optional[str] = None,
+                 rescan_ids: int = RUNNING_AGGREGATES_RESCAN_IDS):
+        self.table = table
+        self.id_column = id_column
+        self.group_column = group_column
+        self.metrics = list(metrics)
+        # Fetched with every page for subscribers, not aggregated
+        self.extra_columns = list(extra_columns)
+        self.page_size = page_size
+        self.seed_function = seed_function
+        self.recent_rows = recent_rows
+        self.recent_column = recent_column
+        self.rescan_ids = rescan_ids
+        self.seeded = False
+        self._row_listeners = []
+        self._reset_listeners = []
+        self._seed_listeners = []
+        self._sync_lock = asyncio.Lock()
+        self.watermark = 0
+        self.rows = 0
+        self.synced_at = None
+        self.last_sync = None
+        self._total = np.zeros((3, len(self.metrics)))
+        self._groups = {}
+        self._group_rows = {}
+        # Min-heap of (recent_column, id, row): the newest recent_rows rows
+        self._recent = []
+        # Ids counted among the last rescan_ids below the watermark
+        self._seen = set()
+
+    # ---------- updating ----------
+
+    def subscribe(self, on_rows: Callable, on_reset: Optional[Callable] = None, on_seed: Optional[Callable] = None):
+        """
+        Call on_rows(rows) with every page folded in, on_reset() after a rebuild, and
+        on_seed() when the first sync was seeded, i.e. earlier rows were never passed to on_rows
+        """
+        self._row_listeners.append(on_rows)
+        if on_reset is not None:
+            self._reset_listeners.append(on_reset)
+        if on_seed is not None:
+            self._seed_listeners.append(on_seed)
+
+    def add_rows(self, rows: list):
+        """Fold a page of rows into the per-group and total sums in one vectorized pass"""
+        if not rows:
+            return
+        # Rows without a group still count towards the table totals
+        keys = np.array([-1 if row.get(self.group_column) is None else row[self.group_column] for row in rows])
+        # Missing and null values become NaN and are left out of that metric's count
+        values = np.array([[row.get(metric) for metric in self.metrics] for row in rows], dtype=np.float64)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+
+        groups, inverse = np.unique(keys, return_inverse=True)
+        per_group = np.stack([
+            np.stack([np.bincount(inverse, weights=column, minlength=len(groups)) for column in stat.T], axis=1)
+            for stat in (present.astype(np.float64), filled, filled * filled)
+        ], axis=1)
+        rows_per_group = np.bincount(inverse, minlength=len(groups))
+
+        for key, state, group_rows in zip(groups.tolist(), per_group, rows_per_group.tolist()):
+            if key in self._groups:
+                self._groups[key] += state
+                self._group_rows[key] += group_rows
+            else:
+                self._groups[key] = state
+                self._group_rows[key] = group_rows
+        self._total += per_group.sum(axis=0)
+        self.rows += len(rows)
+        self.watermark = max(self.watermark, max(row[self.id_column] for row in rows))
+        self._keep_recent(rows)
+        self._track_seen(row[self.id_column] for row in rows)
+        self._notify(rows)
+
+    def _track_seen(self, ids: Iterable):
+        if not self.rescan_ids:
+            return
+        floor = self.watermark - self.rescan_ids
+        self._seen.update(ids)
+        self._seen = {row_id for row_id in self._seen if row_id > floor}
+
+    def _notify(self, rows: list):
+        for listener in self._row_listeners:
+            listener(rows)
+
+    @property
+    def columns(self) -> str:
+        return ", ".join([self.id_column, self.group_column, *self.metrics, *self.extra_columns])
+
+    async def _rows_between(self, after: int, upto: int) -> list:
+        """Rows with ids in (after, upto], in id order"""
+        rows = []
+        while after < upto:
+            page = (await db.execute(
+                db.table(self.table).select(self.columns)
+                .gt(self.id_column, after)
+                .lte(self.id_column, upto)
+                .order(self.id_column)
+                .limit(self.page_size)
+            )).data or []
+            rows.extend(page)
+            if len(page) < self.page_size:
+                break
+            after = page[-1][self.id_column]
+        return rows
+
+    async def _rows_with_ids(self, ids: list) -> list:
+        rows = []
+        for start in range(0, len(ids), self.page_size):
+            rows.extend((await db.execute(
+                db.table(self.table).select(self.columns).in_(self.id_column, ids[start:start + self.page_size])
+            )).data or [])
+        return sorted(rows, key=lambda row: row[self.id_column])
+
+    async def _rescan(self) -> int:
+        """Fold in rows below the watermark whose ids committed after a higher id was synced"""
+        if not self.rescan_ids or not self.watermark:
+            return 0
+        present = (await db.execute(
+            db.table(self.table).select(self.id_column)
+            .gt(self.id_column, self.watermark - self.rescan_ids)
+            .lte(self.id_column, self.watermark)
+            .order(self.id_column)
+            .limit(self.rescan_ids)
+        )).data or []
+        late = [row[self.id_column] for row in present if row[self.id_column] not in self._seen]
+        if not late:
+            return 0
+        rows = await self._rows_with_ids(late)
+        self.add_rows(rows)
+        return len(rows)
+
+    def _keep_recent(self, rows: list):
+        if not self.recent_rows:
+            return
+        for row in rows:
+            item = (row.get(self.recent_column) or '', row[self.id_column], row)
+            if len(self._recent) < self.recent_rows:
+                heapq.heappush(self._recent, item)
+            elif item[:2] > self._recent[0][:2]:
+                heapq.heapreplace(self._recent, item)
+
+    async def _seed(self) -> bool:
+        """Load every group's sums and the watermark from the aggregate function; False if it failed"""
+        try:
+            data = (await db.execute(db.rpc(self.seed_function, {"recent_ids": self.rescan_ids}))).data
+            groups, watermark = data["groups"], int(data["watermark"] or 0)
+            recent = []
+            if self.recent_rows and watermark:
+                # Rows above the watermark reach the tail through the sync that follows
+                recent = (await db.execute(
+                    db.table(self.table).select(self.columns)
+                    .lte(self.id_column, watermark)
+                    .order(self.recent_column, desc=True, nullsfirst=False)
+                    .order(self.id_column, desc=True)
+                    .limit(self.recent_rows)
+                )).data or []
+        except Exception as e:
+            print(f"⚠️ {self.seed_function}() unavailable, counting {self.table} row by row: {str(e)}")
+            return False
+        width = len(self.metrics)
+        for group in groups:
+            key = -1 if group[0] is None else group[0]
+            self._groups[key] = np.array(group[2:2 + 3 * width], dtype=np.float64).reshape(3, width)
+            self._group_rows[key] = int(group[1])
+            self._total += self._groups[key]
+            self.rows += int(group[1])
+        self.watermark = watermark
+        self._keep_recent(recent)
+        self._track_seen(data.get("ids") or [])
+        self.seeded = True
+        for listener in self._seed_listeners:
+            listener()
+        return True
+
+    async def sync(self, max_age: Optional[float] = None) -> dict:
+        """
+        Re-check the id window below the watermark, then read rows above it page by page, and fold them in
+        With max_age, skip the query if the last sync is at most that many seconds old
+        """
+        if max_age is not None and self.synced_at is not None and time.monotonic() - self.synced_at <= max_age:
+            return self.last_sync
+        async with self._sync_lock:
+            # Another caller may have synced while this one waited for the lock
+            if max_age is not None and self.synced_at is not None and time.monotonic() - self.synced_at <= max_age:
+                return self.last_sync
+            started = time.perf_counter()
+            new_rows = 0
+            if self.synced_at is None and self.watermark == 0 and self.seed_function is not None:
+                await self._seed()
+            late_rows = await self._rescan()
+            while True:
+                query = (db.table(self.table).select(self.columns)
+                         .gt(self.id_column, self.watermark)
+                         .order(self.id_column)
+                         .limit(self.page_size))
+                page = (await db.execute(query)).data or []
+                self.add_rows(page)
+                new_rows += len(page)
+                if len(page) < self.page_size:
+                    break
+            self.synced_at = time.monotonic()
+            self.last_sync = {
+                "seeded": self.seeded,
+                "new_rows": new_rows,
+                "late_rows": late_rows,
+                "watermark": self.watermark,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+            return self.last_sync
+
+    async def rebuild(self) -> dict:
+        """
+        Recount from scratch into a fresh instance and swap its state in
+        Rows the recount took in beyond what this instance had synced are then passed to the row listeners
+        """
+        # The fresh instance has no subscribers, so rows already seen are not replayed to them
+        fresh = RunningAggregates(
+            self.table, self.id_column, self.group_column, self.metrics, self.extra_columns, self.page_size,
+            self.seed_function, self.recent_rows, self.recent_column, self.rescan_ids
+        )
+        result = await fresh.sync()
+        async with self._sync_lock:
+            if fresh.watermark < self.watermark:
+                # Synced here while the recount ran: the recount lacks these rows, the listeners have most of them
+                fresh.add_rows(await self._rows_between(fresh.watermark, self.watermark))
+            # Counted by the recount, never seen by the listeners: rows above the old watermark,
+            # and late ids inside its window that this instance had not rescanned yet
+            window_floor = fresh.watermark - fresh.rescan_ids
+            missed = await self._rows_between(self.watermark, min(window_floor, fresh.watermark))
+            missed += await self._rows_with_ids(sorted(
+                row_id for row_id in fresh._seen
+                if row_id > self.watermark - self.rescan_ids and row_id not in self._seen
+            ))
+            self.watermark, self.rows = fresh.watermark, fresh.rows
+            self.synced_at, self.last_sync = fresh.synced_at, fresh.last_sync
+            self._total, self._groups, self._group_rows = fresh._total, fresh._groups, fresh._group_rows
+            self._recent, self._seen = fresh._recent, fresh._seen
+            if missed:
+                self._notify(missed)
+        for listener in self._reset_listeners:
+            listener()
+        return {**result, "replayed_rows": len(missed)}
+
+    # ---------- reading ----------
+
+    def recent(self) -> list:
+        """The newest `recent_rows` rows, newest first (ties by id)"""
+        return [row for _, _, row in sorted(self._recent, key=lambda item: item[:2], reverse=True)]
+
+    def summary(self, groups: Optional[Iterable] = None) -> dict:
+        """Row count plus count/mean/variance/std per metric, for the whole table or some groups"""
+        if groups is None:
+            state, rows = self._total, self.rows
+        else:
+            groups = [key for key in groups if key in self._groups]
+            state = sum((self._groups[key] for key in groups), np.zeros_like(self._total))
+            rows = sum(self._group_rows[key] for key in groups)
+        counts = state[COUNT]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = state[SUM] / counts
+            # E[x^2] - E[x]^2 can dip just below zero from rounding
+            variances = np.maximum(state[SUMSQ] / counts - means * means, 0.0)
+        metrics = {}
+        for i, metric in enumerate(self.metrics):
+            if counts[i] == 0:
+                metrics[metric] = {"count": 0, "mean": None, "variance": None, "std": None}
+            else:
+                metrics[metric] = {
+                    "count": int(counts[i]),
+                    "mean": float(means[i]),
+                    "variance": float(variances[i]),
+                    "std": float(np.sqrt(variances[i]))
+                }
+        return {"rows": int(rows), "metrics": metrics}
+
+    def stats(self) -> dict:
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "groups": len(self._groups),
+            "watermark": self.watermark,
+            "seeded": self.seeded,
+            "synced_seconds_ago": round(time.monotonic() - self.synced_at, 1) if self.synced_at is not None else None,
+            "last_sync": self.last_sync
+        }
+
+
+soil_aggregates = RunningAggregates(
+    'soil_analysis', 'analysis_id', 'land_id', ('nitrogen', 'phosphorus', 'potassium', 'ph_level'),
+    seed_function='soil_analysis_running_aggregates'
+)
+# Auto-analyze averages the newest RUNNING_AGGREGATES_RECENT_READINGS readings across all sensors
+sensor_aggregates = RunningAggregates(
+    'sensor_readings', 'reading_id', 'sensor_id', ('temperature', 'moisture'), extra_columns=('recorded_at',),
+    seed_function='sensor_readings_running_aggregates',
+    recent_rows=RUNNING_AGGREGATES_RECENT_READINGS, recent_column='recorded_at'
+)
@@ -0,0 +1,322 @@
+"""
+Process-local ring buffers of the most recent sensor readings, grouped by land
+
+Sensor analysis and predict-from-soil each used to
+query `sensor_readings` filtered by the land's sensors and ordered by
+`recorded_at`. This buffer keeps the newest `capacity` readings of every
+sensor in fixed-size rings of compact arrays (int64 reading id and timestamp
+in microseconds, float64 temperature and moisture, so values come back exactly
+as the database returned them) and answers those reads from memory. Each ring
+holds its sensor's newest readings by (recorded_at, reading_id): readings that
+arrive late are merged in order, and dropped if they are older than everything
+a full ring holds.
+
+It is fed by the sensor running aggregates' sync, so it is filled by the first
+full pass at startup (unless that pass was seeded from the aggregate function,
+in which case every land is loaded on its first read) and topped up with every
+incremental page after that.
+Rings are grouped per land; when the buffer grows past its memory budget the
+least recently read lands are evicted, and a land that is not resident
+(evicted, or holding readings from sensors that were not in the topology when
+they arrived) is loaded with one `recent_sensor_readings` function call on its
+next read. Callers get None whenever the buffer cannot answer exactly and fall
+back to the database.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+import database as db
+from columnar_stats import parse_timestamp
+from farmer_profiles import farmer_profiles
+from running_aggregates import RunningAggregates, sensor_aggregates
+
+SENSOR_BUFFER_READINGS_PER_SENSOR = int(os.getenv("SENSOR_BUFFER_READINGS_PER_SENSOR", "200"))
+SENSOR_BUFFER_MAX_MB = float(os.getenv("SENSOR_BUFFER_MAX_MB", "64"))
+
+# Evicted land ids remembered; past this the set is dropped and every land not resident loads on its next read
+SENSOR_BUFFER_MAX_EVICTED_LANDS = 10000
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# reading_id + recorded_at (int64) + temperature + moisture (float64)
+BYTES_PER_READING = 8 + 8 + 8 + 8
+
+
+def _to_micros(value) -> int:
+    parsed = parse_timestamp(value)
+    return -1 if parsed is None else (parsed - _EPOCH) // timedelta(microseconds=1)
+
+
+def _format_micros(micros: int) -> Optional[str]:
+    """ISO timestamp the way PostgREST renders timestamptz (no trailing fractional zeros)"""
+    if micros < 0:
+        return None
+    text = (_EPOCH + timedelta(microseconds=int(micros))).isoformat()
+    if "." in text:
+        seconds, _, rest = text.partition(".")
+        fraction, offset = rest[:6].rstrip("0"), rest[6:]
+        text = f"{seconds}.{fraction}{offset}" if fraction else f"{seconds}{offset}"
+    return text
+
+
+def _from_float(value: np.float64) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def _in_order(recorded_at: np.ndarray, reading_ids: np.ndarray) -> np.ndarray:
+    """Whether each (recorded_at, reading_id) key is above the one before it"""
+    return (recorded_at[1:] > recorded_at[:-1]) | ((recorded_at[1:] == recorded_at[:-1]) & (reading_ids[1:] > reading_ids[:-1]))
+
+
+class SensorRing:
+    """Newest `capacity` readings of one sensor by (recorded_at, reading_id), stored oldest first"""
+    __slots__ = ("reading_ids", "recorded_at", "temperature", "moisture", "head", "size")
+
+    def __init__(self, capacity: int):
+        self.reading_ids = np.zeros(capacity, dtype=np.int64)
+        self.recorded_at = np.zeros(capacity, dtype=np.int64)
+        self.temperature = np.zeros(capacity, dtype=np.float64)
+        self.moisture = np.zeros(capacity, dtype=np.float64)
+        self.head = 0
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.reading_ids)
+
+    @property
+    def full(self) -> bool:
+        return self.size == self.capacity
+
+    def append(self, reading_ids, recorded_at, temperature, moisture):
+        """Add readings; ones newer than everything stored are written in place, others are merged in order"""
+        if not len(reading_ids):
+            return
+        newest = (self.head - 1) % self.capacity
+        after_newest = self.size == 0 or (recorded_at[0], reading_ids[0]) > (self.recorded_at[newest], self.reading_ids[newest])
+        if not after_newest or not _in_order(recorded_at, reading_ids).all():
+            self.merge(reading_ids, recorded_at, temperature, moisture)
+            return
+        count = min(len(reading_ids), self.capacity)
+        slots = (self.head + np.arange(count)) % self.capacity
+        self.reading_ids[slots] = reading_ids[-count:]
+        self.recorded_at[slots] = recorded_at[-count:]
+        self.temperature[slots] = temperature[-count:]
+        self.moisture[slots] = moisture[-count:]
+        self.head = int((self.head + count) % self.capacity)
+        self.size = min(self.size + count, self.capacity)
+
+    def merge(self, reading_ids, recorded_at, temperature, moisture):
+        """Fold in readings in any order (late arrivals, database loads), keeping the newest by (recorded_at, reading_id)"""
+        ids, times, temps, moists = self.arrays()
+        ids = np.concatenate([ids, reading_ids])
+        times = np.concatenate([times, recorded_at])
+        temps = np.concatenate([temps, temperature])
+        moists = np.concatenate([moists, moisture])
+        _, unique = np.unique(ids, return_index=True)
+        order = unique[np.lexsort((ids[unique], times[unique]))][-self.capacity:]
+        self.head, self.size = 0, 0
+        self.append(ids[order], times[order], temps[order], moists[order])
+
+    def arrays(self) -> tuple:
+        """(reading_ids, recorded_at, temperature, moisture) of the stored readings"""
+        if self.full:
+            order = (self.head + np.arange(self.size)) % self.capacity
+        else:
+            order = np.arange(self.size)
+        return self.reading_ids[order], self.recorded_at[order], self.temperature[order], self.moisture[order]
+
+
+class SensorReadingBuffer:
+    def __init__(self, sensors: RunningAggregates, land_of: Callable,
+                 capacity: int = SENSOR_BUFFER_READINGS_PER_SENSOR,
+                 max_bytes: int = int(SENSOR_BUFFER_MAX_MB * 1024 * 1024)):
+        self.sensors = sensors
+        self.land_of = land_of
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        # land_id -> {sensor_id: SensorRing}, least recently read first
+        self._lands = OrderedDict()
+        self._evicted = set()
+        # Sensors whose readings arrived before they were in the topology
+        self._dropped_sensors = set()
+        # Lands are only created from the stream if it has carried every row since the table began
+        self._complete_stream = sensors.watermark == 0
+        self._load_lock = asyncio.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.evictions = 0
+        sensors.subscribe(self._on_rows, on_seed=self._on_seed)
+
+    # ---------- filling ----------
+
+    def _on_rows(self, rows: list):
+        by_sensor = {}
+        for row in rows:
+            by_sensor.setdefault(row.get('sensor_id'), []).append(row)
+        for sensor_id, sensor_rows in by_sensor.items():
+            land_id = self.land_of(sensor_id)
+            if land_id is None:
+                self._dropped_sensors.add(sensor_id)
+                continue
+            rings = self._lands.get(land_id)
+            if rings is None:
+                if not self._complete_stream or land_id in self._evicted:
+                    continue  # loaded from the database on its next read
+                rings = self._lands[land_id] = {}
+            self._ring(rings, sensor_id).append(*self._columns(sensor_rows))
+        self._enforce_budget()
+
+    def _on_seed(self):
+        # Rows below the seeded watermark never pass through _on_rows
+        self._complete_stream = False
+
+    def _ring(self, rings: dict, sensor_id: int) -> SensorRing:
+        ring = rings.get(sensor_id)
+        if ring is None:
+            ring = rings[sensor_id] = SensorRing(self.capacity)
+            self.bytes += self.capacity * BYTES_PER_READING
+        return ring
+
+    @staticmethod
+    def _columns(rows: list) -> tuple:
+        return (
+            np.array([row['reading_id'] for row in rows], dtype=np.int64),
+            np.array([_to_micros(row.get('recorded_at')) for row in rows], dtype=np.int64),
+            np.array([row.get('temperature') for row in rows], dtype=np.float64),
+            np.array([row.get('moisture') for row in rows], dtype=np.float64)
+        )
+
+    def _enforce_budget(self):
+        while self.bytes > self.max_bytes and self._lands:
+            land_id, rings = self._lands.popitem(last=False)
+            self.bytes -= len(rings) * self.capacity * BYTES_PER_READING
+            self._evicted.add(land_id)
+            self.evictions += 1
+        if len(self._evicted) > SENSOR_BUFFER_MAX_EVICTED_LANDS:
+            self._evicted.clear()
+            self._complete_stream = False
+
+    async def _load_land(self, land_id: int, sensor_ids: Sequence[int]) -> dict:
+        """Make a land resident with the newest `capacity` readings of each of its sensors"""
+        async with self._load_lock:
+            stale = self._dropped_sensors.intersection(sensor_ids)
+            if land_id in self._lands and not stale:
+                return self._lands[land_id]
+            # Resident before the query runs, so rows synced meanwhile are kept and merged
+            resident = land_id in self._lands
+            rings = self._lands.setdefault(land_id, {})
+            self._evicted.discard(land_id)
+            try:
+                # Newest `capacity` readings of each sensor, in one call for the whole land
+                response = await db.execute(db.rpc('recent_sensor_readings', {
+                    "sensor_ids": list(sensor_ids), "per_sensor": self.capacity
+                }))
+            except Exception:
+                if not resident:
+                    self._lands.pop(land_id, None)
+                    self._evicted.add(land_id)
+                raise
+            by_sensor = {}
+            for row in response.data or []:
+                by_sensor.setdefault(row['sensor_id'], []).append(row)
+            for sensor_id, rows in by_sensor.items():
+                self._ring(rings, sensor_id).merge(*self._columns(rows))
+            self._dropped_sensors.difference_update(sensor_ids)
+            self.loads += 1
+            self._enforce_budget()
+            return rings
+
+    # ---------- reading ----------
+
+    @property
+    def ready(self) -> bool:
+        """The first full pass of the sensor readings has been folded in"""
+        return self.sensors.synced_at is not None
+
+    async def recent(self, land_id: int, sensor_ids: Sequence[int], limit: int) -> Optional[list]:
+        """
+        The land's newest `limit` readings as rows, newest first (ties by reading_id),
+        or None if the buffer cannot answer exactly and the database has to
+        """
+        if limit <= 0:
+            return []
+        if not self.ready:
+            self.fallbacks += 1
+            return None
+        rings = self._lands.get(land_id)
+        missing = rings is None and (land_id in self._evicted or not self._complete_stream)
+        if missing or self._dropped_sensors.intersection(sensor_ids):
+            try:
+                rings = await self._load_land(land_id, sensor_ids)
+            except Exception as e:
+                print(f"⚠️ Sensor buffer could not load land {land_id}: {str(e)}")
+                self.fallbacks += 1
+                return None
+        if rings is None:
+            self.hits += 1
+            return []  # every reading has been seen and none belongs to this land
+        self._lands.move_to_end(land_id)
+
+        selected = [(sensor_id, rings[sensor_id]) for sensor_id in sensor_ids if sensor_id in rings]
+        # A full ring may have dropped readings that belong in a larger answer
+        if limit > self.capacity and any(ring.full for _, ring in selected):
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return self._rows(selected, limit)
+
+    def newest(self, limit: int) -> Optional[list]:
+        """
+        The newest `limit` readings of all sensors, newest first, or None before the first sync
+        Rings only exist for resident lands, so these come from the tail of the stream that fills them
+        """
+        if not self.ready:
+            return None
+        return self.sensors.recent()[:limit]
+
+    @staticmethod
+    def _rows(rings: list, limit: int) -> list:
+        """Newest `limit` readings of (sensor_id, ring) pairs as rows; equal timestamps in reading_id order"""
+        if not rings:
+            return []
+        reading_ids, recorded_at, temperature, moisture = (
+            np.concatenate(column) for column in zip(*(ring.arrays() for _, ring in rings))
+        )
+        sensor_ids = np.concatenate([np.full(ring.size, sensor_id, dtype=np.int64) for sensor_id, ring in rings])
+        order = np.lexsort((reading_ids, -recorded_at))[:limit]
+        return [
+            {
+                "reading_id": int(reading_ids[i]),
+                "sensor_id": int(sensor_ids[i]),
+                "temperature": _from_float(temperature[i]),
+                "moisture": _from_float(moisture[i]),
+                "recorded_at": _format_micros(recorded_at[i])
+            }
+            for i in order.tolist()
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "lands": len(self._lands),
+            "sensors": sum(len(rings) for rings in self._lands.values()),
+            "readings": sum(ring.size for rings in self._lands.values() for ring in rings.values()),
+            "readings_per_sensor": self.capacity,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_lands": len(self._evicted),
+            "dropped_sensors": len(self._dropped_sensors),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+
+sensor_buffer = SensorReadingBuffer(sensor_aggregates, farmer_profiles.land_of_sensor)
@@ -0,0 +1,430 @@
+"""
+Batched sensor reading ingestion with a bounded write-behind queue
+
+Field gateways post batches of readings from many sensors to
+`/api/sensor-readings/ingest`. A batch is validated column by column with NumPy
+(sensor ids known, values finite and in range, timestamps parseable and not in
+the future), the valid rows go on an in-process queue bounded by row count,
+and one writer task flushes the queue to `sensor_readings` with bulk inserts of
+up to `flush_rows` rows, as soon as that many are waiting or the oldest row has
+waited `flush_ms`. A batch that does not fit in the queue is refused whole
+(HTTP 429), so the gateway can retry it later.
+
+A chunk the database rejects for its data (a bad value, a constraint violation)
+is split in halves until the bad row is dropped alone, so it cannot take the rest
+of the chunk down with it. Any other failure (network, timeout, 5xx) keeps the
+chunk whole and retries it with capped exponential backoff until the database
+recovers; meanwhile the queue fills and its bound turns new batches away with 429.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import numpy as np
+from postgrest.exceptions import APIError
+
+import database as db
+from columnar_stats import parse_timestamp
+
+SENSOR_INGEST_MAX_BATCH_ROWS = int(os.getenv("SENSOR_INGEST_MAX_BATCH_ROWS", "10000"))
+SENSOR_INGEST_QUEUE_MAX_ROWS = int(os.getenv("SENSOR_INGEST_QUEUE_MAX_ROWS", "100000"))
+SENSOR_INGEST_FLUSH_ROWS = int(os.getenv("SENSOR_INGEST_FLUSH_ROWS", "1000"))
+SENSOR_INGEST_FLUSH_MS = float(os.getenv("SENSOR_INGEST_FLUSH_MS", "500"))
+SENSOR_INGEST_MAX_BACKOFF_SECONDS = float(os.getenv("SENSOR_INGEST_MAX_BACKOFF_SECONDS", "30"))
+SENSOR_INGEST_MAX_CLOCK_SKEW_SECONDS = int(os.getenv("SENSOR_INGEST_MAX_CLOCK_SKEW_SECONDS", "300"))
+
+# Accepted value ranges (inclusive)
+TEMPERATURE_RANGE = (-50.0, 80.0)
+MOISTURE_RANGE = (0.0, 100.0)
+
+# Window of the ingest and flush rate
+RATE_WINDOW_SECONDS = 60
+
+# HTTP statuses and SQLSTATE classes (22 data exception, 23 integrity constraint) that blame the rows
+REJECTED_ROW_STATUSES = {400, 409, 413, 422}
+REJECTED_ROW_SQLSTATE_CLASSES = ("22", "23")
+
+
+class IngestRejected(Exception):
+    """The whole batch was refused; status_code says why (413 too large, 429 queue full)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def is_rejected_rows(error: Exception) -> bool:
+    """True when the database refused the rows themselves, so retrying them unchanged cannot succeed"""
+    if not isinstance(error, APIError):
+        return False
+    code = str(error.code or "")
+    if code.isdigit() and len(code) == 3:
+        # A bare HTTP status, from a response without a PostgREST error body
+        return int(code) in REJECTED_ROW_STATUSES
+    return code[:2] in REJECTED_ROW_SQLSTATE_CLASSES
+
+
+class QueuedChunk:
+    __slots__ = ("rows", "enqueued_at", "attempts")
+
+    def __init__(self, rows: list, enqueued_at: float, attempts: int = 0):
+        self.rows = rows
+        self.enqueued_at = enqueued_at
+        self.attempts = attempts
+
+
+def _numeric_column(values: list) -> np.ndarray:
+    """float64 column; null, missing and non-numeric values become NaN"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return column
+
+
+def _timestamp_column(values: list, now: datetime) -> tuple:
+    """ISO strings (receive time where missing) plus a mask of unparseable values"""
+    stamps, bad = [], np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed = parse_timestamp(value)
+        except (TypeError, ValueError):
+            parsed = None
+            bad[i] = True
+        stamps.append((parsed or now).isoformat())
+        if parsed is not None and parsed - now > timedelta(seconds=SENSOR_INGEST_MAX_CLOCK_SKEW_SECONDS):
+            bad[i] = True
+    return stamps, bad
+
+
+class SensorIngestQueue:
+    def __init__(self, sensor_exists: Callable, refresh_sensors: Optional[Callable] = None, max_rows: int = SENSOR_INGEST_QUEUE_MAX_ROWS,
+                 flush_rows: int = SENSOR_INGEST_FLUSH_ROWS, flush_ms: float = SENSOR_INGEST_FLUSH_MS,
+                 max_backoff: float = SENSOR_INGEST_MAX_BACKOFF_SECONDS):
+        # Vectorized check: int64 sensor ids -> boolean mask of ids that exist
+        self.sensor_exists = sensor_exists
+        # Awaited when a batch names unknown sensors; returns True if the known sensors changed
+        self.refresh_sensors = refresh_sensors
+        self.max_rows = max_rows
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_ms / 1000
+        self.max_backoff = max_backoff
+        self._chunks = deque()
+        self._queued_rows = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._worker = None
+        # [second, rows] buckets over the last RATE_WINDOW_SECONDS, pruned as they are added to
+        self._accepted_log = deque()
+        self._flushed_log = deque()
+        self._recent_flush_ms = deque(maxlen=1024)
+        self.requests = 0
+        self.accepted_rows = 0
+        self.rejected_rows = 0
+        self.throttled_requests = 0
+        self.throttled_rows = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+        self.dropped_rows = 0
+        self.max_flush_ms = 0.0
+        self.last_flush_at = None
+
+    def start(self):
+        if self._worker is None:
+            self._stopping.clear()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, drain_seconds: float = 10.0):
+        """
+        Stop the writer once its flush in progress is done, then flush what is still queued
+        Both are bounded by drain_seconds; a writer cancelled mid-flush puts its chunk back first
+        """
+        deadline = time.monotonic() + drain_seconds
+        if self._worker is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._worker, drain_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._worker = None
+        while self._chunks and time.monotonic() < deadline:
+            backoff = await self._flush(self._take(self.flush_rows))
+            if backoff:
+                await asyncio.sleep(min(backoff, max(0.0, deadline - time.monotonic())))
+        if self._chunks:
+            print(f"⚠️ Sensor ingest stopped with {self._queued_rows} readings still queued")
+
+    @property
+    def queued_rows(self) -> int:
+        return self._queued_rows
+
+    # ---------- accepting ----------
+
+    def validate(self, payload) -> tuple:
+        """
+        Split a batch into insertable rows and per-row rejections
+        `payload` is a list of reading objects, or one object of equal-length columns
+        """
+        if isinstance(payload, dict):
+            columns = {name: payload.get(name) for name in ('sensor_id', 'temperature', 'moisture', 'recorded_at')}
+            # A column may be left out (all null), but one that is given must be a list
+            misshapen = [name for name, values in columns.items() if values is not None and not isinstance(values, list)]
+            if misshapen:
+                raise IngestRejected(422, f"Columnar payload columns must be lists: {', '.join(misshapen)}")
+            lengths = {len(values) for values in columns.values() if isinstance(values, list)}
+            if len(lengths) != 1 or not isinstance(columns['sensor_id'], list):
+                raise IngestRejected(422, "Columnar payload needs equal-length lists, including sensor_id")
+            size = lengths.pop()
+            columns = {name: values if isinstance(values, list) else [None] * size for name, values in columns.items()}
+        elif isinstance(payload, list):
+            size = len(payload)
+            rows = [row if isinstance(row, dict) else {} for row in payload]
+            columns = {name: [row.get(name) for row in rows] for name in ('sensor_id', 'temperature', 'moisture', 'recorded_at')}
+        else:
+            raise IngestRejected(422, "Body must be a list of readings or an object of columns")
+        if size > SENSOR_INGEST_MAX_BATCH_ROWS:
+            raise IngestRejected(413, f"Batch of {size} readings exceeds the limit of {SENSOR_INGEST_MAX_BATCH_ROWS}")
+
+        sensor_ids = _numeric_column(columns['sensor_id'])
+        temperature = _numeric_column(columns['temperature'])
+        moisture = _numeric_column(columns['moisture'])
+        # One measurement may be null, but not both; a value that is given must be a number in range
+        given_temperature = np.array([value is not None for value in columns['temperature']], dtype=bool)
+        given_moisture = np.array([value is not None for value in columns['moisture']], dtype=bool)
+        bad_temperature = given_temperature & ~((temperature >= TEMPERATURE_RANGE[0]) & (temperature <= TEMPERATURE_RANGE[1]))
+        bad_moisture = given_moisture & ~((moisture >= MOISTURE_RANGE[0]) & (moisture <= MOISTURE_RANGE[1]))
+        no_values = ~given_temperature & ~given_moisture
+        bad_id = ~np.isfinite(sensor_ids) | (sensor_ids != np.floor(sensor_ids)) | (sensor_ids <= 0)
+        ids = np.where(bad_id, 0, sensor_ids).astype(np.int64)
+        unknown = ~bad_id & ~self.sensor_exists(ids)
+        stamps, bad_time = _timestamp_column(columns['recorded_at'], datetime.now(timezone.utc))
+
+        reasons = (
+            (bad_id, "sensor_id must be a positive integer"),
+            (unknown, "unknown sensor_id"),
+            (no_values, "temperature or moisture is required"),
+            (bad_temperature, f"temperature must be a number in {TEMPERATURE_RANGE[0]:g}..{TEMPERATURE_RANGE[1]:g}"),
+            (bad_moisture, f"moisture must be a number in {MOISTURE_RANGE[0]:g}..{MOISTURE_RANGE[1]:g}"),
+            (bad_time, "recorded_at is not an ISO 8601 timestamp or is in the future")
+        )
+        invalid = np.zeros(size, dtype=bool)
+        rejected = []
+        for mask, reason in reasons:
+            fresh = mask & ~invalid
+            rejected.extend({"index": int(i), "reason": reason} for i in np.flatnonzero(fresh))
+            invalid |= mask
+        rejected.sort(key=lambda item: item["index"])
+
+        temperature_values = np.where(np.isnan(temperature), None, temperature).tolist()
+        moisture_values = np.where(np.isnan(moisture), None, moisture).tolist()
+        ids_values = ids.tolist()
+        valid_rows = [
+            {
+                "sensor_id": ids_values[i],
+                "temperature": temperature_values[i],
+                "moisture": moisture_values[i],
+                "recorded_at": stamps[i]
+            }
+            for i in np.flatnonzero(~invalid).tolist()
+        ]
+        return valid_rows, rejected
+
+    def put(self, rows: list):
+        """Queue validated rows, or refuse them all with 429 when the queue cannot hold them"""
+        if not rows:
+            return
+        if self._queued_rows + len(rows) > self.max_rows:
+            self.throttled_requests += 1
+            self.throttled_rows += len(rows)
+            raise IngestRejected(
+                429, f"Ingest queue is full ({self._queued_rows} of {self.max_rows} readings queued)",
+                retry_after=max(1.0, self.flush_interval * 2)
+            )
+        now = time.monotonic()
+        self._chunks.append(QueuedChunk(rows, now))
+        self._queued_rows += len(rows)
+        self.accepted_rows += len(rows)
+        self._count(self._accepted_log, len(rows))
+        self._wakeup.set()
+
+    async def ingest(self, payload) -> dict:
+        """Validate a batch and queue its valid rows; raises IngestRejected to refuse it whole"""
+        self.requests += 1
+        rows, rejected = self.validate(payload)
+        if self.refresh_sensors is not None and any(item["reason"] == "unknown sensor_id" for item in rejected):
+            # Sensors added since the topology was loaded: check again against a fresh copy
+            if await self.refresh_sensors():
+                rows, rejected = self.validate(payload)
+        self.put(rows)
+        self.rejected_rows += len(rejected)
+        return {
+            "accepted": len(rows),
+            "rejected": len(rejected),
+            "errors": rejected[:100],
+            "queue_depth": self._queued_rows
+        }
+
+    # ---------- flushing ----------
+
+    def _take(self, limit: int) -> QueuedChunk:
+        """Up to `limit` rows from the head of the queue as one chunk; a retried chunk goes alone"""
+        head = self._chunks[0]
+        if head.attempts:
+            self._chunks.popleft()
+            self._queued_rows -= len(head.rows)
+            return head
+        rows = []
+        while self._chunks and not self._chunks[0].attempts and len(rows) < limit:
+            chunk = self._chunks[0]
+            wanted = limit - len(rows)
+            if len(chunk.rows) <= wanted:
+                rows.extend(self._chunks.popleft().rows)
+            else:
+                rows.extend(chunk.rows[:wanted])
+                chunk.rows = chunk.rows[wanted:]
+        self._queued_rows -= len(rows)
+        return QueuedChunk(rows, head.enqueued_at)
+
+    async def _wait_for_flush(self):
+        while True:
+            if self._queued_rows >= self.flush_rows or self._stopping.is_set():
+                return
+            timeout = None
+            if self._chunks:
+                timeout = self._chunks[0].enqueued_at + self.flush_interval - time.monotonic()
+                if timeout <= 0:
+                    return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        while True:
+            await self._wait_for_flush()
+            if self._stopping.is_set():
+                return  # stop() drains the rest
+            chunk = self._take(self.flush_rows)
+            try:
+                backoff = await self._flush(chunk)
+            except asyncio.CancelledError:
+                # Accepted readings must survive shutdown; the insert may still land, so this can repeat rows
+                self._requeue([chunk])
+                print(f"⚠️ Sensor ingest flush of {len(chunk.rows)} readings interrupted, requeued")
+                raise
+            if backoff:
+                # Cut short by stop()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), backoff)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _flush(self, chunk: QueuedChunk) -> float:
+        """Insert one chunk; returns the seconds to back off before the next flush (0 unless it failed)"""
+        started = time.perf_counter()
+        try:
+            await db.execute(db.table('sensor_readings').insert(chunk.rows))
+        except Exception as e:
+            self.flush_errors += 1
+            return self._retry(chunk, e)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.flushed_rows += len(chunk.rows)
+        self._count(self._flushed_log, len(chunk.rows))
+        self._recent_flush_ms.append(elapsed_ms)
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.last_flush_at = datetime.now().isoformat()
+        return 0.0
+
+    def _retry(self, chunk: QueuedChunk, error: Exception) -> float:
+        """
+        Requeue a failed chunk at the head and return the backoff before the next flush
+        Rejected rows split the chunk in halves down to a single row, which is dropped;
+        any other failure keeps the chunk whole, so accepted readings outlive an outage
+        """
+        chunk.attempts += 1
+        if not is_rejected_rows(error):
+            self._requeue([chunk])
+            if chunk.attempts == 1 or chunk.attempts % 10 == 0:
+                print(f"⚠️ Sensor ingest flush of {len(chunk.rows)} readings failed {chunk.attempts}x, retrying: {str(error)}")
+            return min(0.5 * 2 ** (chunk.attempts - 1), self.max_backoff)
+        if len(chunk.rows) > 1:
+            middle = len(chunk.rows) // 2
+            # Each half goes alone, and splits again if the database rejects it too
+            self._requeue([QueuedChunk(chunk.rows[:middle], chunk.enqueued_at, 1),
+                           QueuedChunk(chunk.rows[middle:], chunk.enqueued_at, 1)])
+            return 0.0
+        self.dropped_rows += 1
+        print(f"❌ Dropped sensor reading rejected by the database: {chunk.rows[0]} ({str(error)})")
+        return 0.0
+
+    def _requeue(self, chunks: list):
+        """Put chunks back at the head of the queue, in order"""
+        for item in reversed(chunks):
+            self._chunks.appendleft(item)
+            self._queued_rows += len(item.rows)
+
+    # ---------- stats ----------
+
+    @staticmethod
+    def _prune(log: deque, second: int):
+        while log and log[0][0] <= second - RATE_WINDOW_SECONDS:
+            log.popleft()
+
+    @classmethod
+    def _count(cls, log: deque, rows: int):
+        """Add rows to the current one-second bucket, so a log never holds more than the window"""
+        second = int(time.monotonic())
+        if log and log[-1][0] == second:
+            log[-1][1] += rows
+        else:
+            log.append([second, rows])
+        cls._prune(log, second)
+
+    @classmethod
+    def _rate(cls, log: deque) -> float:
+        cls._prune(log, int(time.monotonic()))
+        return round(sum(rows for _, rows in log) / RATE_WINDOW_SECONDS, 2)
+
+    def stats(self) -> dict:
+        recent = np.array(self._recent_flush_ms) if self._recent_flush_ms else np.zeros(1)
+        return {
+            "running": self._worker is not None,
+            "queue_depth": self._queued_rows,
+            "queue_chunks": len(self._chunks),
+            "queue_max_rows": self.max_rows,
+            "oldest_queued_ms": round((time.monotonic() - self._chunks[0].enqueued_at) * 1000, 1) if self._chunks else 0,
+            "requests": self.requests,
+            "accepted_rows": self.accepted_rows,
+            "rejected_rows": self.rejected_rows,
+            "throttled_requests": self.throttled_requests,
+            "throttled_rows": self.throttled_rows,
+            "ingest_rows_per_second": self._rate(self._accepted_log),
+            "flush_rows_per_second": self._rate(self._flushed_log),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+            "dropped_rows": self.dropped_rows,
+            "flush_rows": self.flush_rows,
+            "flush_ms": self.flush_interval * 1000,
+            "flush_latency_ms": {
+                "average": round(float(np.mean(self._recent_flush_ms)), 3) if self._recent_flush_ms else 0,
+                "p50": round(float(np.percentile(recent, 50)), 3),
+                "p95": round(float(np.percentile(recent, 95)), 3),
+                "max": round(self.max_flush_ms, 3)
+            },
+            "last_flush_at": self.last_flush_at
+        }
@@ -0,0 +1,299 @@
+"""
+Leader election and a shared snapshot store for running several uvicorn workers
+
+With `uvicorn main:app --workers N` every process used to run its own
+scheduler, refresh job and fleet job, and serve its own copy of the cached
+dashboard data. `SharedState` elects one leader among the workers; scheduled
+jobs that read the database to publish shared data run only there, and every
+worker (the leader included) pulls the published snapshots into its local
+cache, so all workers serve the same data for the price of one refresh.
+
+Backends (`SHARED_STATE_BACKEND`):
+
+- `memory` (default): one process, always leader, nothing shared.
+- `file`: leadership is an exclusive lock on a file in `SHARED_STATE_DIR`,
+  held for the life of the process, so it passes to another worker as soon as
+  the leader exits. Snapshots are JSON files replaced atomically; pulling is
+  one `stat` per key.
+- `redis`: leadership is a `SET NX` lease renewed by the leader, snapshots live
+  in a hash with a version counter per key. Needs `pip install redis` and
+  works across hosts.
+
+Sharing is opt-in, and the default directory and Redis keys are namespaced by
+`SUPABASE_URL` and `SHARED_STATE_NAMESPACE`, so unrelated instances on one
+host (another environment, a dev server next to a load test) never share a
+leader or serve each other's data.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import time
+from typing import Callable, Dict
+
+from database import SUPABASE_URL
+from fast_json import dumps
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+# Deployment id; workers share state only with the same namespace and SUPABASE_URL
+SHARED_STATE_NAMESPACE = os.getenv("SHARED_STATE_NAMESPACE", "default")
+DEPLOYMENT_KEY = hashlib.sha256(f"{SUPABASE_URL}|{SHARED_STATE_NAMESPACE}".encode("utf-8")).hexdigest()[:16]
+SHARED_STATE_DIR = os.getenv(
+    "SHARED_STATE_DIR", os.path.join(tempfile.gettempdir(), f"smart-irrigation-shared-{DEPLOYMENT_KEY}")
+)
+SHARED_STATE_REDIS_URL = os.getenv("SHARED_STATE_REDIS_URL", "redis://localhost:6379/0")
+SHARED_STATE_PULL_SECONDS = float(os.getenv("SHARED_STATE_PULL_SECONDS", "2"))
+# Redis leadership lease; the leader renews it on every pull
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "15"))
+
+REDIS_PREFIX = f"smart-irrigation:{DEPLOYMENT_KEY}"
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def try_lead(self, worker_id: str) -> bool:
+        return True
+
+    def release(self, worker_id: str):
+        pass
+
+    def write(self, key: str, body: bytes):
+        pass
+
+    def read_changed(self) -> Dict[str, bytes]:
+        return {}
+
+
+class FileBackend:
+    name = "file"
+
+    def __init__(self, directory: str = SHARED_STATE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = None
+        # key -> (mtime_ns, size) of the snapshot file last read or written by this process
+        self._seen = {}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def try_lead(self, worker_id: str) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(os.path.join(self.directory, "leader.lock"), "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(worker_id)
+        lock_file.flush()
+        self._lock_file = lock_file
+        return True
+
+    def release(self, worker_id: str):
+        if self._lock_file is not None:
+            # Closing the file drops the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def write(self, key: str, body: bytes):
+        path = self._path(key)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix=f".{key}.")
+        with os.fdopen(handle, "wb") as temp_file:
+            temp_file.write(body)
+        os.replace(temporary, path)
+        stat = os.stat(path)
+        self._seen[key] = (stat.st_mtime_ns, stat.st_size)
+
+    def read_changed(self) -> Dict[str, bytes]:
+        changed = {}
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json") or entry.name.startswith("."):
+                continue
+            key = entry.name[:-5]
+            stat = entry.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._seen.get(key) == signature:
+                continue
+            try:
+                with open(entry.path, "rb") as snapshot:
+                    changed[key] = snapshot.read()
+            except FileNotFoundError:
+                continue
+            self._seen[key] = signature
+        return changed
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str = SHARED_STATE_REDIS_URL, lease_seconds: float = LEADER_LEASE_SECONDS):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.lease_ms = int(lease_seconds * 1000)
+        self._versions = {}
+
+    def try_lead(self, worker_id: str) -> bool:
+        key = f"{REDIS_PREFIX}:leader"
+        if self.client.set(key, worker_id, nx=True, px=self.lease_ms):
+            return True
+        holder = self.client.get(key)
+        if holder is not None and holder.decode() == worker_id:
+            self.client.pexpire(key, self.lease_ms)
+            return True
+        return False
+
+    def release(self, worker_id: str):
+        key = f"{REDIS_PREFIX}:leader"
+        holder = self.client.get(key)
+        if holder is not None and holder.decode() == worker_id:
+            self.client.delete(key)
+
+    def write(self, key: str, body: bytes):
+        pipeline = self.client.pipeline()
+        pipeline.hset(f"{REDIS_PREFIX}:state", key, body)
+        pipeline.hincrby(f"{REDIS_PREFIX}:versions", key, 1)
+        _, version = pipeline.execute()
+        self._versions[key] = version
+
+    def read_changed(self) -> Dict[str, bytes]:
+        versions = {key.decode(): int(version) for key, version in self.client.hgetall(f"{REDIS_PREFIX}:versions").items()}
+        keys = [key for key, version in versions.items() if self._versions.get(key) != version]
+        if not keys:
+            return {}
+        bodies = self.client.hmget(f"{REDIS_PREFIX}:state", keys)
+        changed = {}
+        for key, body in zip(keys, bodies):
+            if body is not None:
+                changed[key] = body
+                self._versions[key] = versions[key]
+        return changed
+
+
+def create_backend(name: str = SHARED_STATE_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "redis":
+        return RedisBackend()
+    if name == "file":
+        return FileBackend()
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND '{name}', expected file, redis or memory")
+
+
+class SharedState:
+    def __init__(self, backend, pull_seconds: float = SHARED_STATE_PULL_SECONDS):
+        self.backend = backend
+        self.pull_seconds = pull_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.is_leader = False
+        self.leader_since = None
+        self._listeners = []
+        self._worker = None
+        self.publishes = 0
+        self.pulls = 0
+        self.applied = 0
+        self.errors = 0
+
+    def subscribe(self, on_value: Callable[[str, object], None]):
+        """Call on_value(key, value) for every snapshot published by any worker"""
+        self._listeners.append(on_value)
+
+    def elect(self) -> bool:
+        """Try to become (or stay) leader; True while this worker leads"""
+        try:
+            leading = self.backend.try_lead(self.worker_id)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Leader election failed: {str(e)}")
+            leading = False
+        if leading and not self.is_leader:
+            self.leader_since = time.time()
+            print(f"👑 Worker {self.worker_id} is the scheduler leader ({self.backend.name} backend)")
+        elif self.is_leader and not leading:
+            self.leader_since = None
+            print(f"⚠️ Worker {self.worker_id} lost scheduler leadership")
+        self.is_leader = leading
+        return leading
+
+    def start(self):
+        # Snapshots already stored stay: other workers may still be serving them, and the
+        # leader's first refresh replaces each key it publishes
+        self.elect()
+        if self._worker is None and not isinstance(self.backend, MemoryBackend):
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self.is_leader:
+            await asyncio.to_thread(self.backend.release, self.worker_id)
+            self.is_leader = False
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.pull_seconds)
+            await asyncio.to_thread(self.elect)
+            await self.pull()
+
+    async def publish(self, values: dict):
+        """Share snapshots with every worker"""
+        try:
+            for key, value in values.items():
+                await asyncio.to_thread(self.backend.write, key, dumps(value))
+                self.publishes += 1
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Publishing shared state failed: {str(e)}")
+
+    async def pull(self) -> int:
+        """Apply snapshots other workers published since the last pull; returns how many"""
+        try:
+            changed = await asyncio.to_thread(self.backend.read_changed)
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Reading shared state failed: {str(e)}")
+            return 0
+        self.pulls += 1
+        for key, body in changed.items():
+            value = json.loads(body)
+            for listener in self._listeners:
+                listener(key, value)
+            self.applied += 1
+        return len(changed)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "worker": self.worker_id,
+            "leader": self.is_leader,
+            "leader_since": self.leader_since,
+            "pull_seconds": self.pull_seconds,
+            "publishes": self.publishes,
+            "pulls": self.pulls,
+            "applied": self.applied,
+            "errors": self.errors
+        }
+
+
+shared_state = SharedState(create_backend())
@@ -0,0 +1,80 @@
+"""CompiledForest must score exactly like the sklearn forest it was compiled from"""
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest_compiler import CompiledForest, compile_forest
+
+N_FEATURES = 7
+
+
+def fit_forest(with_missing: bool) -> RandomForestClassifier:
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 100, size=(400, N_FEATURES))
+    y = (X[:, 0] + X[:, 3] > 100).astype(int) + (X[:, 5] > 70).astype(int)
+    if with_missing:
+        # NaN seen in training gives splits a learned missing-value side
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, y)
+
+
+def threshold_samples(model: RandomForestClassifier, rng: np.random.Generator) -> np.ndarray:
+    """One sample per split with that split's feature set exactly on its threshold"""
+    samples = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        # Splits that only separate NaN from values have an infinite threshold, which sklearn rejects as input
+        for node in np.flatnonzero((tree.children_left != -1) & np.isfinite(tree.threshold)):
+            sample = rng.uniform(0, 100, size=N_FEATURES)
+            sample[tree.feature[node]] = tree.threshold[node]
+            samples.append(sample)
+    return np.array(samples)
+
+
+def assert_same_scores(model, forest: CompiledForest, X: np.ndarray):
+    expected = model.predict_proba(X)
+    actual = forest.predict_proba(X)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["dense-fit", "missing-fit"])
+def compiled(request):
+    model = fit_forest(request.param)
+    return model, compile_forest(model)
+
+
+def test_random_inputs(compiled):
+    model, forest = compiled
+    X = np.random.default_rng(1).uniform(-10, 110, size=(1000, N_FEATURES))
+    assert_same_scores(model, forest, X)
+
+
+def test_inputs_on_thresholds(compiled):
+    model, forest = compiled
+    assert_same_scores(model, forest, threshold_samples(model, np.random.default_rng(2)))
+
+
+def test_nan_inputs(compiled):
+    model, forest = compiled
+    rng = np.random.default_rng(3)
+    X = rng.uniform(0, 100, size=(500, N_FEATURES))
+    X[rng.random(X.shape) < 0.3] = np.nan
+    X[0] = np.nan
+    assert_same_scores(model, forest, X)
+
+
+def test_chunked_batches_and_round_trip(compiled, tmp_path, monkeypatch):
+    model, forest = compiled
+    monkeypatch.setattr("forest_compiler.COMPILED_FOREST_CHUNK_ROWS", 7)
+    X = np.random.default_rng(4).uniform(0, 100, size=(50, N_FEATURES))
+    X[::5, 2] = np.nan
+    path = str(tmp_path / "forest.npz")
+    forest.save(path)
+    assert_same_scores(model, CompiledForest.load(path), X)
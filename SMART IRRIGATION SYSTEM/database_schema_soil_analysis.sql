@@ -39,9 +39,25 @@ CREATE TABLE IF NOT EXISTS public.crop_recommendations (
     created_at timestamp with time zone DEFAULT now(),
     updated_at timestamp with time zone DEFAULT now(),
     CONSTRAINT crop_recommendations_pkey PRIMARY KEY (recommendation_id),
+    CONSTRAINT crop_recommendations_land_crop_key UNIQUE (land_id, crop_name),
     CONSTRAINT crop_recommendations_land_id_fkey FOREIGN KEY (land_id) REFERENCES public.land(land_id) ON DELETE CASCADE
 );
 
+-- Existing tables: one row per land and crop, so the API's upserts (on_conflict=land_id,crop_name)
+-- update a land's recommendations in place. Older duplicates are removed first, keeping the newest.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'crop_recommendations_land_crop_key') THEN
+        DELETE FROM public.crop_recommendations older
+        USING public.crop_recommendations newer
+        WHERE older.land_id = newer.land_id
+          AND older.crop_name = newer.crop_name
+          AND older.recommendation_id < newer.recommendation_id;
+        ALTER TABLE public.crop_recommendations
+            ADD CONSTRAINT crop_recommendations_land_crop_key UNIQUE (land_id, crop_name);
+    END IF;
+END $$;
+
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_soil_analysis_land_id ON public.soil_analysis(land_id);
 CREATE INDEX IF NOT EXISTS idx_soil_analysis_recorded_at ON public.soil_analysis(recorded_at DESC);
@@ -49,6 +65,95 @@ CREATE INDEX IF NOT EXISTS idx_crop_recommendations_land_id ON public.crop_recom
 CREATE INDEX IF NOT EXISTS idx_crop_recommendations_suitability ON public.crop_recommendations(suitability_score DESC);
 CREATE INDEX IF NOT EXISTS idx_crop_recommendations_optimal ON public.crop_recommendations(is_optimal);
 
+-- Keyset pagination: one index range scan per page of soil history / recommendations
+CREATE INDEX IF NOT EXISTS idx_soil_analysis_land_recorded_keyset ON public.soil_analysis(land_id, recorded_at DESC NULLS LAST, analysis_id DESC);
+CREATE INDEX IF NOT EXISTS idx_crop_recommendations_land_score_keyset ON public.crop_recommendations(land_id, suitability_score DESC NULLS LAST, recommendation_id DESC);
+
+-- Running aggregates seed: count, sum and sum of squares per land / sensor in one GROUP BY,
+-- so a starting API process does not page through every row (backend/running_aggregates.py).
+-- Each group is [key, rows, counts..., sums..., sums of squares...] in the API's metric order;
+-- watermark is the highest id the sums include and ids the ones they include among the
+-- last recent_ids below it, both read in the same snapshot: the API re-checks that id
+-- window on every sync for rows whose ids committed out of order.
+DROP FUNCTION IF EXISTS public.soil_analysis_running_aggregates();
+CREATE OR REPLACE FUNCTION public.soil_analysis_running_aggregates(recent_ids integer DEFAULT 0)
+RETURNS jsonb LANGUAGE sql STABLE AS $$
+    WITH w AS (SELECT coalesce(max(analysis_id), 0) AS watermark FROM public.soil_analysis)
+    SELECT jsonb_build_object(
+        'watermark', (SELECT watermark FROM w),
+        'ids', (SELECT coalesce(jsonb_agg(analysis_id), '[]'::jsonb) FROM public.soil_analysis
+                WHERE analysis_id > (SELECT watermark FROM w) - recent_ids),
+        'groups', coalesce(jsonb_agg(g.item), '[]'::jsonb)
+    )
+    FROM (
+        SELECT jsonb_build_array(
+            land_id, count(*),
+            count(nitrogen), count(phosphorus), count(potassium), count(ph_level),
+            coalesce(sum(nitrogen), 0), coalesce(sum(phosphorus), 0), coalesce(sum(potassium), 0), coalesce(sum(ph_level), 0),
+            coalesce(sum(nitrogen * nitrogen), 0), coalesce(sum(phosphorus * phosphorus), 0),
+            coalesce(sum(potassium * potassium), 0), coalesce(sum(ph_level * ph_level), 0)
+        ) AS item
+        FROM public.soil_analysis
+        GROUP BY land_id
+    ) g;
+$$;
+
+DROP FUNCTION IF EXISTS public.sensor_readings_running_aggregates();
+CREATE OR REPLACE FUNCTION public.sensor_readings_running_aggregates(recent_ids integer DEFAULT 0)
+RETURNS jsonb LANGUAGE sql STABLE AS $$
+    WITH w AS (SELECT coalesce(max(reading_id), 0) AS watermark FROM public.sensor_readings)
+    SELECT jsonb_build_object(
+        'watermark', (SELECT watermark FROM w),
+        'ids', (SELECT coalesce(jsonb_agg(reading_id), '[]'::jsonb) FROM public.sensor_readings
+                WHERE reading_id > (SELECT watermark FROM w) - recent_ids),
+        'groups', coalesce(jsonb_agg(g.item), '[]'::jsonb)
+    )
+    FROM (
+        SELECT jsonb_build_array(
+            sensor_id, count(*),
+            count(temperature), count(moisture),
+            coalesce(sum(temperature::double precision), 0), coalesce(sum(moisture::double precision), 0),
+            coalesce(sum(temperature::double precision * temperature), 0), coalesce(sum(moisture::double precision * moisture), 0)
+        ) AS item
+        FROM public.sensor_readings
+        GROUP BY sensor_id
+    ) g;
+$$;
+
+-- Fleet recommendation job: the latest row per land, in one query, for the lands its
+-- newest-first pages did not reach (lands whose sensors stopped reporting long ago).
+CREATE OR REPLACE FUNCTION public.latest_soil_analysis_per_land(land_ids integer[])
+RETURNS SETOF public.soil_analysis LANGUAGE sql STABLE AS $$
+    SELECT DISTINCT ON (land_id) *
+    FROM public.soil_analysis
+    WHERE land_id = ANY(land_ids)
+    ORDER BY land_id, recorded_at DESC NULLS LAST, analysis_id DESC;
+$$;
+
+CREATE OR REPLACE FUNCTION public.latest_sensor_readings_per_land(land_ids integer[])
+RETURNS SETOF public.sensor_readings LANGUAGE sql STABLE AS $$
+    SELECT DISTINCT ON (s.land_id) r.*
+    FROM public.sensor_readings r
+    JOIN public.sensor s ON s.sensor_id = r.sensor_id
+    WHERE s.land_id = ANY(land_ids)
+    ORDER BY s.land_id, r.recorded_at DESC NULLS LAST, r.reading_id DESC;
+$$;
+
+-- Sensor reading buffer: the newest `per_sensor` readings of each sensor, so loading a
+-- land into the buffer (backend/sensor_buffer.py) is one call instead of one query per sensor.
+CREATE OR REPLACE FUNCTION public.recent_sensor_readings(sensor_ids integer[], per_sensor integer)
+RETURNS SETOF public.sensor_readings LANGUAGE sql STABLE AS $$
+    SELECT r.*
+    FROM unnest(sensor_ids) AS s(sensor_id)
+    CROSS JOIN LATERAL (
+        SELECT *
+        FROM public.sensor_readings
+        WHERE sensor_readings.sensor_id = s.sensor_id
+        ORDER BY recorded_at DESC NULLS LAST, reading_id DESC
+        LIMIT per_sensor
+    ) r;
+$$;
+
 -- Enable Row Level Security (RLS)
 ALTER TABLE public.soil_analysis ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.crop_recommendations ENABLE ROW LEVEL SECURITY;